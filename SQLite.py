@@ -0,0 +1,410 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date    : 2026-10-17 16:40:18
+# @Author  : Li Hao (howardlee_h@outlook.com)
+# @Link    : https://github.com/SAmmer0
+# @Version : $Id$
+'''
+本地SQLite数据源，接口与SQLserver相同，可以作为fdgetter的数据源（fdgetter.use_local_db），用于在没有
+聚源（朝阳永续）数据库的环境下测试因子计算和更新过程；同时提供生成模拟数据的函数
+
+__version__ = 1.0.0
+修改日期：2026-10-17
+修改内容：
+    初始化，添加SQLite、translate_sql和build_synthetic_db
+
+修改日期：2026-10-17
+修改内容：
+    build_synthetic_db默认从fmanager.const.START_TIME开始生成数据
+
+修改日期：2026-10-17
+修改内容：
+    1. 模拟数据中添加000902、000985和399001指数
+    2. 停牌当天生成成交量为0的行情数据，一致预期数据改为每个交易日生成
+    3. build_synthetic_db添加tds参数，可以使用给定的交易日生成数据
+    4. 模拟数据中添加暂停上市的股票
+'''
+__version__ = '1.0.0'
+
+import datetime as dt
+import re
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+# --------------------------------------------------------------------------------------------------
+# 常量
+# 时间数据在数据库中以文本的形式存储，声明为DATETIME类型的列读取时转换为datetime.datetime
+sqlite3.register_converter('DATETIME', lambda s: dt.datetime.fromisoformat(s.decode()))
+_CAST_PATTERN = re.compile(r"CAST\(\s*('[^']*')\s+AS\s+datetime\s*\)", re.I)
+_TOP_PATTERN = re.compile(r"SELECT\s+TOP\s*\(?\s*(\d+)\s*\)?", re.I)
+
+# 模拟数据库的表结构，只包含因子计算中使用到的表和列，格式为{表名: [(列名, 类型), ...]}
+SCHEMA = {
+    'SecuMain': [('InnerCode', 'INTEGER'), ('CompanyCode', 'INTEGER'), ('SecuCode', 'TEXT'),
+                 ('SecuAbbr', 'TEXT'), ('SecuMarket', 'INTEGER'), ('SecuCategory', 'INTEGER'),
+                 ('ListedDate', 'DATETIME'), ('ListedState', 'INTEGER')],
+    'LC_ListStatus': [('InnerCode', 'INTEGER'), ('SecuMarket', 'INTEGER'),
+                      ('ChangeType', 'INTEGER'), ('ChangeDate', 'DATETIME')],
+    'QT_DailyQuote': [('InnerCode', 'INTEGER'), ('TradingDay', 'DATETIME'),
+                      ('PrevClosePrice', 'REAL'), ('OpenPrice', 'REAL'), ('HighPrice', 'REAL'),
+                      ('LowPrice', 'REAL'), ('ClosePrice', 'REAL'), ('TurnoverVolume', 'REAL'),
+                      ('TurnoverValue', 'REAL')],
+    'QT_AdjustingFactor': [('InnerCode', 'INTEGER'), ('ExDiviDate', 'DATETIME'),
+                           ('RatioAdjustingFactor', 'REAL')],
+    'LC_ShareStru': [('CompanyCode', 'INTEGER'), ('EndDate', 'DATETIME'), ('TotalShares', 'REAL'),
+                     ('NonResiSharesJY', 'REAL')],
+    'LC_exgIndustry': [('CompanyCode', 'INTEGER'), ('Standard', 'INTEGER'),
+                       ('InfoPublDate', 'DATETIME'), ('FirstIndustryName', 'TEXT')],
+    'LC_SpecialTrade': [('InnerCode', 'INTEGER'), ('SpecialTradeTime', 'DATETIME'),
+                        ('SpecialTradeType', 'INTEGER'), ('SecurityAbbr', 'TEXT')],
+    'CT_SystemConst': [('LB', 'INTEGER'), ('DM', 'INTEGER'), ('MS', 'TEXT')],
+    'QT_IndexQuote': [('InnerCode', 'INTEGER'), ('TradingDay', 'DATETIME'),
+                      ('PrevClosePrice', 'REAL'), ('OpenPrice', 'REAL'), ('HighPrice', 'REAL'),
+                      ('LowPrice', 'REAL'), ('ClosePrice', 'REAL')],
+    'LC_IndexComponentsWeight': [('IndexCode', 'INTEGER'), ('InnerCode', 'INTEGER'),
+                                 ('EndDate', 'DATETIME'), ('Weight', 'REAL')],
+    'LC_StockHoldingSt': [('InnerCode', 'INTEGER'), ('EndDate', 'DATETIME'),
+                          ('InstitutionsHoldProp', 'REAL'), ('InstitutionsHoldPropA', 'REAL')],
+    'LC_QIncomeStatementNew': [('CompanyCode', 'INTEGER'), ('InfoPublDate', 'DATETIME'),
+                               ('EndDate', 'DATETIME'), ('BulletinType', 'INTEGER'),
+                               ('NPFromParentCompanyOwners', 'REAL'),
+                               ('OperatingRevenue', 'REAL'), ('OperatingProfit', 'REAL'),
+                               ('OperatingExpense', 'REAL'), ('AdministrationExpense', 'REAL'),
+                               ('FinancialExpense', 'REAL'), ('OperatingCost', 'REAL')],
+    'LC_QCashFlowStatementNew': [('CompanyCode', 'INTEGER'), ('InfoPublDate', 'DATETIME'),
+                                 ('EndDate', 'DATETIME'), ('BulletinType', 'INTEGER'),
+                                 ('NetOperateCashFlow', 'REAL')],
+    'LC_BalanceSheetAll': [('CompanyCode', 'INTEGER'), ('InfoPublDate', 'DATETIME'),
+                           ('EndDate', 'DATETIME'), ('BulletinType', 'INTEGER'),
+                           ('IfMerged', 'INTEGER'), ('TotalAssets', 'REAL'),
+                           ('TotalNonCurrentLiability', 'REAL'), ('TotalCurrentAssets', 'REAL'),
+                           ('TotalCurrentLiability', 'REAL'), ('SEWithoutMI', 'REAL'),
+                           ('CashEquivalents', 'REAL'), ('EPreferStock', 'REAL')],
+    'LC_IncomeStatementAll': [('CompanyCode', 'INTEGER'), ('InfoPublDate', 'DATETIME'),
+                              ('EndDate', 'DATETIME'), ('BulletinType', 'INTEGER'),
+                              ('IfMerged', 'INTEGER'), ('AccountingStandards', 'INTEGER'),
+                              ('IfAdjusted', 'INTEGER'), ('NPParentCompanyOwners', 'REAL'),
+                              ('OperatingRevenue', 'REAL')],
+    'LC_CashFlowStatementAll': [('CompanyCode', 'INTEGER'), ('InfoPublDate', 'DATETIME'),
+                                ('EndDate', 'DATETIME'), ('BulletinType', 'INTEGER'),
+                                ('IfMerged', 'INTEGER'), ('AccountingStandards', 'INTEGER'),
+                                ('IfAdjusted', 'INTEGER'), ('NetOperateCashFlow', 'REAL')],
+    'CON_FORECAST_SCHEDULE': [('STOCK_CODE', 'TEXT'), ('CON_DATE', 'DATETIME'),
+                              ('TARGET_PRICE', 'REAL')],
+}
+
+# 模拟数据中使用的指数代码
+SYNTHETIC_INDEX = ('000001', '000016', '000300', '000852', '000902', '000903', '000905',
+                   '000985', '399001', '399006', '399313')
+# 模拟数据中使用的中信一级行业
+SYNTHETIC_INDUSTRY = ('银行', '房地产', '计算机', '医药', '电子元器件', '机械', '汽车', '传媒')
+# 特殊处理类型，格式为(DM, MS)
+SYNTHETIC_ST_TYPE = ((1, 'ST'), (2, '撤销ST'), (3, '*ST'), (4, '撤销*ST'))
+# --------------------------------------------------------------------------------------------------
+# 函数
+
+
+def translate_sql(sql):
+    '''
+    将因子计算中使用的T-SQL语句转换为SQLite可以执行的语句，目前支持的转换如下：
+    CAST('...' AS datetime)转换为'...'（时间数据以ISO格式的文本存储，可以直接比较）；
+    SELECT TOP(n) ...转换为SELECT ... LIMIT n
+
+    Parameter
+    ---------
+    sql: str
+        需要转换的SQL
+
+    Return
+    ------
+    out: str
+    '''
+    sql = _CAST_PATTERN.sub(r'\1', sql)
+    while True:
+        match = _TOP_PATTERN.search(sql)
+        if match is None:
+            break
+        # 找到TOP所在的(子)查询的结束位置
+        depth = 0
+        end = len(sql)
+        for idx in range(match.end(), len(sql)):
+            if sql[idx] == '(':
+                depth += 1
+            elif sql[idx] == ')':
+                if depth == 0:
+                    end = idx
+                    break
+                depth -= 1
+        sql = sql[:match.start()] + 'SELECT' + sql[match.end():end].rstrip() +\
+            ' LIMIT ' + match.group(1) + sql[end:]
+    return sql
+
+
+def _format_time(t):
+    '''
+    将时间转换为数据库中存储的文本格式，没有时间部分的只存储日期
+    '''
+    t = pd.to_datetime(t)
+    if t == t.normalize():
+        return t.strftime('%Y-%m-%d')
+    return t.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _insert_rows(conn, table, rows):
+    '''
+    向表中插入数据，rows中的每一行需要与SCHEMA中列的顺序一致，时间数据会转换为文本
+    '''
+    columns = SCHEMA[table]
+    time_idx = [i for i, (_, col_type) in enumerate(columns) if col_type == 'DATETIME']
+    rows = [list(r) for r in rows]
+    for r in rows:
+        for i in time_idx:
+            if r[i] is not None:
+                r[i] = _format_time(r[i])
+    sql = 'INSERT INTO {table} VALUES ({marks})'.format(table=table,
+                                                        marks=', '.join(['?'] * len(columns)))
+    conn.executemany(sql, rows)
+
+
+def build_synthetic_db(path, stock_num=50, start_time=None, end_time='2014-12-31', seed=0,
+                       tds=None):
+    '''
+    生成模拟的本地数据库，表结构见SCHEMA，数据为随机生成，仅用于测试和性能评估
+
+    Parameter
+    ---------
+    path: str
+        数据库文件路径，如果文件中已经存在对应的表，则会被删除后重建
+    stock_num: int, default 50
+        股票数量，其中一半为上海市场（60开头），一半为深圳市场（00开头）
+    start_time: str or other type that can be converted by pd.to_datetime, default None
+        数据的开始时间，默认为None表示使用fmanager.const.START_TIME，使得从头开始更新因子时的数据
+        完整性检查（checkdata_completeness）能够通过；如果提供的开始时间晚于START_TIME，则只能用于
+        更新开始时间之后的数据
+    end_time: str or other type that can be converted by pd.to_datetime, default '2014-12-31'
+        数据的结束时间，更新因子时的结束时间不能晚于该时间
+    seed: int, default 0
+        随机数种子，相同的参数生成的数据相同
+    tds: list like, default None
+        交易日，默认为None表示使用开始时间和结束时间之间的工作日（pd.bdate_range）；因子计算中使用的
+        交易日历（dateshandle）与工作日不同时，需要传入交易日历中的交易日
+
+    Notes
+    -----
+    部分股票在开始时间之后上市，少量股票在期间退市或者暂停上市一段时间（暂停上市期间没有行情数据）；
+    股票随机停牌（与聚源数据库相同，当天的行情数据中收盘价为前收盘价，其他价格和成交量为0）；一致
+    预期数据每个交易日都有；财务报表在报告期后20至110天发布，部分报告会在之后被更正
+    '''
+    if start_time is None:
+        from fmanager.const import START_TIME
+        start_time = START_TIME
+    rng = np.random.RandomState(seed)
+    start_time = pd.to_datetime(start_time)
+    end_time = pd.to_datetime(end_time)
+    if tds is None:
+        tds = pd.bdate_range(start_time, end_time)
+    else:
+        tds = pd.DatetimeIndex(tds)
+        tds = tds[(tds >= start_time) & (tds <= end_time)]
+    rpt_dates = pd.date_range(start_time - pd.Timedelta('800 day'), end_time, freq='Q')
+
+    conn = sqlite3.connect(path)
+    for table, columns in SCHEMA.items():
+        conn.execute('DROP TABLE IF EXISTS {table}'.format(table=table))
+        conn.execute('CREATE TABLE {table} ({cols})'.format(
+            table=table, cols=', '.join('{0} {1}'.format(*c) for c in columns)))
+
+    # 股票和指数的基本信息
+    stocks = []
+    for i in range(stock_num):
+        if i % 2 == 0:
+            code, market = '{0:06d}'.format(600000 + i), 83
+        else:
+            code, market = '{0:06d}'.format(i), 90
+        if i % 5 == 4:  # 期间上市的股票
+            listed_date = tds[rng.randint(20, len(tds) // 2)]
+        else:
+            listed_date = start_time - pd.Timedelta(int(rng.randint(400, 3000)), unit='D')
+        delisted_date = tds[rng.randint(len(tds) // 2, len(tds))] if i % 17 == 16 else None
+        pause = None
+        if i % 7 == 3:  # 期间暂停上市一段时间的股票，暂停上市期间没有行情数据
+            pause_idx = rng.randint(len(tds) // 3, len(tds) // 2)
+            if tds[pause_idx] > listed_date:
+                pause = (tds[pause_idx], tds[min(pause_idx + rng.randint(40, 120), len(tds) - 1)])
+        stocks.append({'inner_code': i + 1, 'company_code': 10000 + i, 'code': code,
+                       'market': market, 'listed_date': listed_date,
+                       'delisted_date': delisted_date, 'pause': pause})
+    index_inner = {code: 100000 + i for i, code in enumerate(SYNTHETIC_INDEX)}
+    _insert_rows(conn, 'SecuMain',
+                 [(s['inner_code'], s['company_code'], s['code'], 'S' + s['code'], s['market'],
+                   1, s['listed_date'], 1 if s['delisted_date'] is None else 5)
+                  for s in stocks] +
+                 [(inner, None, code, 'I' + code, 83 if code.startswith('0') else 90, 4,
+                   start_time - pd.Timedelta('3000 day'), 1)
+                  for code, inner in index_inner.items()])
+    # 上市状态
+    rows = []
+    for s in stocks:
+        rows.append((s['inner_code'], s['market'], 1, s['listed_date']))
+        if s['delisted_date'] is not None:
+            rows.append((s['inner_code'], s['market'], 4, s['delisted_date']))
+        if s['pause'] is not None:
+            rows.append((s['inner_code'], s['market'], 2, s['pause'][0]))
+            rows.append((s['inner_code'], s['market'], 3, s['pause'][1]))
+    _insert_rows(conn, 'LC_ListStatus', rows)
+
+    # 日行情、复权因子、股本、行业、特殊处理、机构持股和一致预期
+    quote_rows, adj_rows, share_rows, ind_rows, st_rows, hold_rows, con_rows = ([] for _ in range(7))
+    for s in stocks:
+        alive = (tds >= s['listed_date'])
+        if s['delisted_date'] is not None:
+            alive &= (tds < s['delisted_date'])
+        if s['pause'] is not None:
+            alive &= (tds < s['pause'][0]) | (tds >= s['pause'][1])
+        days = tds[alive]
+        if len(days) == 0:
+            continue
+        rets = rng.normal(0.0003, 0.025, len(days))
+        suspended = rng.rand(len(days)) < 0.02
+        rets[suspended] = 0.    # 停牌当天价格不变
+        close = 10 * np.exp(np.cumsum(rets)) * rng.uniform(0.5, 5)
+        prev_close = np.concatenate([[close[0] / (1 + rets[0])], close[:-1]])
+        for i, day in enumerate(days):
+            if suspended[i]:    # 与聚源数据库相同，停牌当天开盘、最高、最低价和成交量为0
+                quote_rows.append((s['inner_code'], day, prev_close[i], 0., 0., 0., close[i],
+                                   0., 0.))
+                continue
+            high = max(close[i], prev_close[i]) * (1 + abs(rng.normal(0, 0.01)))
+            low = min(close[i], prev_close[i]) * (1 - abs(rng.normal(0, 0.01)))
+            open_price = rng.uniform(low, high)
+            volume = float(rng.randint(100000, 10000000))
+            quote_rows.append((s['inner_code'], day, prev_close[i], open_price, high, low,
+                               close[i], volume, volume * close[i]))
+        adj = 1.
+        adj_rows.append((s['inner_code'], days[0], adj))
+        for day in sorted(rng.choice(days, size=min(3, len(days)), replace=False)):
+            adj *= rng.uniform(1.01, 1.3)
+            adj_rows.append((s['inner_code'], day, adj))
+        total_share = rng.uniform(1e8, 1e10)
+        for rpt in rpt_dates[rng.rand(len(rpt_dates)) < 0.3].union(rpt_dates[:1]):
+            total_share *= rng.uniform(1, 1.2)
+            share_rows.append((s['company_code'], rpt, total_share,
+                               total_share * rng.uniform(0.3, 1)))
+        ind_rows.append((s['company_code'], 3, s['listed_date'],
+                         SYNTHETIC_INDUSTRY[rng.randint(len(SYNTHETIC_INDUSTRY))]))
+        if rng.rand() < 0.2:
+            st_day = days[rng.randint(len(days))]
+            st_rows.append((s['inner_code'], st_day, 1, 'ST' + s['code']))
+            if st_day < days[-1]:
+                st_rows.append((s['inner_code'], days[days > st_day][0], 2, 'S' + s['code']))
+        for rpt in rpt_dates[rpt_dates >= start_time - pd.Timedelta('200 day')]:
+            hold = rng.uniform(0, 60)
+            hold_rows.append((s['inner_code'], rpt, hold, hold * rng.uniform(0.8, 1)))
+        for i, day in enumerate(days):
+            con_rows.append((s['code'], day, close[i] * rng.uniform(0.9, 1.5)))
+    _insert_rows(conn, 'QT_DailyQuote', quote_rows)
+    _insert_rows(conn, 'QT_AdjustingFactor', adj_rows)
+    _insert_rows(conn, 'LC_ShareStru', share_rows)
+    _insert_rows(conn, 'LC_exgIndustry', ind_rows)
+    _insert_rows(conn, 'LC_SpecialTrade', st_rows)
+    _insert_rows(conn, 'CT_SystemConst', [(1185, dm, ms) for dm, ms in SYNTHETIC_ST_TYPE])
+    _insert_rows(conn, 'LC_StockHoldingSt', hold_rows)
+    _insert_rows(conn, 'CON_FORECAST_SCHEDULE', con_rows)
+
+    # 指数行情和成分权重
+    index_rows, weight_rows = [], []
+    month_ends = pd.date_range(start_time - pd.Timedelta('200 day'), end_time, freq='M')
+    for code, inner in index_inner.items():
+        close = 1000 * np.exp(np.cumsum(rng.normal(0.0002, 0.015, len(tds))))
+        prev_close = np.concatenate([[close[0]], close[:-1]])
+        for i, day in enumerate(tds):
+            index_rows.append((inner, day, prev_close[i], prev_close[i], close[i] * 1.01,
+                               close[i] * 0.99, close[i]))
+        members = [s for s in stocks if rng.rand() < 0.5]
+        for month_end in month_ends:
+            weights = rng.dirichlet(np.ones(len(members))) * 100
+            for s, w in zip(members, weights):
+                weight_rows.append((inner, s['inner_code'], month_end, w))
+    _insert_rows(conn, 'QT_IndexQuote', index_rows)
+    _insert_rows(conn, 'LC_IndexComponentsWeight', weight_rows)
+
+    # 财务报表
+    fin_rows = {table: [] for table in ('LC_QIncomeStatementNew', 'LC_QCashFlowStatementNew',
+                                        'LC_BalanceSheetAll', 'LC_IncomeStatementAll',
+                                        'LC_CashFlowStatementAll')}
+    for s in stocks:
+        scale = rng.uniform(1e8, 1e10)
+        for rpt in rpt_dates:
+            publish_dates = [rpt + pd.Timedelta(int(rng.randint(20, 110)), unit='D')]
+            if rng.rand() < 0.1:    # 更正报告
+                publish_dates.append(publish_dates[0] + pd.Timedelta(int(rng.randint(30, 300)),
+                                                                     unit='D'))
+            for pub in publish_dates:
+                if pub > end_time:
+                    continue
+                rev = scale * rng.uniform(0.05, 0.1)
+                np_value = rev * rng.normal(0.1, 0.1)
+                fin_rows['LC_QIncomeStatementNew'].append(
+                    (s['company_code'], pub, rpt, 20, np_value, rev, np_value * 1.2,
+                     rev * 0.05, rev * 0.04, rev * 0.01, rev * 0.7))
+                fin_rows['LC_QCashFlowStatementNew'].append(
+                    (s['company_code'], pub, rpt, 20, np_value * rng.uniform(0.5, 1.5)))
+                assets = scale * rng.uniform(2, 3)
+                fin_rows['LC_BalanceSheetAll'].append(
+                    (s['company_code'], pub, rpt, 20, 1, assets, assets * 0.2, assets * 0.5,
+                     assets * 0.3, assets * 0.4, assets * 0.1, 0.))
+                if rpt.month == 12:
+                    fin_rows['LC_IncomeStatementAll'].append(
+                        (s['company_code'], pub, rpt, 20, 1, 1, 1, np_value * 4, rev * 4))
+                    fin_rows['LC_CashFlowStatementAll'].append(
+                        (s['company_code'], pub, rpt, 20, 1, 1, 1, np_value * 4))
+    for table, rows in fin_rows.items():
+        _insert_rows(conn, table, rows)
+    conn.commit()
+    conn.close()
+# --------------------------------------------------------------------------------------------------
+# 类
+
+
+class SQLite(object):
+    '''
+    本地SQLite数据库，接口与SQLserver相同，执行前使用translate_sql将T-SQL转换为SQLite的语法
+    '''
+
+    def __init__(self, path):
+        '''
+        Parameter
+        ---------
+        path: str
+            数据库文件路径
+        '''
+        self.path = path
+
+    def connect(self):
+        self.conn = sqlite3.connect(self.path, detect_types=sqlite3.PARSE_DECLTYPES,
+                                    check_same_thread=False)
+        self.cur = self.conn.cursor()
+
+    def fetchall(self, sql, *args, **kwargs):
+        self.cur.execute(translate_sql(sql), *args, **kwargs)
+        return self.cur.fetchall()
+
+    def fetch_batches(self, sql, size=10000, *args, **kwargs):
+        '''
+        执行sql，并以生成器的形式分批返回结果，每批最多包含size行
+        '''
+        self.cur.execute(translate_sql(sql), *args, **kwargs)
+        while True:
+            rows = self.cur.fetchmany(size)
+            if not rows:
+                break
+            yield rows
+
+    def fetchone(self, sql, *args, **kwargs):
+        self.cur.execute(translate_sql(sql), *args, **kwargs)
+        return self.cur.fetchone()
+
+    def close(self):
+        self.conn.close()
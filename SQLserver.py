@@ -32,6 +32,21 @@ class SQLserver:
         rows = self.cur.fetchall()
         return rows
 
+    def fetch_batches(self, sql, size=10000, *args, **kwargs):
+        '''
+        执行sql，并以生成器的形式分批返回结果，每批最多包含size行，避免一次性取出所有的行
+        '''
+        try:
+            self.cur.execute(sql, *args, **kwargs)
+        except pyodbc.Error as e:
+            print(e)
+            raise e
+        while True:
+            rows = self.cur.fetchmany(size)
+            if not rows:
+                break
+            yield rows
+
     def fetchone(self, sql, *args, **kwargs):
         try:
             self.cur.execute(sql, *args, **kwargs)
@@ -119,9 +119,23 @@ __version__ = 1.10.7
 修改日期：2017-08-28
 修改内容：
     添加将（价格）数据转换为净值数据的函数price2nav
+
+__version__ = 1.11.0
+修改日期：2026-10-17
+修改内容：
+    添加map_data_bulk，一次性将所有股票的数据映射到交易日上，替代按股票分组调用map_data
+
+__version__ = 1.12.0
+修改日期：2026-10-17
+修改内容：
+    1. 添加rolling_ols，对面板数据批量进行滚动OLS回归
+    2. 添加rolling_moments，对面板数据批量计算滚动的均值、标准差、偏度和峰度
+    3. 添加rolling_weighted_sum，对面板数据批量计算固定权重的滚动加权和
+    4. 添加rolling_topk，对面板数据批量计算滚动窗口中最大（最小）的k个数据的统计量
 '''
-__version__ = '1.10.5'
+__version__ = '1.12.0'
 
+from collections import namedtuple
 import datetime as dt
 from math import sqrt
 import numpy as np
@@ -129,6 +143,7 @@ from numpy.lib.stride_tricks import as_strided as strided
 import pandas as pd
 import pdb
 import pickle
+from scipy.signal import fftconvolve
 import statsmodels.api as sm
 
 # import six
@@ -253,6 +268,75 @@ def map_data(rawData, days, timeCols='time', fromNowOn=False, fillna=None):
     return data
 
 
+def map_data_bulk(rawData, days, valueCol='data', codeCol='code', timeCols='time',
+                  fromNowOn=False):
+    '''
+    将多个股票（长格式）的时点数据一次性映射到给定的连续时间上，映射规则与map_data相同，
+    结果与按照股票分组调用map_data后转换为面板数据一致
+
+    Parameter
+    ---------
+    rawData: pd.DataFrame
+        需要映射的数据，要求包含codeCol、timeCols和valueCol列；同一股票同一时点有多条数据时，
+        使用最后一条数据
+    days: iterable
+        所需要映射的日期序列
+    valueCol: str, default 'data'
+        数据列
+    codeCol: str, default 'code'
+        股票代码列
+    timeCols: str, default 'time'
+        时间列
+    fromNowOn: boolean, default False
+        为True时，给定时点及之后的日期的值等于该时点的值；为False时，给定时点之后的日期的值才等于
+        该时点的值（第一个日期使用该日期之前最近的值，之后的日期使用前一个日期（包含当天）最近的值）
+
+    Return
+    ------
+    out: pd.DataFrame
+        index为排序后的days，columns为rawData中出现的股票代码（升序），没有数据的位置为NA
+
+    Notes
+    -----
+    所有股票的数据按照(股票序号, 时间排序)组合为一个有序的键，所有(股票, 日期)的查询通过一次
+    searchsorted完成
+    '''
+    days = pd.DatetimeIndex(sorted(days))
+    rawData = rawData.dropna(subset=[codeCol, timeCols])
+    codes, code_id = np.unique(rawData[codeCol].values, return_inverse=True)
+    code_num = len(codes)
+    values = rawData[valueCol].values
+    times = pd.DatetimeIndex(rawData[timeCols]).values.astype('datetime64[ns]').view('int64')
+    days_ns = days.values.astype('datetime64[ns]').view('int64')
+    if fromNowOn:
+        # 时间小于等于当天的数据可用
+        bounds = days_ns + 1
+    else:
+        bounds = np.concatenate([days_ns[:1], days_ns[:-1] + 1])
+    # 将时间转换为排序序号，使得股票序号和时间可以组合为一个整数键
+    _, ranks = np.unique(np.concatenate([times, bounds]), return_inverse=True)
+    time_num = len(times) + len(bounds)
+    data_key = code_id.astype(np.int64) * time_num + ranks[:len(times)]
+    order = np.argsort(data_key, kind='mergesort')
+    data_key = data_key[order]
+    values = values[order]
+    code_idx = np.arange(code_num, dtype=np.int64)
+    query_key = code_idx[np.newaxis, :] * time_num + ranks[len(times):, np.newaxis]
+    # 严格小于边界的最后一条数据
+    pos = np.searchsorted(data_key, query_key, side='left') - 1
+    pos_valid = np.maximum(pos, 0)
+    found = (pos >= 0) & (data_key[pos_valid] // time_num == code_idx[np.newaxis, :])
+    out = values.take(pos_valid)
+    if not found.all():
+        if out.dtype.kind in 'iub':
+            out = out.astype(np.float64)
+        elif out.dtype.kind not in 'fc':
+            out = out.astype(object)
+        out[~found] = np.nan
+    return pd.DataFrame(out, index=pd.Index(days, name=timeCols),
+                        columns=pd.Index(codes, name=codeCol))
+
+
 def date_processing(date, dateFormat='%Y-%m-%d'):
     '''
     用于检查日期的类型，如果为str则转换为datetime的格式
@@ -593,6 +677,374 @@ def rolling_apply(df, func, period, **kwargs):
     return out
 
 
+def _rolling_sum(data, window):
+    '''
+    沿第0轴计算窗口长度为window的滚动和，前window-1个位置为累计和，通过累计和相减得到
+    '''
+    out = np.cumsum(data, axis=0)
+    if window < len(out):
+        out[window:] = out[window:] - out[:-window].copy()
+    return out
+
+
+RollingOLSResult = namedtuple('RollingOLSResult', ['params', 'resid_var', 'rsquared', 'nobs'])
+
+
+def rolling_ols(y, x, window, min_periods=None, add_constant=True, ddof=0, chunk_size=None):
+    '''
+    对面板数据中的每一列（股票）分别与共同的自变量进行滚动OLS回归，所有股票和所有日期的结果一次性计算
+
+    Parameter
+    ---------
+    y: pd.DataFrame
+        因变量，index为时间，columns为股票代码
+    x: pd.DataFrame or pd.Series
+        自变量，所有股票共用，会按照y的index对齐；为pd.Series时使用其name作为自变量名称
+    window: int
+        滚动窗口的长度
+    min_periods: int, default None
+        窗口中至少需要的有效数据（y和x均不为NA）的数量，默认为None表示与window相同
+    add_constant: boolean, default True
+        是否添加截距项，截距项的名称为const
+    ddof: int, default 0
+        计算残差方差时的自由度调整，即残差方差为SSR / (nobs - ddof)，默认与np.var相同
+    chunk_size: int, default None
+        每次计算的股票数量，用于控制内存的使用，默认为None表示按照中间结果约3千万个元素自动计算
+
+    Return
+    ------
+    out: RollingOLSResult
+        params: dict，格式为{自变量名称: pd.DataFrame}，为各个系数
+        resid_var: pd.DataFrame，残差方差
+        rsquared: pd.DataFrame，拟合优度，因变量在窗口中没有波动时为NA
+        nobs: pd.DataFrame，窗口中有效数据的数量
+        所有pd.DataFrame的index和columns均与y相同，有效数据不足或者X'X奇异的位置为NA
+
+    Notes
+    -----
+    X'X、X'y、y'y等通过沿时间轴的累计和相减得到窗口内的值，然后对所有(日期, 股票)的(k, k)矩阵批量调用
+    np.linalg.solve；窗口中y或者x为NA的数据不参与计算
+    '''
+    if isinstance(x, pd.Series):
+        x = x.to_frame()
+    x = x.reindex(y.index)
+    names = list(x.columns)
+    x_arr = x.values.astype(np.float64)
+    if add_constant:
+        names = ['const'] + names
+        x_arr = np.hstack([np.ones((len(x_arr), 1)), x_arr])
+    if min_periods is None:
+        min_periods = window
+    y_arr = y.values.astype(np.float64)
+    T, S = y_arr.shape
+    K = x_arr.shape[1]
+    min_periods = max(min_periods, K)
+    x_valid = ~np.isnan(x_arr).any(axis=1)
+    x_arr = np.where(x_valid[:, np.newaxis], x_arr, 0.)
+    if chunk_size is None:
+        chunk_size = max(1, int(3e7 // max(T * K * K, 1)))
+    params = np.full((T, S, K), np.nan)
+    ssr = np.full((T, S), np.nan)
+    sst = np.full((T, S), np.nan)
+    syy_all = np.full((T, S), np.nan)
+    nobs = np.zeros((T, S))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for c_start in range(0, S, chunk_size):
+            c_slice = slice(c_start, c_start + chunk_size)
+            valid = ~np.isnan(y_arr[:, c_slice]) & x_valid[:, np.newaxis]
+            mask = valid.astype(np.float64)
+            y_chunk = np.where(valid, y_arr[:, c_slice], 0.)
+            xx = _rolling_sum(np.einsum('tc,tk,tl->tckl', mask, x_arr, x_arr), window)
+            xy = _rolling_sum(np.einsum('tc,tk->tck', y_chunk, x_arr), window)
+            sy = _rolling_sum(y_chunk, window)
+            syy = _rolling_sum(y_chunk ** 2, window)
+            n = _rolling_sum(mask, window)
+            nobs[:, c_slice] = n
+            sel = n >= min_periods
+            if not sel.any():
+                continue
+            xx_sel = xx[sel]
+            xy_sel = xy[sel]
+            try:
+                beta = np.linalg.solve(xx_sel, xy_sel[..., np.newaxis])[..., 0]
+            except np.linalg.LinAlgError:     # 存在奇异矩阵，剔除后再计算
+                regular = np.linalg.cond(xx_sel) < 1 / np.finfo(np.float64).eps
+                beta = np.full(xy_sel.shape, np.nan)
+                beta[regular] = np.linalg.solve(xx_sel[regular],
+                                                xy_sel[regular][..., np.newaxis])[..., 0]
+            chunk_params = np.full((T, y_chunk.shape[1], K), np.nan)
+            chunk_params[sel] = beta
+            params[:, c_slice] = chunk_params
+            chunk_ssr = syy - np.einsum('tck,tck->tc', np.nan_to_num(chunk_params), xy)
+            chunk_ssr = np.maximum(chunk_ssr, 0.)
+            ssr[:, c_slice] = np.where(np.isnan(chunk_params).any(axis=2), np.nan, chunk_ssr)
+            sst[:, c_slice] = syy - sy ** 2 / n
+            syy_all[:, c_slice] = syy
+        resid_var = ssr / (nobs - ddof)
+        # 因变量在窗口中为常数时，sst只剩下舍入误差
+        rsquared = np.where(sst > 1e-10 * syy_all, 1 - ssr / sst, np.nan)
+
+    def to_df(arr):
+        return pd.DataFrame(arr, index=y.index, columns=y.columns)
+    params = {name: to_df(params[:, :, i]) for i, name in enumerate(names)}
+    return RollingOLSResult(params, to_df(resid_var), to_df(rsquared), to_df(nobs))
+
+
+RollingMoments = namedtuple('RollingMoments', ['mean', 'std', 'skew', 'kurt'])
+
+
+def _moments_from_sums(n, s1, s2, s3, s4, offset=0., zero=False, bias=True, ddof=0):
+    '''
+    由窗口内的数量和幂和(Σx, Σx², Σx³, Σx⁴)计算均值、标准差、偏度和（超额）峰度，其中x为原始数据
+    减去offset后的数据；偏度和峰度的计算方法与scipy.stats.skew/kurtosis相同，方差相对于均值可以
+    忽略（与scipy相同的判断方法m2 <= (resolution * mean)^2）或者zero为True时，标准差为0，偏度和
+    峰度为NA
+    '''
+    mean = s1 / n
+    m2 = s2 / n - mean ** 2
+    m3 = s3 / n - 3 * mean * s2 / n + 2 * mean ** 3
+    m4 = s4 / n - 4 * mean * s3 / n + 6 * mean ** 2 * s2 / n - 3 * mean ** 4
+    zero = zero | (m2 <= (np.finfo(np.float64).resolution * (mean + offset)) ** 2)
+    m2 = np.where(zero, 0., m2)
+    std = np.sqrt(m2 * n / (n - ddof))
+    skew = np.where(zero, np.nan, m3 / m2 ** 1.5)
+    kurt = np.where(zero, np.nan, m4 / m2 ** 2 - 3)
+    if not bias:
+        skew = skew * np.sqrt(n * (n - 1)) / (n - 2)
+        kurt = ((n + 1) * kurt + 6) * (n - 1) / ((n - 2) * (n - 3))
+    return mean, std, skew, kurt
+
+
+def rolling_moments(data, window, min_periods=None, bias=True, ddof=0, stable=True,
+                    chunk_size=None):
+    '''
+    对面板数据的每一列计算滚动的均值、标准差、偏度和峰度
+
+    Parameter
+    ---------
+    data: pd.DataFrame or pd.Series
+        需要计算的数据，index为时间
+    window: int
+        滚动窗口的长度
+    min_periods: int, default None
+        窗口中至少需要的有效数据的数量，默认为None表示与window相同；窗口中的NA值不参与计算
+    bias: boolean, default True
+        偏度和峰度是否不进行偏差修正，含义与scipy.stats.skew/kurtosis的bias参数相同
+    ddof: int, default 0
+        计算标准差时的自由度调整，默认与np.std相同
+    stable: boolean, default True
+        为True时在每个窗口中先减去窗口均值再计算中心矩，复杂度为O(n*window)，结果与scipy一致；
+        为False时通过滚动的幂和(Σx, Σx², Σx³, Σx⁴)计算，复杂度为O(n)，但是在窗口内波动很小
+        （例如停牌期间只有个别非0收益）时，高阶矩会因为数值抵消产生很大的误差，只适用于对精度
+        要求不高的情况
+    chunk_size: int, default None
+        stable为True时每次计算的列数，用于控制内存的使用，默认为None表示按照中间结果约3千万个元素
+        自动计算
+
+    Return
+    ------
+    out: RollingMoments
+        (mean, std, skew, kurt)，类型与data相同，其中kurt为超额峰度（fisher）
+
+    Notes
+    -----
+    使用幂和计算时，数据会先减去每一列的均值，并将窗口内数据全部相同的情况视为方差为0，
+    但仍然无法避免波动很小的窗口中的数值抵消
+    '''
+    is_series = isinstance(data, pd.Series)
+    frame = data.to_frame() if is_series else data
+    if min_periods is None:
+        min_periods = window
+    values = frame.values.astype(np.float64)
+    valid = ~np.isnan(values)
+    T, S = values.shape
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if not stable:
+            # 窗口内的数据全部相同（例如停牌）时，幂和计算出的方差只剩下舍入误差，需要单独处理
+            rolling = frame.astype(np.float64).rolling(window, min_periods=1)
+            zero = (rolling.max() == rolling.min()).values
+            center = np.nan_to_num(np.nanmean(values, axis=0)) if valid.any() else 0.
+            x = np.where(valid, values - center, 0.)
+            n = _rolling_sum(valid.astype(np.float64), window)
+            sums = [_rolling_sum(x ** p, window) for p in range(1, 5)]
+            mean, std, skew, kurt = _moments_from_sums(n, *sums, offset=center, zero=zero,
+                                                       bias=bias, ddof=ddof)
+            mean = mean + center
+        else:
+            mean, std, skew, kurt = [np.full((T, S), np.nan) for _ in range(4)]
+            n = np.zeros((T, S))
+            if T >= window:
+                if chunk_size is None:
+                    chunk_size = max(1, int(3e7 // (T * window)))
+                for c_start in range(0, S, chunk_size):
+                    c_slice = slice(c_start, c_start + chunk_size)
+                    a = np.ascontiguousarray(values[:, c_slice])
+                    s0, s1 = a.strides
+                    windows = strided(a, shape=(T - window + 1, window, a.shape[1]),
+                                      strides=(s0, s0, s1), writeable=False)
+                    cnt = np.sum(~np.isnan(windows), axis=1).astype(np.float64)
+                    w_mean = np.nansum(windows, axis=1) / cnt
+                    dev = np.nan_to_num(windows - w_mean[:, np.newaxis, :])
+                    # 中心化后的幂和，Σx为0
+                    sums = [np.sum(dev ** p, axis=1) for p in range(2, 5)]
+                    _, c_std, c_skew, c_kurt = _moments_from_sums(
+                        cnt, np.zeros_like(cnt), *sums, offset=w_mean, bias=bias, ddof=ddof)
+                    mean[window - 1:, c_slice] = w_mean
+                    std[window - 1:, c_slice] = c_std
+                    skew[window - 1:, c_slice] = c_skew
+                    kurt[window - 1:, c_slice] = c_kurt
+                    n[window - 1:, c_slice] = cnt
+        enough = n >= min_periods
+        out = []
+        for arr in (mean, std, skew, kurt):
+            arr = np.where(enough, arr, np.nan)
+            arr = pd.DataFrame(arr, index=frame.index, columns=frame.columns)
+            out.append(arr.iloc[:, 0].rename(data.name) if is_series else arr)
+    return RollingMoments(*out)
+
+
+def rolling_weighted_sum(data, weight, min_periods=None, renormalize=True, method='auto',
+                         chunk_size=None):
+    '''
+    对面板数据的每一列计算固定权重的滚动加权和，即out[t] = sum(weight[j] * data[t - len(weight) + 1 + j])
+
+    Parameter
+    ---------
+    data: pd.DataFrame or pd.Series
+        需要计算的数据，index为时间，按照时间升序排列
+    weight: array like
+        窗口中的权重，最后一个元素对应窗口中最新的数据，窗口长度即为权重的长度
+    min_periods: int, default None
+        窗口中至少需要的有效数据的数量，默认为None表示与窗口长度相同
+    renormalize: boolean, default True
+        窗口中有NA值时，是否按照有效数据的权重之和重新归一化，即结果乘以sum(weight) / sum(有效数据的weight)
+    method: str, default 'auto'
+        计算方法，'dot'表示对滑动窗口视图做一次矩阵-向量乘积，'fft'表示使用FFT卷积，'auto'表示窗口长度
+        超过64时使用'fft'，反之使用'dot'
+    chunk_size: int, default None
+        'dot'方法每次计算的列数，用于控制内存的使用，默认为None表示按照中间结果约3千万个元素自动计算
+
+    Return
+    ------
+    out: pd.DataFrame or pd.Series
+        与data类型相同，有效数据不足的位置为NA
+    '''
+    weight = np.asarray(weight, dtype=np.float64)
+    window = len(weight)
+    if min_periods is None:
+        min_periods = window
+    if method == 'auto':
+        method = 'fft' if window > 64 else 'dot'
+    assert method in ('dot', 'fft'), 'Error, invalid method "{}"'.format(method)
+    is_series = isinstance(data, pd.Series)
+    frame = data.to_frame() if is_series else data
+    values = frame.values.astype(np.float64)
+    valid = ~np.isnan(values)
+    T, S = values.shape
+    filled = np.where(valid, values, 0.)
+    mask = valid.astype(np.float64)
+    has_na = not valid.all()
+
+    def weighted_sum(arr):
+        # 计算所有窗口的加权和，前window-1个位置为NA
+        out = np.full(arr.shape, np.nan)
+        if T < window:
+            return out
+        if method == 'fft':
+            out[window - 1:] = fftconvolve(arr, weight[::-1, np.newaxis], mode='full',
+                                           axes=0)[window - 1: T]
+            return out
+        size = chunk_size
+        if size is None:
+            size = max(1, int(3e7 // (T * window)))
+        for c_start in range(0, S, size):
+            c_slice = slice(c_start, c_start + size)
+            a = np.ascontiguousarray(arr[:, c_slice])
+            s0, s1 = a.strides
+            windows = strided(a, shape=(T - window + 1, window, a.shape[1]),
+                              strides=(s0, s0, s1), writeable=False)
+            out[window - 1:, c_slice] = np.einsum('w,twc->tc', weight, windows)
+        return out
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out = weighted_sum(filled)
+        count = _rolling_sum(mask, window)
+        if has_na and renormalize:
+            out = out * weight.sum() / weighted_sum(mask)
+        out = np.where(count >= min_periods, out, np.nan)
+    out = pd.DataFrame(out, index=frame.index, columns=frame.columns)
+    if is_series:
+        out = out.iloc[:, 0].rename(data.name)
+    return out
+
+
+def rolling_topk(data, window, k, largest=True, stat='mean', min_periods=None, chunk_size=None):
+    '''
+    对面板数据的每一列计算滚动窗口中最大（或者最小）的k个数据的统计量
+
+    Parameter
+    ---------
+    data: pd.DataFrame or pd.Series
+        需要计算的数据，index为时间，按照时间升序排列
+    window: int
+        滚动窗口的长度
+    k: int
+        选取的数据的数量，要求0 < k <= window
+    largest: boolean, default True
+        True表示选取最大的k个数据，False表示选取最小的k个数据
+    stat: str, default 'mean'
+        统计量，'mean'表示k个数据的平均值，'kth'表示第k大（或者第k小）的数据，即次序统计量
+    min_periods: int, default None
+        窗口中至少需要的有效数据的数量，默认为None表示与window相同，要求不小于k；窗口中的NA值不参与计算
+    chunk_size: int, default None
+        每次计算的列数，用于控制内存的使用，默认为None表示按照中间结果约3千万个元素自动计算
+
+    Return
+    ------
+    out: pd.DataFrame or pd.Series
+        与data类型相同，有效数据不足的位置为NA
+
+    Notes
+    -----
+    对滑动窗口视图沿窗口维度调用np.partition，复杂度为O(n*window)，不需要对窗口排序
+    '''
+    if min_periods is None:
+        min_periods = window
+    assert 0 < k <= window, 'Error, k should be in (0, window], you provide {}'.format(k)
+    assert min_periods >= k, 'Error, min_periods should not be less than k'
+    assert stat in ('mean', 'kth'), 'Error, invalid stat "{}"'.format(stat)
+    is_series = isinstance(data, pd.Series)
+    frame = data.to_frame() if is_series else data
+    values = frame.values.astype(np.float64)
+    valid = ~np.isnan(values)
+    T, S = values.shape
+    # NA值填充为不会被选中的值
+    filled = np.where(valid, values, -np.inf if largest else np.inf)
+    out = np.full((T, S), np.nan)
+    if T >= window:
+        if chunk_size is None:
+            chunk_size = max(1, int(3e7 // (T * window)))
+        kth = window - k if largest else k - 1
+        selected = slice(window - k, None) if largest else slice(None, k)
+        for c_start in range(0, S, chunk_size):
+            c_slice = slice(c_start, c_start + chunk_size)
+            a = np.ascontiguousarray(filled[:, c_slice])
+            s0, s1 = a.strides
+            windows = strided(a, shape=(T - window + 1, window, a.shape[1]),
+                              strides=(s0, s0, s1), writeable=False)
+            parted = np.partition(windows, kth, axis=1)
+            if stat == 'mean':
+                out[window - 1:, c_slice] = parted[:, selected].mean(axis=1)
+            else:
+                out[window - 1:, c_slice] = parted[:, kth]
+    count = _rolling_sum(valid.astype(np.float64), window)
+    out = np.where(count >= min_periods, out, np.nan)
+    out = pd.DataFrame(out, index=frame.index, columns=frame.columns)
+    if is_series:
+        out = out.iloc[:, 0].rename(data.name)
+    return out
+
+
 def orthogonalize_lstsq(a, b, weight=None):
     '''
     使用最小二乘的方法对数据进行正交化处理
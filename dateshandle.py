@@ -46,16 +46,26 @@ __version__ = 1.1.3
 修改日期：2017-09-04
 修改内容：
     添加tds_shift函数，用于将交易日往前推给定个交易日的数量
+
+__version__ = 1.2.0
+修改日期：2026-10-17
+修改内容：
+    1. 添加TradingCalendar，交易日历只在第一次使用或者文件修改后加载，查询均通过searchsorted完成
+    2. get_tds、tdcount、tds_count、get_recent_td、tds_pshift、tds_fshift、get_period_end改为基于
+       TradingCalendar计算
 '''
-__version__ = '1.1.2'
+__version__ = '1.2.0'
 
 
 import pdb
 from windwrapper import get_tds_wind
 
 import datetime as dt
+from os.path import getmtime
 import pickle
 from itertools import groupby
+
+import numpy as np
 import pandas as pd
 import sysconfiglee
 
@@ -96,13 +106,217 @@ def time_trans_wrapper(func):
     return inner
 
 
-@time_trans_wrapper
+class TradingCalendar(object):
+    '''
+    内存中的交易日历，交易日按照升序存储为int64（纳秒）数组，所有的查询都通过searchsorted完成，
+    复杂度为O(log n)；查询的日期既可以是单个日期，也可以是日期序列（向量化计算），输入的日期会先去掉
+    日内时间
+    '''
+
+    def __init__(self, tds):
+        '''
+        Parameter
+        ---------
+        tds: iterable
+            交易日序列，元素为可以被pd.to_datetime转换的类型，不要求有序
+        '''
+        days = pd.DatetimeIndex(pd.to_datetime(list(tds))).normalize()
+        self._days = np.unique(days.asi8)
+
+    def __len__(self):
+        return len(self._days)
+
+    @property
+    def start(self):
+        return pd.Timestamp(self._days[0])
+
+    @property
+    def end(self):
+        return pd.Timestamp(self._days[-1])
+
+    @staticmethod
+    def _to_int(dates):
+        '''
+        将日期转换为int64数组
+
+        Return
+        ------
+        out: tuple(np.array, boolean)
+            (int64数组, 输入是否为单个日期)
+        '''
+        is_scalar = isinstance(dates, (str, dt.datetime, dt.date, np.datetime64)) or np.ndim(dates) == 0
+        if is_scalar:
+            dates = [dates]
+        return pd.DatetimeIndex(pd.to_datetime(list(dates))).normalize().asi8, is_scalar
+
+    def _to_dates(self, pos, is_scalar):
+        '''
+        将交易日数组中的位置转换为日期，超出日历范围的位置返回NaT
+        '''
+        valid = (pos >= 0) & (pos < len(self._days))
+        out = np.full(len(pos), np.iinfo(np.int64).min, dtype=np.int64)   # NaT对应的整数
+        out[valid] = self._days[pos[valid]]
+        out = pd.DatetimeIndex(out)
+        if is_scalar:
+            return out[0]
+        return out
+
+    def covers(self, start_time, end_time):
+        '''
+        判断日历是否覆盖了给定的时间区间
+        '''
+        start_time = pd.to_datetime(start_time).normalize()
+        end_time = pd.to_datetime(end_time).normalize()
+        return len(self._days) > 0 and self.start <= start_time and self.end >= end_time
+
+    def range(self, start_time, end_time):
+        '''
+        获取[start_time, end_time]之间的交易日
+
+        Return
+        ------
+        out: pd.DatetimeIndex
+        '''
+        (start_time, end_time), _ = self._to_int([start_time, end_time])
+        start_pos = np.searchsorted(self._days, start_time, 'left')
+        end_pos = np.searchsorted(self._days, end_time, 'right')
+        return pd.DatetimeIndex(self._days[start_pos:end_pos])
+
+    def count(self, start_time, end_time):
+        '''
+        计算[start_time, end_time]之间（包含首尾）交易日的数量，start_time和end_time中任意一个可以为日期序列
+
+        Return
+        ------
+        out: int or np.array
+        '''
+        start_time, start_scalar = self._to_int(start_time)
+        end_time, end_scalar = self._to_int(end_time)
+        out = (np.searchsorted(self._days, end_time, 'right') -
+               np.searchsorted(self._days, start_time, 'left'))
+        out = np.maximum(out, 0)
+        if start_scalar and end_scalar:
+            return int(out[0])
+        return out
+
+    def recent(self, dates):
+        '''
+        获取小于或者等于给定日期的最近交易日，没有对应交易日时返回NaT
+        '''
+        return self.pshift(dates, 1)
+
+    def next(self, dates):
+        '''
+        获取大于或者等于给定日期的最近交易日，没有对应交易日时返回NaT
+        '''
+        return self.fshift(dates, 1)
+
+    def pshift(self, dates, offset):
+        '''
+        往前（过去）推移，使得结果到给定日期之间（包含首尾）恰好包含offset个交易日，offset必须为正数，
+        超出日历范围时返回NaT
+        '''
+        assert offset > 0, "offset参数不合法，必须为正数，提供的参数为{}".format(offset)
+        dates, is_scalar = self._to_int(dates)
+        pos = np.searchsorted(self._days, dates, 'right') - offset
+        return self._to_dates(pos, is_scalar)
+
+    def fshift(self, dates, offset):
+        '''
+        往后（未来）推移，使得给定日期到结果之间（包含首尾）恰好包含offset个交易日，offset必须为正数，
+        超出日历范围时返回NaT
+        '''
+        assert offset > 0, "offset参数不合法，必须为正数，提供的参数为{}".format(offset)
+        dates, is_scalar = self._to_int(dates)
+        pos = np.searchsorted(self._days, dates, 'left') + offset - 1
+        return self._to_dates(pos, is_scalar)
+
+    def is_period_end(self, dates, fmt='%Y-%m'):
+        '''
+        判断给定的日期是否为所在分组（通过strftime(fmt)分组）的最后一个交易日，即其后一个交易日
+        （fshift(dates, 2)）是否属于另一个分组
+
+        Return
+        ------
+        out: boolean or np.array
+        '''
+        next_day = self.fshift(dates, 2)
+        dates, is_scalar = self._to_int(dates)
+        if is_scalar:
+            next_day = pd.DatetimeIndex([next_day])
+        out = np.asarray(pd.DatetimeIndex(dates).strftime(fmt) != next_day.strftime(fmt))
+        if is_scalar:
+            return bool(out[0])
+        return out
+
+
+# 已经加载的日历，格式为{file_name: (mtime, TradingCalendar)}，文件被修改后会重新加载
+_CALENDAR_CACHE = {}
+
+
+def load_calendar(fileName=TDS_FILE_PATH):
+    '''
+    从文件中加载交易日历，同一文件只在第一次调用或者文件被修改后读取
+
+    Parameter
+    ---------
+    fileName: str, default TDS_FILE_PATH
+        交易日文件的路径
+
+    Return
+    ------
+    out: TradingCalendar
+    '''
+    mtime = getmtime(fileName)
+    cached = _CALENDAR_CACHE.get(fileName)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(fileName, 'rb') as f:
+        calendar = TradingCalendar(pickle.load(f))
+    _CALENDAR_CACHE[fileName] = (mtime, calendar)
+    return calendar
+
+
+def get_calendar(startTime, endTime, fileName=TDS_FILE_PATH):
+    '''
+    获取覆盖给定时间区间的交易日历，如果文件不存在或者文件中的交易日不能覆盖给定的区间，会从Wind中
+    下载时间区间为(min(startTime, fileStartTime), max(endTime, fileEndTime))的交易日数据，并写入文件
+
+    Parameter
+    ---------
+    startTime: type that can be converted by pd.to_datetime
+        需要覆盖的起始时间
+    endTime: type that can be converted by pd.to_datetime
+        需要覆盖的终止时间
+    fileName: str, default TDS_FILE_PATH
+        交易日文件的路径
+
+    Return
+    ------
+    out: TradingCalendar
+    '''
+    startTime = time2wind(pd.to_datetime(startTime).to_pydatetime())
+    endTime = time2wind(pd.to_datetime(endTime).to_pydatetime())
+    try:
+        calendar = load_calendar(fileName)
+    except FileNotFoundError:
+        calendar = None
+    if calendar is None or not calendar.covers(startTime, endTime):
+        # 当提供的时间为非交易日时，则每次调用都会超出文件范围，导致需要调用Wind
+        if calendar is not None:
+            startTime = min(calendar.start.to_pydatetime(), startTime)
+            endTime = max(calendar.end.to_pydatetime(), endTime)
+        tds = get_tds_wind(startTime, endTime)
+        with open(fileName, 'wb') as f:
+            pickle.dump(tds, f)
+        calendar = load_calendar(fileName)
+    return calendar
+
+
 def get_tds(startTime, endTime, fileName=TDS_FILE_PATH):
     '''
-    获取给定时间区间内的交易日，该函数会先检测是否有公用文件，如果有会从文件中读取交易日的数据，读取之后会将
-    所读取的日期与给定的日期做比较，然后返回需要的交易日，如果所需要的交易日超过了文件的范围，则会从
-    Wind中下载时间区间为(min(startTime, fileStartTime), max(endTime, fileEndTime))的交易日数据，并写入
-    文件数据
+    获取给定时间区间内的交易日，交易日数据通过get_calendar获取，文件中的交易日不能覆盖给定的区间时
+    会从Wind中下载并更新文件
     @param:
         startTime: 交易日的起始日期，要求为dt.datetime格式或者YYYY-MM-DD格式
         endTime: 交易日的终止日期，同上述要求
@@ -110,42 +324,10 @@ def get_tds(startTime, endTime, fileName=TDS_FILE_PATH):
     @return:
         tds: 交易日列表
     备注：
-        若startTime, endTime均为交易日，则二者均被包含到结果中，且microsecond=5000
+        若startTime, endTime均为交易日，则二者均被包含到结果中，且microsecond=0
     '''
-    try:
-        with open(fileName, 'rb') as f:
-            rawTDs = pickle.load(f)
-    except FileNotFoundError:  # 更改为Python2的IOError
-        tds = get_tds_wind(startTime, endTime)
-        with open(fileName, 'wb') as f:
-            pickle.dump(tds, f)
-        return tds
-
-    def str2dt(dtStr):    # 用于将字符串转换为dt.datetime
-        return time2wind(dt.datetime.strptime(dtStr, '%Y-%m-%d'))
-    if isinstance(startTime, str):
-        startTime = str2dt(startTime)
-    else:
-        startTime = time2wind(startTime)
-    if isinstance(endTime, str):
-        endTime = str2dt(endTime)
-    else:
-        endTime = time2wind(endTime)
-    fileStartTime = rawTDs[0]
-    fileEndTime = rawTDs[-1]
-    if (fileStartTime > time2wind(startTime) or
-            fileEndTime < time2wind(endTime)):     # 当前时间区间超过了文件中的范围
-        # 当提供的时间为非交易日时，则每次调用都会超出文件范围，导致需要调用Wind
-        tds = get_tds_wind(min(fileStartTime, startTime), max(fileEndTime, endTime))
-        with open(fileName, 'wb') as f:
-            pickle.dump(tds, f)
-        tds = pd.Series(tds)
-        tds = tds[(tds >= startTime) & (tds <= endTime)].tolist()
-        return tds
-    else:
-        rawTDs = pd.Series(rawTDs)
-        tds = rawTDs[(rawTDs >= startTime) & (rawTDs <= endTime)].tolist()
-        return tds
+    calendar = get_calendar(startTime, endTime, fileName)
+    return calendar.range(startTime, endTime).to_pydatetime().tolist()
 
 
 def wind_time_standardlization(data, colName=None):
@@ -281,13 +463,12 @@ def tdcount(days, end_time, method='close'):
     '''
     if isinstance(days, (str, dt.datetime)):
         days = [days]
-    days = [pd.to_datetime(t) for t in days]
-    min_day = min(days)
-    tds = get_tds(min_day, end_time)
-    out = [len([d for d in tds if d >= t and d <= end_time]) for t in days]
+    days = pd.to_datetime(list(days))
+    calendar = get_calendar(days.min(), end_time)
+    out = calendar.count(days, end_time)
     if method == 'half-close':
-        out = [x - 1 for x in out]
-    return out
+        out = out - 1
+    return out.tolist()
 
 
 def get_rebtd(start_time, end_time, freq='M', nth=-1):
@@ -336,9 +517,9 @@ def get_recent_td(day):
     '''
     offset = dt.timedelta(30)
     start_date = pd.to_datetime(day) - offset
-    tds = get_tds(start_date, day)
-    assert len(tds) > 0, "Error, time duration too short"
-    return tds[-1]
+    out = get_calendar(start_date, day).recent(day)
+    assert out is not pd.NaT, "Error, time duration too short"
+    return out
 
 
 def tds_count(start_time, end_time):
@@ -356,8 +537,7 @@ def tds_count(start_time, end_time):
     -----
     计数包含起始的时间
     '''
-    tds = get_tds(start_time, end_time)
-    return len(tds)
+    return get_calendar(start_time, end_time).count(start_time, end_time)
 
 
 def tds_shift(date, offset):
@@ -405,8 +585,7 @@ def tds_pshift(date, offset):
     '''
     assert offset > 0, "offset参数不合法，必须为正数，提供的参数为{}".format(offset)
     pre_date = tds_shift(date, offset)
-    tds = get_tds(pre_date, date)
-    return tds[-offset]
+    return get_calendar(pre_date, date).pshift(date, offset)
 
 
 def tds_fshift(date, offset):
@@ -427,8 +606,7 @@ def tds_fshift(date, offset):
     '''
     assert offset > 0, 'offset参数不合法，必须为正数，提供的参数为{}'.format(offset)
     forward_date = tds_shift(date, -offset)
-    tds = get_tds(date, forward_date)
-    return tds[offset - 1]
+    return get_calendar(date, forward_date).fshift(date, offset)
 
 
 def get_period_end(dates, fmt='%Y-%m', td_flag=True):
@@ -455,17 +633,17 @@ def get_period_end(dates, fmt='%Y-%m', td_flag=True):
     程序会通过自动判断来剔除这个数据，即结果中没有12月份的最后一个日期的数据
     '''
     by_freq = groupby(dates, lambda x: x.strftime(fmt))
+    group_max = [max(ds) for k, ds in by_freq]
+    if not group_max:
+        return []
     if td_flag:
-        def next_day_func(x):
-            return tds_fshift(x, 2)
+        last_day = max(group_max)
+        calendar = get_calendar(min(group_max), tds_shift(last_day, -2))
+        is_end = calendar.is_period_end(group_max, fmt)
     else:
-        def next_day_func(x):
-            return x + dt.timedelta(1)
-    out = []
-    for k, ds in by_freq:
-        tmp_max = max(ds)
-        if tmp_max.strftime(fmt) != next_day_func(tmp_max).strftime(fmt):    # 表明当前最大值并非为该分组下最后一日
-            out.append(tmp_max)
+        is_end = [x.strftime(fmt) != (x + dt.timedelta(1)).strftime(fmt) for x in group_max]
+    # 当前最大值并非为该分组下最后一日的分组会被剔除
+    out = [x for x, flag in zip(group_max, is_end) if flag]
     return sorted(out)
 
 
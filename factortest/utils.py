@@ -162,7 +162,7 @@ class HDFDataProvider(DataProvider):
     从fmanager中定义的HDF文件中加载数据
     '''
 
-    def __init__(self, data_path, start_date=None, end_date=None):
+    def __init__(self, data_path, start_date=None, end_date=None, mmap=False):
         '''
         Parameter
         ---------
@@ -172,26 +172,34 @@ class HDFDataProvider(DataProvider):
             加载数据的起始时间
         end_date: types that are compatible to datetime, default None
             加载数据的终止时间
+        mmap: boolean, default False
+            是否优先通过内存映射文件加载数据，详见fmanager.database.DBConnector
 
         Notes
         -----
         加载的数据包含start_date和end_date（如果有数据）
         '''
         super().__init__(data_path, start_date, end_date)
+        self._mmap = mmap
 
     def load_data(self):
         '''
         从数据文件中加载数据
         '''
         if not self.loaded:
-            self._db = DBConnector(self._data_path)
+            self._db = DBConnector(self._data_path, mmap=self._mmap)
             _data = self._db.query((self._start_time, self._end_time))
             # 避免universe的冲突
-            universe = get_universe()
+            universe = sorted(get_universe())
             default_data = self._db.default_data
             if isinstance(default_data, np.bytes_):
                 default_data = default_data.decode('utf8')
-            self._data = _data.reindex(columns=sorted(universe)).fillna(default_data)
+            if _data.columns.tolist() != universe:
+                _data = _data.reindex(columns=universe)
+            if not (isinstance(default_data, float) and np.isnan(default_data)):
+                # 数值型数据的默认值为NA，不需要填充，避免复制（内存映射）数据
+                _data = _data.fillna(default_data)
+            self._data = _data
             if self._data is None:
                 self.loaded = False
             else:
@@ -309,7 +317,7 @@ class HDFDataProvider(DataProvider):
         '''
         拷贝，返回的对象数据未加载
         '''
-        return HDFDataProvider(self._data_path, self._start_time, self._end_time)
+        return HDFDataProvider(self._data_path, self._start_time, self._end_time, self._mmap)
 
 
 class NoneDataProvider(DataProvider):
@@ -36,20 +36,31 @@ __version__ = 1.3.0
 修改内容：
     1. 将SQL语句全部移动到一个新的数据文件中
     2. 添加朝阳永续的数据库
+
+修改日期：2026-10-17
+修改内容：
+    1. clean_data改为按列转换数据，Decimal数据列整体转换为float64
+    2. 数据库对象支持fetch_batches时，get_db_data分批获取并转换数据
+    3. 添加FETCH_STATS，记录get_db_data的累计查询次数、获取行数和耗时
+    4. 数据源可替换：添加set_data_source和use_local_db，可以使用本地SQLite数据库（SQLite.py）代替
+       聚源和朝阳永续数据库，设置环境变量FDGETTER_LOCAL_DB时自动使用对应的本地数据库
+    5. 添加reconnect_data_sources，用于在进程池的工作进程中重新建立数据源的连接
 '''
 __version__ = '1.2.1'
 
 import pdb
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
 import datatoolkits
 from decimal import Decimal
 import functools
 import imp
+import os
 import numpy as np
 import pandas as pd
 # import SQLserver
 import sqlstmts
 import sysconfiglee
+import time
 # from sqlstmts import BASIC_SQLs
 # 防止sqlstmts更新后，reload不会更新
 imp.reload(sqlstmts)
@@ -58,6 +69,74 @@ BASIC_SQLs = sqlstmts.BASIC_SQLs
 # 从常量模块中获取数据库标识
 jydb = sysconfiglee.get_database('jydb')
 zyyx = sysconfiglee.get_database('zyyx')
+LOCAL_DB_ENV = 'FDGETTER_LOCAL_DB'     # 指定本地数据库文件路径的环境变量
+FETCH_BATCH_SIZE = 50000    # 分批获取数据时每批的行数
+# get_db_data的累计统计数据（当前进程），用于更新过程的性能记录
+FETCH_STATS = {'queries': 0, 'rows': 0, 'time': 0.}
+# 重新建立连接后被替换的连接对象，见reconnect_data_sources
+_REPLACED_CONNECTIONS = []
+# --------------------------------------------------------------------------------------------------
+# 数据源设置
+
+
+def set_data_source(name, db):
+    '''
+    替换数据源
+
+    Parameter
+    ---------
+    name: str
+        数据源名称，只支持{'jydb', 'zyyx'}
+    db: object
+        新的数据源，要求实现fetchall(sql)方法，可选实现fetch_batches(sql, size)方法
+    '''
+    assert name in ('jydb', 'zyyx'), 'Error, invalid data source name({name})!'.format(name=name)
+    globals()[name] = db
+
+
+def use_local_db(path):
+    '''
+    将聚源和朝阳永续数据源都替换为本地的SQLite数据库，数据库可以由SQLite.build_synthetic_db生成
+
+    Parameter
+    ---------
+    path: str
+        本地数据库文件路径
+
+    Notes
+    -----
+    以fork方式启动的工作进程会继承该设置以及父进程中已经建立的连接，多个进程共用同一个连接会造成
+    查询结果错误，工作进程中需要使用reconnect_data_sources重新建立连接；以spawn方式启动的工作进程
+    不会继承该设置，需要通过环境变量FDGETTER_LOCAL_DB指定本地数据库
+    '''
+    from SQLite import SQLite
+    db = SQLite(path)
+    db.connect()
+    set_data_source('jydb', db)
+    set_data_source('zyyx', db)
+
+
+def reconnect_data_sources():
+    '''
+    在当前进程中重新建立所有数据源的连接，用于以fork方式启动的工作进程（工作进程会继承父进程中已经
+    建立的连接，多个进程共用同一个连接会造成查询结果错误）
+
+    Notes
+    -----
+    被替换的连接与父进程共用底层的socket（或者文件句柄），在子进程中关闭会影响父进程的连接，因此只保留
+    其引用，不进行关闭
+    '''
+    reconnected = set()
+    for db in (jydb, zyyx):
+        if db is None or id(db) in reconnected:
+            continue
+        _REPLACED_CONNECTIONS.append((getattr(db, 'conn', None), getattr(db, 'cur', None)))
+        db.connect()
+        reconnected.add(id(db))
+
+
+if os.environ.get(LOCAL_DB_ENV):
+    use_local_db(os.environ[LOCAL_DB_ENV])
 # --------------------------------------------------------------------------------------------------
 # 数据处理函数
 
@@ -78,21 +157,52 @@ def clean_data(raw_data, col_names, replacer=None):
     '''
     if len(raw_data) == 0:
         return datatoolkits.gen_df(col_names)
+    if replacer is not None:
+        res = list()
+        for col in raw_data:
+            cleaned_data = [replacer(d) for d in col]
+            res.append(dict(zip(col_names, cleaned_data)))
+        return pd.DataFrame(res)
+    return clean_batches([raw_data], col_names)
+
+
+def _convert_column(col):
+    '''
+    按照clean_data的规则转换一列数据，Decimal数据列（或者全部为None的数据列）整体转换为
+    np.array(dtype=float)，其他数值数据列由numpy推断类型，非数值数据列转换为np.array(dtype=object)，
+    其中的None替换为np.nan
+
+    注：数据库中同一列的数据类型相同，因此只根据第一个非None的数据判断数据列的类型
+    '''
+    first = next((d for d in col if d is not None), None)
+    if first is None or isinstance(first, Decimal):
+        return np.fromiter((np.nan if d is None else d for d in col), dtype=float, count=len(col))
+    if isinstance(first, (int, float)):
+        return np.array([np.nan if d is None else d for d in col])
+    out = np.fromiter(col, dtype=object, count=len(col))
+    if None in col:
+        out[np.equal(out, None)] = np.nan
+    return out
 
-    def inner_replacer(data):
-        if isinstance(data, Decimal):
-            return float(data)
-        elif data is None:
-            return np.nan
-        else:
-            return data
-    res = list()
-    if replacer is None:
-        replacer = inner_replacer
-    for col in raw_data:
-        cleaned_data = [replacer(d) for d in col]
-        res.append(dict(zip(col_names, cleaned_data)))
-    return pd.DataFrame(res)
+
+def clean_batches(batches, col_names):
+    '''
+    按列转换分批获取的数据，转换规则与clean_data相同
+
+    @param:
+        batches: 可迭代对象，每个元素为一批从数据库中取出的原始数据（行的列表）
+        col_names: 与数据相对应的各个列的列名
+    @return:
+        转换后的数据，格式为pd.DataFrame，若没有数据，则返回空的DataFrame
+    '''
+    columns = [[] for _ in col_names]
+    for batch in batches:
+        for container, col in zip(columns, zip(*batch)):
+            container.append(_convert_column(col))
+    if len(columns[0]) == 0:
+        return datatoolkits.gen_df(col_names)
+    res = OrderedDict((name, np.concatenate(parts)) for name, parts in zip(col_names, columns))
+    return pd.DataFrame(res, columns=list(res.keys()))
 
 
 def gen_sql_cols(cols, sql_type):
@@ -139,7 +249,7 @@ def format_sql(sql, code='', start_time=pd.to_datetime('1990-01-01'),
 
 
 def get_db_data(sql, code='', start_time=pd.to_datetime('1990-01-01'),
-                end_time=pd.to_datetime('1990-01-01'), cols=('',), db=jydb, add_stockcode=True):
+                end_time=pd.to_datetime('1990-01-01'), cols=('',), db=None, add_stockcode=True):
     '''
     从数据库中取出数据
     @param:
@@ -148,15 +258,23 @@ def get_db_data(sql, code='', start_time=pd.to_datetime('1990-01-01'),
         start_time: 时间区间起点，可以为datetime或者str格式
         end_time: 时间区间终点，格式同上
         cols: 数据列对应的列名，应当为gen_sql_cols返回的参数
-        db: 使用的数据库源，默认为jydb（模块内部提供）
+        db: 使用的数据库源，默认为None表示使用jydb（模块内部提供，可以通过set_data_source替换）
         add_stockcode: 是否在数据结果中添加股票代码，默认为添加（True）
     @return:
         从数据库中取出经过基本处理的DataFrame数据
     '''
+    if db is None:
+        db = jydb
     sql = format_sql(sql, code, start_time, end_time)
-    data = db.fetchall(sql)
-    # pdb.set_trace()
-    data_cleaned = clean_data(data, cols)
+    start = time.time()
+    if hasattr(db, 'fetch_batches'):    # 分批获取数据，减少原始数据占用的内存
+        data_cleaned = clean_batches(db.fetch_batches(sql, FETCH_BATCH_SIZE), cols)
+    else:
+        data = db.fetchall(sql)
+        data_cleaned = clean_data(data, cols)
+    FETCH_STATS['queries'] += 1
+    FETCH_STATS['rows'] += len(data_cleaned)
+    FETCH_STATS['time'] += time.time() - start
     if add_stockcode:
         data_cleaned['code'] = len(data_cleaned) * [code]
     return data_cleaned
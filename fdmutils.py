@@ -18,8 +18,20 @@ __version__ = 1.01
     1. 添加isvalid_rptdate
     2. 添加get_latest_rptdate
     3. 修改计算ttm和季度往前推的函数
+
+__version__ = 1.1.0
+修改日期：2026-10-17
+修改内容：
+    添加cal_pit_panel，使用排序和累计运算批量计算所有股票在每个交易日可观测到的TTM、往前推N个
+    季度和往前推N个财年的数据，结果与get_observabel_data+cal_ttm/cal_season/cal_yr+map_data一致
+修改日期：2026-10-17
+修改内容：
+    cal_pit_panel使用datatoolkits.map_data_bulk映射到交易日
+修改日期：2026-10-17
+修改内容：
+    cal_pit_panel的文档中说明较早报告期的数据在较新报告期之后发布时与原有过程的差异
 '''
-__version__ = '1.01'
+__version__ = '1.1.0'
 
 
 from pdb import set_trace
@@ -219,6 +231,148 @@ def cal_season(df, col_name, rpt_col='rpt_date', offset=1, rename=None):
     return res
 
 
+
+# --------------------------------------------------------------------------------------------------
+# 批量计算时点数据
+VALID_RPT_MONTHDAY = (331, 630, 930, 1231)  # 合法报告期的月日，格式为month*100+day
+
+
+def _rptdate2quarter(dates):
+    '''
+    将报告期转换为季度序号（year*4+季度-1），非法报告期转换为-1
+    '''
+    dates = pd.DatetimeIndex(dates)
+    monthday = dates.month * 100 + dates.day
+    quarter = dates.year * 4 + (dates.month - 1) // 3
+    return np.where(np.isin(monthday, VALID_RPT_MONTHDAY), quarter, -1)
+
+
+def cal_pit_panel(data, days, method, n=1, col_name='data', code_col='code',
+                  rpt_col='rpt_date', update_col='update_time'):
+    '''
+    批量计算所有股票在每个交易日可观测到的财务数据，除Notes中说明的情况外，计算结果与以下过程一致：
+    按股票分组使用get_observabel_data获取每个观测日的数据，然后按照(股票, 观测日)分组使用
+    cal_ttm(nperiod=n)、cal_season(offset=n)或者cal_yr(offset=n)计算，最后使用map_data
+    (fromNowOn=False)映射到交易日并转换为面板数据
+
+    Parameter
+    ---------
+    data: pd.DataFrame
+        从数据库中获取的原始数据，要求至少包含[code_col, rpt_col, update_col, col_name]列，且
+        每只股票的数据按照更新时间升序排列（同一更新时间的多条记录中，后面的记录覆盖前面的记录）
+    days: iterable
+        需要映射的交易日序列
+    method: str
+        计算方法，只支持{'ttm', 'season', 'year'}，分别对应cal_ttm、cal_season和cal_yr
+    n: int, default 1
+        ttm对应nperiod，season和year对应offset
+    col_name: str, default 'data'
+        数据列
+    code_col: str, default 'code'
+        股票代码列
+    rpt_col: str, default 'rpt_date'
+        报告期列
+    update_col: str, default 'update_time'
+        更新时间列
+
+    Return
+    ------
+    out: pd.DataFrame
+        index为交易日，columns为数据中出现的股票代码（升序），没有数据的位置为NA
+
+    Notes
+    -----
+    计算方法：将每一条记录的更新视为一次观测，按照(股票, 报告期, 观测序号)排序后，每个观测日每个
+    报告期的最新值可以通过searchsorted直接定位；由于可观测到的报告期集合随着观测只增不减，最新报告期
+    可以通过累计最大值得到。非合法报告期（月日不在03-31、06-30、09-30、12-31中）的记录会被忽略
+    与原有过程的差异：较早报告期的数据在较新报告期的数据之后才发布（首次发布或者更正）时，本函数
+    仍然以可观测到的最大报告期作为最新报告期，并使用各个报告期最新发布的数据；原有过程中，若观测日
+    每个报告期都只有一条记录，get_observabel_data的结果按照发布时间排列，cal_ttm和cal_season会将
+    最后发布的报告期作为最新报告期（例如TTM会对超过nperiod个报告期求和）
+    '''
+    assert method in ('ttm', 'season', 'year'), \
+        'Error, invalid method({m}), only "ttm", "season" and "year" are supported!'.format(m=method)
+    assert n >= 1, 'Error, n should be positive!'
+    days = pd.DatetimeIndex(sorted(days))
+    data = data.dropna(subset=[code_col, rpt_col, update_col])
+    quarter = _rptdate2quarter(data[rpt_col])
+    valid_mask = quarter >= 0
+    if method == 'year':    # 年报数据只使用年报记录，其他记录不会改变观测结果
+        valid_mask = valid_mask & (quarter % 4 == 3)
+    data = data.loc[valid_mask]
+    quarter = quarter[valid_mask]
+    if len(data) == 0:
+        return pd.DataFrame(index=pd.Index(days, name='time'),
+                            columns=pd.Index([], name='code'), dtype=np.float64)
+    codes, code_id = np.unique(data[code_col].values, return_inverse=True)
+    code_num = len(codes)
+    utime = pd.DatetimeIndex(data[update_col]).values.astype('datetime64[ns]').view('int64')
+    values = np.asarray(data[col_name].values, dtype=np.float64)
+    # 稳定排序，保证同一更新时间的记录保持原有的顺序
+    order = np.lexsort((utime, code_id))
+    code_id, utime, quarter, values = code_id[order], utime[order], quarter[order], values[order]
+
+    # 每个(股票, 更新时间)为一次观测
+    ev_flag = np.concatenate([[True], (code_id[1:] != code_id[:-1]) | (utime[1:] != utime[:-1])])
+    ev_start = np.flatnonzero(ev_flag)
+    rec_event = np.cumsum(ev_flag) - 1
+    ev_code = code_id[ev_start]
+    ev_time = utime[ev_start]
+    ev_num = len(ev_start)
+    ev_idx = np.arange(ev_num)
+
+    # 按照(股票, 报告期, 观测序号)排序，用于查询每个观测日每个报告期的最新值
+    qmin = quarter.min()
+    quarter_num = quarter.max() - qmin + 1
+    rec_cq = code_id * quarter_num + (quarter - qmin)
+    order = np.lexsort((rec_event, rec_cq))
+    rec_cq = rec_cq[order]
+    rec_key = rec_cq * ev_num + rec_event[order]
+    rec_value = values[order]
+
+    def lookup(ev_quarter):
+        # 查询每次观测时，对应报告期的最新值
+        in_range = (ev_quarter >= qmin) & (ev_quarter < qmin + quarter_num)
+        cq = ev_code * quarter_num + (np.clip(ev_quarter, qmin, qmin + quarter_num - 1) - qmin)
+        pos = np.searchsorted(rec_key, cq * ev_num + ev_idx, side='right') - 1
+        pos_valid = np.maximum(pos, 0)
+        found = in_range & (pos >= 0) & (rec_cq[pos_valid] == cq)
+        return found, np.where(found, rec_value[pos_valid], np.nan)
+
+    if method == 'year':
+        year = quarter // 4
+        ymin = year.min()
+        year_num = year.max() - ymin + 1
+        # 每只股票每个财年首次被观测到的观测序号
+        first_seen = np.full((code_num, year_num), ev_num, dtype=np.int64)
+        np.minimum.at(first_seen, (code_id, year - ymin), rec_event)
+        seen = first_seen[ev_code] <= ev_idx[:, np.newaxis]
+        seen_cnt = np.cumsum(seen[:, ::-1], axis=1, dtype=np.int32)[:, ::-1]
+        target = seen & (seen_cnt == n)
+        has_target = target.any(axis=1)
+        target_quarter = (target.argmax(axis=1) + ymin) * 4 + 3
+        found, ev_value = lookup(target_quarter)
+        ev_value = np.where(has_target & found, ev_value, np.nan)
+    else:
+        ev_maxq = np.maximum.reduceat(quarter, ev_start)
+        ltst_quarter = pd.Series(ev_maxq).groupby(ev_code).cummax().values
+        all_found = np.ones(ev_num, dtype=bool)
+        ev_values = []
+        for i in range(n):
+            found, value = lookup(ltst_quarter - i)
+            all_found &= found
+            ev_values.append(value)
+        if method == 'ttm':
+            ev_value = np.nansum(ev_values, axis=0)     # 与DataFrame.sum一致，忽略NA值
+        else:
+            ev_value = ev_values[-1]
+        ev_value = np.where(all_found, ev_value, np.nan)
+
+    ev_data = pd.DataFrame({'code': codes[ev_code], 'time': ev_time.view('datetime64[ns]'),
+                            'data': ev_value})
+    return datatoolkits.map_data_bulk(ev_data, days, fromNowOn=False)
+
+
 if __name__ == '__main__':
     dates = [pd.to_datetime('2011-03-31'), pd.to_datetime('2011-06-30'),
              pd.to_datetime('2011-09-30'), pd.to_datetime('2011-12-31'),
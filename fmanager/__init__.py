@@ -14,12 +14,15 @@ from fmanager.factors.dictionary import (get_factor_dict,
                                          update_factordict,
                                          list_allfactor,
                                          get_factor_detail)
-from fmanager.factors.query import query, generate_getter
+from fmanager.factors.query import (query, query_many, generate_getter, enable_query_cache,
+                                    disable_query_cache)
 from fmanager.factors.utils import get_universe
 from fmanager.update import (auto_update_all,
                              update_universe,
                              auto_update_all,
+                             recalculate_factors,
                              set_logger)
+from fmanager.profiling import profile_report
 from fmanager.factors.deptree import (build_dependency_tree,
                                       dependency_order,
                                       has_dependency_on,
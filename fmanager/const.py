@@ -12,3 +12,6 @@ SUFFIX = '.h5'  # 因子文件后缀
 START_TIME = '2007-01-01'   # 因子最早可追溯的时间
 UNIVERSE_FILE_PATH = FACTOR_FILE_PATH + '\\' + 'universe.pickle'
 FACTOR_DICT_FILE_PATH = FACTOR_FILE_PATH + '\\' + 'factor_dict.pickle'
+QUERY_CACHE_PATH = FACTOR_FILE_PATH + '\\' + 'query_cache'   # 查询结果缓存的目录
+QUERY_CACHE_SIZE = 2 * 1024 ** 3    # 查询结果缓存的最大容量（字节）
+UPDATE_PROFILE_FILE_PATH = FACTOR_FILE_PATH + '\\' + 'update_profile.jsonl'    # 更新过程的性能记录
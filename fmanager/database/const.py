@@ -9,3 +9,15 @@ from datetime import datetime
 MAX_COL_SIZE = 4000
 NaS = 'NaS'
 FIRST_TRADING_DAY = datetime(1990, 1, 1)
+DATE_INDEX_DTYPE = 'i8'     # 整数日期索引（YYYYMMDD）的数据格式
+FANCY_READ_RATIO = 0.1  # 查询的股票数量不超过有效股票数量的该比例时，只读取对应的数据列
+FORMAT_VERSION = 3  # 当前数据文件的格式版本，没有记录版本的旧文件视为版本1
+DEFAULT_CHUNKS = (256, 64)  # 默认的数据分块形状，(时间方向长度, 股票方向长度)
+DEFAULT_COMPRESSION = 'gzip'    # 默认的无损压缩方法
+DEFAULT_COMPRESSION_OPTS = 4    # gzip压缩等级
+MIGRATE_BATCH_SIZE = 500    # 迁移文件时每次复制的日期数量
+MMAP_SUFFIX = '.npy'    # 内存映射文件的后缀，映射文件路径为数据文件路径加上该后缀
+LOCK_SUFFIX = '.lock'   # 文件锁的后缀，锁文件路径为数据文件路径加上该后缀
+LOCK_TIMEOUT = 600  # 等待文件锁的最长时间（秒）
+LOCK_POLL_INTERVAL = 0.05   # 等待文件锁时轮询的时间间隔（秒）
+COL_EXPAND_SIZE = 500  # 数据列不足时，每次在所需列数的基础上额外扩展的列数
@@ -10,9 +10,24 @@ __version__ = 1.0.0
 修改内容：
     初步完成基础数据存储模块
 
+修改日期：2026-10-17
+修改内容：
+    1. 添加整数日期索引（date_index），查询时通过二分查找仅读取对应时间区间的数据
+    2. 添加股票代码到数据列位置的映射（code_index），查询少量股票时只读取对应的数据列
+    3. 添加文件格式版本（format version），新格式支持自定义分块和无损压缩，添加migrate_dbfile
+    4. 添加内存映射（.npy）的只读访问方式，通过dump_mmap生成映射文件，mmap=True时优先读取
+    5. 所有对数据文件的读写都通过open_store在文件锁（读共享、写排他）的保护下进行
+    6. 新格式（版本3）的数据集在股票方向上也可以扩展，股票数量超过列数时原地扩展，不再需要重写文件
+    7. 添加overwrite_df，原地覆盖已有日期区间的数据
+    8. migrate_dbfile在整个迁移过程中持有源文件的锁，迁移完成后删除临时文件的锁文件
+
 '''
 __version__ = "1.0.0"
 # import datatoolkits
+from os import remove, replace
+from os.path import exists, getmtime
+from collections import OrderedDict
+from contextlib import contextmanager
 import time
 import dateshandle
 import numpy as np
@@ -22,6 +37,7 @@ import h5py
 
 # 本地文件
 from fmanager.database.const import *
+from fmanager.database.filelock import FileLock
 
 
 class DBConnector(object):
@@ -29,17 +45,32 @@ class DBConnector(object):
     负责处理底层数据的存储工作类，主要功能包含：存储文件初始化、添加初始数据，数据定期更新，数据提取
     '''
 
-    def __init__(self, path, size=MAX_COL_SIZE):
+    def __init__(self, path, size=MAX_COL_SIZE, mmap=False):
+        '''
+        Parameter
+        ---------
+        path: str
+            数据文件的路径
+        size: int, default MAX_COL_SIZE
+            初始化文件时横截面数据的长度（数据列的数量），已经存在的文件以文件中的列数为准
+        mmap: boolean, default False
+            是否优先通过内存映射的方式读取数据，要求已经通过dump_mmap生成了最新的映射文件，
+            如果映射文件不存在或者过期，则仍然从HDF5文件中读取
+        '''
         self.path = path
+        self._mmap = mmap   # 是否使用内存映射读取数据
+        self._mmap_cache = None  # 用于缓存内存映射的数据，格式为(mtime, data, date_index, code_index, data_type)
         self._data_time = None   # 用于缓存数据的最新时间
         self._code_order = None  # 用于缓存数据的股票代码顺序
+        self._code_index = None  # 用于缓存股票代码到数据列位置的映射
         self._code_dtype = 'S12'    # 用于标识标准股票代码数据格式
         self._date_dtype = 'S10'    # 用于标识标准日期数据格式
         self._size = size   # 用于标识横截面的数据的长度
         self._data_type = None   # 用于记录数据类型
         self._default_data = None    # 用于记录默认填充数据
 
-    def init_dbfile(self, data_type='f8'):
+    def init_dbfile(self, data_type='f8', chunks=DEFAULT_CHUNKS, compression=DEFAULT_COMPRESSION,
+                    compression_opts=DEFAULT_COMPRESSION_OPTS, shuffle=True):
         '''
         初始化一个HDF5文件
 
@@ -47,30 +78,47 @@ class DBConnector(object):
         ---------
         data_type: str
             文件的类型
+        chunks: tuple(int, int), default DEFAULT_CHUNKS
+            数据集的分块形状，格式为(时间方向长度, 股票方向长度)，股票方向长度超过列数时会被截断
+        compression: str, default DEFAULT_COMPRESSION
+            无损压缩方法，可选'gzip'、'lzf'，None表示不压缩
+        compression_opts: int, default DEFAULT_COMPRESSION_OPTS
+            压缩参数，仅对gzip有效（压缩等级0-9）
+        shuffle: boolean, default True
+            是否使用shuffle过滤器，对浮点数据可以显著提高压缩率
 
         Notes
         -----
         该操作中会创建一个新的文件，如果文件已经存在会报错。创建文件后，会按照数据的模板对数据进行初始化
         的设置。
+        新文件的格式版本为FORMAT_VERSION，数据集使用默认数据作为HDF5的填充值，未写入的分块不占用磁盘空间；
+        股票代码和数据集在股票方向上不限制最大长度，后续插入数据时可以原地扩展
         '''
-        with h5py.File(self.path, 'w-') as store:
+        if data_type.startswith('f'):   # 当数据类型时，填充数据为np.nan
+            self._default_data = np.nan
+        else:   # 当数据为字符串时，填充NAS字符（not a string）
+            self._default_data = np.bytes_(NaS)
+        chunks = (chunks[0], min(chunks[1], self._size))
+        if compression != 'gzip':
+            compression_opts = None
+        with open_store(self.path, 'w-') as store:
             # 考虑未来添加数据的格式改变的而需求，将数据的格式设置的更大一些
             store.create_dataset('date', shape=(1,), maxshape=(None,), dtype=self._date_dtype)
+            # 整数形式（YYYYMMDD）的日期索引，用于查询时二分查找
+            store.create_dataset('date_index', shape=(0,), maxshape=(None,), dtype=DATE_INDEX_DTYPE)
             store.create_dataset('code', shape=(self._size,), chunks=(self._size,),
-                                 dtype=self._code_dtype)
-            store.create_dataset('data', shape=(1, self._size), chunks=(1, self._size),
-                                 dtype=data_type, maxshape=(None, self._size))
-            if data_type.startswith('f'):   # 当数据类型时，填充数据为np.nan
-                self._default_data = np.nan
-            else:   # 当数据为字符串时，填充NAS字符（not a string）
-                self._default_data = np.bytes_(NaS)
+                                 maxshape=(None,), dtype=self._code_dtype)
+            store.create_dataset('data', shape=(1, self._size), chunks=chunks,
+                                 dtype=data_type, maxshape=(None, None),
+                                 fillvalue=self._default_data, compression=compression,
+                                 compression_opts=compression_opts, shuffle=shuffle)
             store.attrs['default data'] = self._default_data  # 用于标识默认填充数据
             store.attrs['status'] = 'empty'     # 用于标识是否有数据填充，包含两种状态（empty, filled）
             store.attrs['data time'] = 'nat'   # 用于标识数据的最新时间，初始化填充nat，即not a time
             store.attrs['data type'] = data_type    # 用于标识存储的数据类型，用于区分数字类数据和字符串
             store.attrs['#code'] = 0    # 记录当前数据中有效的股票数量
             store.attrs['#dates'] = 0   # 记录当前数据中有效的日期数量
-            store['data'][...] = self._default_data
+            store.attrs['format version'] = FORMAT_VERSION  # 记录文件格式版本
 
     def insert_data(self, code, date, data):
         '''
@@ -88,17 +136,17 @@ class DBConnector(object):
 
         Notes
         -----
-        在插入数据前会先做检查，传入的数据类型是否符合数据文件的要求
+        在插入数据前会先做检查，传入的数据类型是否符合数据文件的要求；
+        若股票数量超过了文件的列数，且文件支持在股票方向上扩展（版本3及以上），则原地扩展列数，
+        否则需要先通过migrate_dbfile或者reshape_colsize转换文件
         '''
-        with h5py.File(self.path, 'r+') as store:
+        with open_store(self.path, 'r+') as store:
             # 检查输入是否合法
             # assert store.attrs['status'] == 'empty', "cannot insert data to a filled dataset"
             assert store.attrs['data type'] == np.dtype(data.dtype), "data type error!" +\
                 "data type in dataset is {ds_type}, you provide |{p_type}".\
                 format(ds_type=data.dtype, p_type=store.attrs['data type'])
-            assert data.shape[1] < self._size,\
-                "data columns(len={data_len}) ".format(data_len=data.shape[1]) +\
-                "should be less than {max_len}".format(max_len=self._size)
+            col_size = ensure_col_size(store, data.shape[1])
             assert data.shape == (len(date), len(code)), "input data error, " +\
                 "data imply shape = {data_shape}, while code and date imply shape = {other_shape}".\
                 format(data_shape=data.shape, other_shape=(len(date), len(code)))
@@ -117,14 +165,19 @@ class DBConnector(object):
             data_dset = store['data']
             code_dset = store['code']
             date_dset.resize((new_datelen, ))
-            data_dset.resize((new_datelen, self._size))   # 此处resize后填充的数据为0
+            data_dset.resize((new_datelen, col_size))   # 此处resize后填充的数据为0
             date_dset[start_date:new_datelen] = date
+            index_dset = self._get_date_index_dset(store, start_date)
+            index_dset.resize((new_datelen, ))
+            index_dset[start_date:new_datelen] = dates2int(date)
             data_dset[start_date:new_datelen, :len(code)] = data
-            data_dset[start_date:new_datelen, len(code):] = self.default_data    # 填充其余位置的数据
+            if get_format_version(store) < 2:   # 旧格式文件没有设置填充值
+                data_dset[start_date:new_datelen, len(code):] = self.default_data    # 填充其余位置的数据
             code_dset[:len(code)] = code
             # 更新数据的最新时间和股票列表顺序
             self._data_time = pd.to_datetime(date[-1].decode('utf8'))
             self._code_order = [c.decode('utf8') for c in code]
+            self._code_index = {c: idx for idx, c in enumerate(self._code_order)}
 
     @property
     def data_time(self):
@@ -132,7 +185,7 @@ class DBConnector(object):
         返回最新的数据时间
         '''
         if self._data_time is None:
-            with h5py.File(self.path, 'r') as store:
+            with open_store(self.path, 'r') as store:
                 data_time = store.attrs['data time']
             if data_time == 'nat':
                 return None
@@ -147,7 +200,7 @@ class DBConnector(object):
         返回数据的股票代码顺序
         '''
         if self._code_order is None:
-            with h5py.File(self.path, 'r') as store:
+            with open_store(self.path, 'r') as store:
                 code_order = store['code'][...]
             code_order = [c.decode('utf8') for c in code_order if len(c) > 0]
             if len(code_order) == 0:
@@ -155,17 +208,96 @@ class DBConnector(object):
             return code_order
         return self._code_order
 
+    @property
+    def code_index(self):
+        '''
+        返回股票代码到数据列位置的映射，格式为{code: column position}
+        '''
+        if self._code_index is None:
+            with open_store(self.path, 'r') as store:
+                self._load_code_index(store)
+        return self._code_index
+
+    def _load_code_index(self, store):
+        '''
+        从文件中的code数据集构建股票代码到数据列位置的映射，并缓存在对象中
+
+        Parameter
+        ---------
+        store: h5py.File
+            已经打开的数据文件
+
+        Return
+        ------
+        out: dict
+            格式为{code: column position}
+        '''
+        if self._code_index is None:
+            code_len = store.attrs['#code']
+            codes = store['code'][:code_len]
+            self._code_index = {c.decode('utf8'): idx for idx, c in enumerate(codes)}
+        return self._code_index
+
+    @property
+    def format_version(self):
+        '''
+        返回数据文件的格式版本
+        '''
+        with open_store(self.path, 'r') as store:
+            return get_format_version(store)
+
     @property
     def default_data(self):
         '''
         以原始的形式返回数据库的默认填充数据
         '''
         if self._default_data is None:
-            with h5py.File(self.path, 'r') as store:
+            with open_store(self.path, 'r') as store:
                 self._default_data = store.attrs['default data']
         return self._default_data
 
-    def _query_panel(self, start_time, end_time):
+    def _get_date_index_dset(self, store, date_num):
+        '''
+        获取可写的日期索引数据集，对于没有日期索引的旧文件，会根据已有的日期数据创建日期索引
+
+        Parameter
+        ---------
+        store: h5py.File
+            以可写模式打开的数据文件
+        date_num: int
+            当前文件中有效的日期数量
+
+        Return
+        ------
+        out: h5py.Dataset
+        '''
+        if 'date_index' not in store:
+            index = dates2int(store['date'][:date_num])
+            store.create_dataset('date_index', data=index, maxshape=(None,),
+                                 dtype=DATE_INDEX_DTYPE)
+        return store['date_index']
+
+    def _load_date_index(self, store, date_num):
+        '''
+        读取整数日期索引，对于没有日期索引的旧文件，则直接由日期数据转换得到
+
+        Parameter
+        ---------
+        store: h5py.File
+            已经打开的数据文件
+        date_num: int
+            当前文件中有效的日期数量
+
+        Return
+        ------
+        out: np.array(dtype=DATE_INDEX_DTYPE)
+            升序排列的整数日期（YYYYMMDD）
+        '''
+        if 'date_index' in store:
+            return store['date_index'][:date_num]
+        return dates2int(store['date'][:date_num])
+
+    def _query_panel(self, start_time, end_time, codes=None):
         '''
         查询面板数据
 
@@ -175,41 +307,133 @@ class DBConnector(object):
             查询的数据的开始时间
         end_time: datetime
             查询的数据的结束时间
+        codes: list, default None
+            需要查询的股票代码，要求均为文件中有效的代码，None表示查询所有股票
 
         Return
         ------
         out: pd.DataFrame
-            返回结果数据，索引为时间，列为股票代码
+            返回结果数据，索引为时间，列为股票代码（若提供了codes，则顺序与codes相同）
             结果中只返回数据文件中有数据的部分，若查询时间都不在数据的时间范围内，则返回None
 
         Notes
         -----
         查询结果同时包含start_time和end_time的数据
+        若查询的股票数量较少（不超过有效股票数量的FANCY_READ_RATIO），则只读取对应的列，反之则读取
+        全部有效列后再进行选取
         '''
-
-        out = None
-        try:
-            store = h5py.File(self.path, 'r')
-            dset_dates = store['date']
-            codes = store['code']
+        if self._mmap:
+            mmap_data = self._load_mmap()
+            if mmap_data is not None:
+                return self._query_mmap(mmap_data, start_time, end_time, codes)
+
+        with open_store(self.path, 'r') as store:
+            date_num = int(store.attrs['#dates'])
+            if date_num == 0:   # 空文件
+                return None
+            date_index = self._load_date_index(store, date_num)
+            start_idx, end_idx = locate_dates(date_index, start_time, end_time)
+            if start_idx >= end_idx:    # 查询时间不在数据的时间范围内
+                return None
             code_len = store.attrs['#code']
-            codes = [c.decode('utf8') for c in codes[:code_len]]
             dset_data = store['data']
-            dset_dates = store['date'][...]
-            data = dset_data[:, :code_len]
             data_type = store.attrs['data type']
-            if data_type[0].lower() == 's':  # 检查数据的格式，如果为字符串则进行类型转换
-                new_data_type = 'U' + data_type[1:]
-                data = data.astype(new_data_type)
-            # dates = [pd.to_datetime(d.decode('utf8')) for d in dset_dates]  # 性能主要损耗点
-            dates = [s.decode('utf8') for s in dset_dates]
-            dates = pd.to_datetime(dates)
-            out = pd.DataFrame(data, index=dates, columns=codes)
-            out = out.loc[(out.index <= end_time) & (out.index >= start_time)]
-            if out.empty:
-                out = None
-        finally:
-            store.close()
+            if codes is None:
+                codes = [c.decode('utf8') for c in store['code'][:code_len]]
+                data = dset_data[start_idx:end_idx, :code_len]   # 仅读取时间区间对应的行
+            else:
+                code_index = self._load_code_index(store)
+                cols = np.array([code_index[c] for c in codes], dtype=np.int64)
+                if len(cols) <= code_len * FANCY_READ_RATIO:
+                    # h5py的花式索引要求索引升序且不重复
+                    read_cols, col_pos = np.unique(cols, return_inverse=True)
+                    data = dset_data[start_idx:end_idx, read_cols.tolist()][:, col_pos]
+                else:
+                    data = dset_data[start_idx:end_idx, :code_len][:, cols]
+        if data_type[0].lower() == 's':  # 检查数据的格式，如果为字符串则进行类型转换
+            new_data_type = 'U' + data_type[1:]
+            data = data.astype(new_data_type)
+        dates = int2dates(date_index[start_idx:end_idx])
+        out = pd.DataFrame(data, index=dates, columns=codes)
+        return out
+
+    @property
+    def mmap_path(self):
+        '''
+        返回内存映射文件的路径
+        '''
+        return self.path + MMAP_SUFFIX
+
+    def dump_mmap(self):
+        '''
+        将当前文件中的有效数据写入连续存储的内存映射文件（.npy），供mmap模式读取
+
+        Notes
+        -----
+        先写入临时文件，完成后再替换原有的映射文件，已经打开的映射不受影响；
+        映射文件的修改时间早于数据文件时视为过期，数据更新后需要重新调用该函数
+        '''
+        tmp_path = self.mmap_path + '.tmp'
+        with open_store(self.path, 'r') as store:
+            date_num = int(store.attrs['#dates'])
+            code_len = int(store.attrs['#code'])
+            dset_data = store['data']
+            out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=dset_data.dtype,
+                                            shape=(date_num, code_len))
+            for start_idx in range(0, date_num, MIGRATE_BATCH_SIZE):
+                end_idx = min(start_idx + MIGRATE_BATCH_SIZE, date_num)
+                out[start_idx:end_idx] = dset_data[start_idx:end_idx, :code_len]
+            out.flush()
+            del out
+        replace(tmp_path, self.mmap_path)
+        self._mmap_cache = None
+
+    def _load_mmap(self):
+        '''
+        加载内存映射数据，若映射文件不存在或者已经过期（早于数据文件），则返回None
+
+        Return
+        ------
+        out: tuple(data, date_index, code_index, data_type) or None
+            data为np.memmap，date_index为整数日期索引，code_index为股票代码到列位置的映射
+        '''
+        if not exists(self.mmap_path):
+            return None
+        mmap_mtime = getmtime(self.mmap_path)
+        if mmap_mtime < getmtime(self.path):    # 映射文件过期
+            return None
+        if self._mmap_cache is None or self._mmap_cache[0] != mmap_mtime:
+            # 使用copy-on-write模式，对结果的修改不会写回文件
+            data = np.load(self.mmap_path, mmap_mode='c')
+            with open_store(self.path, 'r') as store:
+                date_index = self._load_date_index(store, data.shape[0])
+                codes = store['code'][:data.shape[1]]
+                data_type = store.attrs['data type']
+            code_index = OrderedDict((c.decode('utf8'), idx) for idx, c in enumerate(codes))
+            self._mmap_cache = (mmap_mtime, data, date_index, code_index, data_type)
+        return self._mmap_cache[1:]
+
+    def _query_mmap(self, mmap_data, start_time, end_time, codes=None):
+        '''
+        从内存映射数据中查询面板数据，参数与返回值同_query_panel
+
+        Notes
+        -----
+        查询全部股票的数值型数据时，返回结果直接引用映射数据（不复制）
+        '''
+        data, date_index, code_index, data_type = mmap_data
+        start_idx, end_idx = locate_dates(date_index, start_time, end_time)
+        if start_idx >= end_idx:    # 查询时间不在数据的时间范围内
+            return None
+        data = data[start_idx:end_idx]
+        if codes is None:
+            codes = list(code_index.keys())
+        else:
+            data = data[:, [code_index[c] for c in codes]]
+        if data_type[0].lower() == 's':  # 检查数据的格式，如果为字符串则进行类型转换
+            data = data.astype('U' + data_type[1:])
+        dates = int2dates(date_index[start_idx:end_idx])
+        out = pd.DataFrame(data, index=dates, columns=codes, copy=False)
         return out
 
     def query(self, date, codes=None):
@@ -235,23 +459,75 @@ class DBConnector(object):
             start_time, end_time = [pd.to_datetime(d) for d in date]
         else:
             start_time = end_time = pd.to_datetime(date)
-        data = self._query_panel(start_time, end_time)
-        if data is None:    # 没有符合时间要求的数据
-            return None
         if codes is None:   # 返回所有股票的数据
-            return data
+            return self._query_panel(start_time, end_time)
         assert isinstance(codes, list), 'Error, parameter "codes" should be provides as a list!'
-        data_codes = self.code_order
-        valid_codes = [c for c in codes if c in data_codes]
+        code_index = self.code_index
+        valid_codes = [c for c in codes if c in code_index]
         invalid_codes = list(set(codes).difference(valid_codes))
         if len(invalid_codes) > 0:
             print("Warning: invalid codes({codes}) are queryed!".format(codes=invalid_codes))
         if len(valid_codes) == 0:   # 没有提供有效的股票代码
             return None
-
-        out = data.loc[:, codes]
+        data = self._query_panel(start_time, end_time, sorted(set(valid_codes)))
+        if data is None:    # 没有符合时间要求的数据
+            return None
+        out = data.reindex(columns=codes)
         return out
 
+    def overwrite_df(self, df, data_dtype=None):
+        '''
+        用DataFrame中的数据原地覆盖数据文件中对应日期的数据，用于修正历史数据
+
+        Parameter
+        ---------
+        df: pd.DataFrame
+            需要写入的数据，要求index为时间，columns为股票代码，且index必须是数据文件中已有的、连续的
+            一段日期（不要求与数据文件的最新时间相连）
+        data_dtype: str, default None
+            pd.DataFrame中的数据与数据库中的数据格式不匹配，需要对pd.DataFrame进行适当的转换，默认为
+            None表示不需要转换，否则则需要提供转换后的格式形式
+
+        Return
+        ------
+        out: pd.DataFrame
+            转换后的写入数据库中的数据
+
+        Notes
+        -----
+        覆盖区间内，文件中已有但df中没有的股票的数据会被设置为默认数据；df中新出现的股票会添加到文件的
+        股票代码末尾，这些股票在覆盖区间以外的数据为默认数据
+        '''
+        df = df.sort_index()
+        with open_store(self.path, 'r+') as store:
+            date_num = int(store.attrs['#dates'])
+            date_index = self._load_date_index(store, date_num)
+            df_index = dates2int(df.index.strftime('%Y-%m-%d'))
+            start_idx = int(np.searchsorted(date_index, df_index[0]))
+            end_idx = start_idx + len(df_index)
+            assert end_idx <= date_num and np.array_equal(date_index[start_idx:end_idx], df_index),\
+                'Error, dates to be overwritten must be continuous dates in the data file!'
+            code_len = int(store.attrs['#code'])
+            code_order = [c.decode('utf8') for c in store['code'][:code_len]]
+            new_codes = code_order + sorted(df.columns.difference(code_order))
+            df = df.reindex(columns=new_codes).fillna(self.default_data)
+            if data_dtype is not None:
+                data = df.values.astype(data_dtype)
+            else:
+                data = df.values
+            assert store.attrs['data type'] == np.dtype(data.dtype), "data type error!" +\
+                "data type in dataset is {ds_type}, you provide |{p_type}".\
+                format(ds_type=store.attrs['data type'], p_type=data.dtype)
+            if len(new_codes) > code_len:
+                ensure_col_size(store, len(new_codes))
+                store['code'][code_len:len(new_codes)] = np.array(new_codes[code_len:],
+                                                                  dtype=self._code_dtype)
+                store.attrs['#code'] = len(new_codes)
+            store['data'][start_idx:end_idx, :len(new_codes)] = data
+        self._code_order = new_codes
+        self._code_index = {c: idx for idx, c in enumerate(new_codes)}
+        return df
+
     def query_all(self):
         '''
         查询所有的数据
@@ -324,6 +600,165 @@ class DBConnector(object):
         return df
 
 
+# 辅助函数，文件的打开和格式
+@contextmanager
+def open_store(path, mode='r'):
+    '''
+    在文件锁的保护下打开数据文件，只读模式获取共享锁，其他模式获取排他锁，保证写入过程中不会有
+    其他进程读取，读取过程中也不会有其他进程写入
+
+    Parameter
+    ---------
+    path: str
+        数据文件的路径
+    mode: str, default 'r'
+        h5py.File的打开模式
+
+    Return
+    ------
+    out: h5py.File
+        需要通过with语句使用，退出时关闭文件并释放锁
+    '''
+    with FileLock(path + LOCK_SUFFIX, exclusive=(mode != 'r')):
+        with h5py.File(path, mode) as store:
+            yield store
+
+
+def get_format_version(store):
+    '''
+    获取数据文件的格式版本，没有记录格式版本的旧文件视为版本1
+
+    Parameter
+    ---------
+    store: h5py.File
+        已经打开的数据文件
+
+    Return
+    ------
+    out: int
+    '''
+    return int(store.attrs.get('format version', 1))
+
+
+def ensure_col_size(store, code_num):
+    '''
+    检查数据文件的列数是否足够容纳给定数量的股票，不足时原地扩展列数
+
+    Parameter
+    ---------
+    store: h5py.File
+        以可写模式打开的数据文件
+    code_num: int
+        需要容纳的股票数量
+
+    Return
+    ------
+    out: int
+        检查（扩展）后的列数
+
+    Notes
+    -----
+    列数需要严格大于股票数量；对于不支持在股票方向上扩展的旧文件，列数不足时会报错
+    '''
+    col_size = store['data'].shape[1]
+    if code_num >= col_size:
+        assert store['data'].maxshape[1] is None,\
+            "data columns(len={data_len}) ".format(data_len=code_num) +\
+            "should be less than {max_len}".format(max_len=col_size)
+        col_size = code_num + COL_EXPAND_SIZE
+        expand_columns(store, col_size)
+    return col_size
+
+
+def expand_columns(store, new_size):
+    '''
+    原地扩展数据文件的列数（股票方向的长度），只修改数据集的形状，不会重写已有的数据
+
+    Parameter
+    ---------
+    store: h5py.File
+        以可写模式打开的数据文件，要求数据集在股票方向上可扩展（版本3及以上的文件）
+    new_size: int
+        新的列数，要求不小于原有的列数
+
+    Notes
+    -----
+    新增的列在读取时为数据集的填充值（即默认数据），不占用磁盘空间
+    '''
+    data_dset = store['data']
+    assert new_size >= data_dset.shape[1], \
+        "Error, new size({ns}) must not be less than current size({cs})!".\
+        format(ns=new_size, cs=data_dset.shape[1])
+    data_dset.resize((data_dset.shape[0], new_size))
+    store['code'].resize((new_size, ))
+
+
+# 辅助函数，日期索引的转换和查找
+def dates2int(dates):
+    '''
+    将日期字符串（YYYY-MM-DD）转换为整数形式（YYYYMMDD）的日期
+
+    Parameter
+    ---------
+    dates: iterable
+        元素为bytes或者str类型的日期字符串
+
+    Return
+    ------
+    out: np.array(dtype=DATE_INDEX_DTYPE)
+    '''
+    out = [d.decode('utf8') if isinstance(d, bytes) else d for d in dates]
+    out = np.array([int(d.replace('-', '')) for d in out], dtype=DATE_INDEX_DTYPE)
+    return out
+
+
+def int2dates(date_index):
+    '''
+    将整数形式（YYYYMMDD）的日期转换为pd.DatetimeIndex
+
+    Parameter
+    ---------
+    date_index: np.array
+        整数日期
+
+    Return
+    ------
+    out: pd.DatetimeIndex
+    '''
+    return pd.to_datetime(np.asarray(date_index).astype(str), format='%Y%m%d')
+
+
+def locate_dates(date_index, start_time, end_time):
+    '''
+    在升序排列的整数日期索引中，通过二分查找定位给定时间区间对应的行
+
+    Parameter
+    ---------
+    date_index: np.array
+        升序排列的整数日期（YYYYMMDD）
+    start_time: datetime
+        区间的开始时间
+    end_time: datetime
+        区间的结束时间
+
+    Return
+    ------
+    out: tuple(start_idx, end_idx)
+        区间数据对应的行为[start_idx, end_idx)，若start_idx >= end_idx表示区间内没有数据
+
+    Notes
+    -----
+    文件中的日期均为当天的零点，因此若start_time不是零点，则当天的数据不包含在区间内，与按照时间
+    直接比较的结果一致
+    '''
+    start_key = int(start_time.strftime('%Y%m%d'))
+    end_key = int(end_time.strftime('%Y%m%d'))
+    start_side = 'left' if start_time == start_time.normalize() else 'right'
+    start_idx = int(np.searchsorted(date_index, start_key, side=start_side))
+    end_idx = int(np.searchsorted(date_index, end_key, side='right'))
+    return start_idx, end_idx
+
+
 # 辅助函数，将数据进行迁移或者替换
 def reshape_colsize(file_path, new_size, destination_path=None):
     '''
@@ -337,13 +772,22 @@ def reshape_colsize(file_path, new_size, destination_path=None):
         新的列的大小，要求必须比已经存储的数据列数要大
     destination_path: str, default
         新的存储路径（可选），如果为None，表示直接替代之前的文件
+
+    Notes
+    -----
+    若不需要存储到新文件中，且文件支持在股票方向上扩展，则直接原地扩展列数，不会重写文件
     '''
+    if destination_path is None:
+        with open_store(file_path, 'r+') as store:
+            if store['data'].maxshape[1] is None:
+                expand_columns(store, new_size)
+                return
     raw_db = DBConnector(file_path)
     data = raw_db.query_all()
     assert len(data.columns) < new_size, \
         "Error, new size({ns}) must be greater than data columns size({dz})!".\
         format(ns=new_size, dz=len(data.columns))
-    with h5py.File(file_path) as store:     # 获取存储数据的相关信息
+    with open_store(file_path, 'r') as store:     # 获取存储数据的相关信息
         data_type = store.attrs['data type']
         default_value = store.attrs['default data']
     if destination_path is None:    # 覆盖源文件
@@ -357,6 +801,62 @@ def reshape_colsize(file_path, new_size, destination_path=None):
     new_db.insert_df(data, data_type, default_value)
 
 
+def migrate_dbfile(file_path, destination_path=None, chunks=DEFAULT_CHUNKS,
+                   compression=DEFAULT_COMPRESSION, compression_opts=DEFAULT_COMPRESSION_OPTS,
+                   shuffle=True, batch_size=MIGRATE_BATCH_SIZE):
+    '''
+    将数据文件按照当前的文件格式（FORMAT_VERSION）重新写入，可以同时修改分块形状和压缩方法
+
+    Parameter
+    ---------
+    file_path: str
+        需要迁移的文件的路径
+    destination_path: str, default None
+        新的存储路径（可选），如果为None，表示迁移完成后直接替代之前的文件
+    chunks: tuple(int, int), default DEFAULT_CHUNKS
+        新文件数据集的分块形状
+    compression: str, default DEFAULT_COMPRESSION
+        新文件的压缩方法，None表示不压缩
+    compression_opts: int, default DEFAULT_COMPRESSION_OPTS
+        压缩参数，仅对gzip有效
+    shuffle: boolean, default True
+        是否使用shuffle过滤器
+    batch_size: int, default MIGRATE_BATCH_SIZE
+        每次复制的日期（行）的数量，用于控制内存的占用
+
+    Notes
+    -----
+    迁移过程直接复制原始的数据，不经过pd.DataFrame的转换，也不会检查交易日的连续性；
+    替换源文件时，先写入临时文件，完成后再替换，迁移失败不会影响源文件；迁移过程中一直持有源文件的锁
+    （替换源文件时为排他锁，反之为共享锁），其他进程的写入会等待迁移完成
+    '''
+    # 迁移过程中持有源文件的锁，防止迁移过程中写入的数据丢失；替换源文件时需要排他锁
+    with FileLock(file_path + LOCK_SUFFIX, exclusive=(destination_path is None)):
+        with open_store(file_path, 'r') as store:
+            data_type = store.attrs['data type']
+            size = store['data'].shape[1]
+            date_num = int(store.attrs['#dates'])
+            code_len = int(store.attrs['#code'])
+            codes = store['code'][:code_len]
+        target_path = destination_path
+        if destination_path is None:
+            target_path = file_path + '.migrating'
+            if exists(target_path):
+                remove(target_path)
+        new_db = DBConnector(target_path, size)
+        new_db.init_dbfile(data_type, chunks, compression, compression_opts, shuffle)
+        for start_idx in range(0, date_num, batch_size):
+            end_idx = min(start_idx + batch_size, date_num)
+            with open_store(file_path, 'r') as store:
+                dates = store['date'][start_idx:end_idx]
+                data = store['data'][start_idx:end_idx, :code_len]
+            new_db.insert_data(codes, dates, data)
+        if destination_path is None:
+            replace(target_path, file_path)
+            # 临时文件的锁文件不再需要
+            if exists(target_path + LOCK_SUFFIX):
+                remove(target_path + LOCK_SUFFIX)
+
 if __name__ == '__main__':
     from fmanager import get_factor_detail
     cpath = get_factor_detail('ZX_IND')['abs_path']
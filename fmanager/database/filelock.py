@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date    : 2026-10-17 10:12:05
+# @Author  : Li Hao (howardlee_h@outlook.com)
+# @Link    : https://github.com/SAmmer0
+# @Version : $Id$
+'''
+数据文件的进程间读写锁，用于保证同一时间只有一个写入进程，且读取进程读到的是一致的数据
+
+__version__ = 1.0.0
+修改日期：2026-10-17
+修改内容：
+    初始化，添加FileLock
+修改日期：2026-10-17
+修改内容：
+    重入按照(锁文件, 线程)记录，同一进程的不同线程之间也互斥
+'''
+__version__ = '1.0.0'
+
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:     # Windows系统下没有fcntl，使用msvcrt
+    fcntl = None
+    import msvcrt
+
+from fmanager.database.const import LOCK_TIMEOUT, LOCK_POLL_INTERVAL
+
+# 当前进程中各个线程已经持有的锁，格式为{(lock_path, thread_id): [exclusive, count, fd]}，用于支持
+# 同一线程内的重入；不同线程分别打开锁文件加锁，因此线程之间与进程之间一样互斥
+_HELD_LOCKS = {}
+
+
+class FileLock(object):
+    '''
+    基于锁文件的进程（线程）间读写锁（建议锁），在POSIX系统下使用fcntl.flock，支持共享锁（读）和排他锁（写）；
+    在Windows系统下使用msvcrt.locking，只支持排他锁，此时共享锁也按照排他锁处理
+    '''
+
+    def __init__(self, path, exclusive=False, timeout=LOCK_TIMEOUT):
+        '''
+        Parameter
+        ---------
+        path: str
+            锁文件的路径，如果不存在会自动创建（锁文件不会被删除）
+        exclusive: boolean, default False
+            是否为排他锁，False表示共享锁
+        timeout: float, default LOCK_TIMEOUT
+            等待获取锁的最长时间（秒），None表示一直等待
+        '''
+        self.path = os.path.abspath(path)
+        self.exclusive = exclusive
+        self.timeout = timeout
+
+    def _try_lock(self, fd):
+        '''
+        尝试（非阻塞）获取锁，成功返回True，反之返回False
+        '''
+        try:
+            if fcntl is not None:
+                flag = fcntl.LOCK_EX if self.exclusive else fcntl.LOCK_SH
+                fcntl.flock(fd, flag | fcntl.LOCK_NB)
+            else:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+        return True
+
+    def _unlock(self, fd):
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+    def acquire(self):
+        '''
+        获取锁，超时则抛出TimeoutError
+
+        Notes
+        -----
+        同一线程内对同一文件的重复获取会直接计数，不会重复加锁；但已经持有共享锁时不能再获取排他锁。
+        同一进程的不同线程之间不共享锁，其他线程需要等待锁释放
+        '''
+        key = (self.path, threading.get_ident())
+        held = _HELD_LOCKS.get(key)
+        if held is not None:
+            assert held[0] or not self.exclusive, \
+                'Error, cannot upgrade a shared lock on "{path}"'.format(path=self.path)
+            held[1] += 1
+            return
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT)
+        start = time.time()
+        while not self._try_lock(fd):
+            if self.timeout is not None and time.time() - start > self.timeout:
+                os.close(fd)
+                raise TimeoutError('Timeout when acquiring lock "{path}"'.format(path=self.path))
+            time.sleep(LOCK_POLL_INTERVAL)
+        _HELD_LOCKS[key] = [self.exclusive, 1, fd]
+
+    def release(self):
+        '''
+        释放锁
+        '''
+        key = (self.path, threading.get_ident())
+        held = _HELD_LOCKS[key]
+        held[1] -= 1
+        if held[1] > 0:
+            return
+        del _HELD_LOCKS[key]
+        fd = held[2]
+        try:
+            self._unlock(fd)
+        finally:
+            os.close(fd)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
@@ -11,6 +11,10 @@ __version__ = 1.0.0
 修改日期：2017-07-25
 修改内容：
     初始化
+
+修改日期：2026-10-17
+修改内容：
+    TTM、季度和年度数据改为使用fdmutils.cal_pit_panel批量计算
 '''
 import pdb
 import datatoolkits
@@ -37,7 +41,7 @@ def get_factor_dict():
 factor_list = []
 
 
-def _handle_dbdata(data, start_time, end_time, func, **kwargs):
+def _handle_dbdata(data, start_time, end_time, method, n):
     '''
     将从数据库中获取的数据映射到交易日中
 
@@ -49,28 +53,18 @@ def _handle_dbdata(data, start_time, end_time, func, **kwargs):
         获取的数据的起始时间
     end_time: str or other type that can be transfered by pd.to_datetime
         获取数据的结束之间
-    func: function
-        要求function接受的第一个参数为pd.DataFrame，为经过代码和观察日分组的数据，且返回的结果
-        为一个值或者只包含一个值得pd.Series
-    **kwargs: dictionary like parameter
-        为需要传入func的其他参数
+    method: str
+        计算方法，只支持{'ttm', 'season', 'year'}，详见fdmutils.cal_pit_panel
+    n: int
+        ttm对应计算的期数，season和year对应往前推的期数
 
     Return
     ------
     out: pd.DataFrame
         经过特定计算后的结果，columns为股票代码，index为日期
     '''
-    by_code = data.groupby('code')
-    data = by_code.apply(fdmutils.get_observabel_data).reset_index(drop=True)
-    by_cno = data.groupby(['code', 'obs_time'])
-    data = by_cno.apply(func, **kwargs)
-    data = data.reset_index().rename(columns={'obs_time': 'time'})
     tds = dateshandle.get_tds(start_time, end_time)
-    data = data.groupby('code').apply(datatoolkits.map_data, days=tds,
-                                      fillna={'code': lambda x: x.code.iloc[0]})
-    data = data.reset_index(drop=True)
-    data = data.pivot_table('data', index='time', columns='code')
-    return data
+    return fdmutils.cal_pit_panel(data, tds, method, n)
 # --------------------------------------------------------------------------------------------------
 # TTM数据
 
@@ -114,17 +108,7 @@ def get_TTM(fd_type, sql_type):
                                     cols=('update_time', 'rpt_date', 'code', 'data'),
                                     add_stockcode=False)
         data['code'] = data.code.apply(datatoolkits.add_suffix)
-        by_code = data.groupby('code')
-        data = by_code.apply(fdmutils.get_observabel_data).reset_index(drop=True)
-        by_cno = data.groupby(['code', 'obs_time'])
-        data = by_cno.apply(fdmutils.cal_ttm, col_name='data').reset_index()\
-            .rename(columns={'obs_time': 'time'})
-        tds = dateshandle.get_tds(start_time, end_time)
-        # pdb.set_trace()
-        data = data.groupby('code').apply(datatoolkits.map_data, days=tds,
-                                          fillna={'code': lambda x: x.code.iloc[0]})
-        data = data.reset_index(drop=True)
-        data = data.pivot_table('data', index='time', columns='code')
+        data = _handle_dbdata(data, start_time, end_time, 'ttm', 4)
         data = data.loc[:, sorted(universe)]
         assert check_indexorder(data), 'Error, data order is mixed!'
         assert checkdata_completeness(data, start_time, end_time), "Error, data missed!"
@@ -203,16 +187,7 @@ def get_BS_nshift(fd_type, n):
                                     add_stockcode=False)
         data['code'] = data.code.apply(datatoolkits.add_suffix)
         # pdb.set_trace()
-        by_code = data.groupby('code')
-        data = by_code.apply(fdmutils.get_observabel_data).reset_index(drop=True)
-        by_cno = data.groupby(['code', 'obs_time'])
-        data = by_cno.apply(fdmutils.cal_season, col_name='data', offset=n)
-        data = data.reset_index().rename(columns={'obs_time': 'time'})
-        tds = dateshandle.get_tds(start_time, end_time)
-        data = data.groupby('code').apply(datatoolkits.map_data, days=tds,
-                                          fillna={'code': lambda x: x.code.iloc[0]})
-        data = data.reset_index(drop=True)
-        data = data.pivot_table('data', index='time', columns='code')
+        data = _handle_dbdata(data, start_time, end_time, 'season', n)
         data = data.loc[:, sorted(universe)]
         assert check_indexorder(data), 'Error, data order is mixed!'
         assert checkdata_completeness(data, start_time, end_time), "Error, data missed!"
@@ -299,17 +274,7 @@ def get_season_nshift(data_type, sql_type, n):
                                     cols=('update_time', 'rpt_date', 'code', 'data'),
                                     add_stockcode=False)
         data['code'] = data.code.apply(datatoolkits.add_suffix)
-        # 该部分可以单独做成一个函数
-        by_code = data.groupby('code')
-        data = by_code.apply(fdmutils.get_observabel_data).reset_index(drop=True)
-        by_cno = data.groupby(['code', 'obs_time'])
-        data = by_cno.apply(fdmutils.cal_season, col_name='data', offset=n)
-        data = data.reset_index().rename(columns={'obs_time': 'time'})
-        tds = dateshandle.get_tds(start_time, end_time)
-        data = data.groupby('code').apply(datatoolkits.map_data, days=tds,
-                                          fillna={'code': lambda x: x.code.iloc[0]})
-        data = data.reset_index(drop=True)
-        data = data.pivot_table('data', index='time', columns='code')
+        data = _handle_dbdata(data, start_time, end_time, 'season', n)
         data = data.loc[:, sorted(universe)]
         assert check_indexorder(data), 'Error, data order is mixed!'
         assert checkdata_completeness(data, start_time, end_time), "Error, data missed!"
@@ -382,8 +347,7 @@ def get_year_nshift(data_type, sql_type, n):
                                     cols=('update_time', 'rpt_date', 'code', 'data'),
                                     add_stockcode=False)
         data['code'] = data.code.apply(datatoolkits.add_suffix)
-        data = _handle_dbdata(data, start_time, end_time, fdmutils.cal_yr, col_name='data',
-                              offset=n)
+        data = _handle_dbdata(data, start_time, end_time, 'year', n)
         # pdb.set_trace()
         data = data.loc[:, sorted(universe)]
         assert check_indexorder(data), 'Error, data order is mixed!'
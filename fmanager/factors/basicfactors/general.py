@@ -12,6 +12,10 @@
 修改日期：2017-07-13
 修改内容：
     初始化
+
+修改日期：2026-10-17
+修改内容：
+    中信行业、上市状态和特殊处理数据使用datatoolkits.map_data_bulk一次性映射到交易日
 '''
 import datatoolkits
 import dateshandle
@@ -53,11 +57,7 @@ def get_zxind(universe, start_time, end_time):
     ind_data['code'] = ind_data.code.apply(datatoolkits.add_suffix)
     # pdb.set_trace()
     tds = dateshandle.get_tds(start_time, end_time)
-    by_code = ind_data.groupby('code')
-    ind_data = by_code.apply(datatoolkits.map_data, days=tds,
-                             fillna={'ind': lambda x: NaS, 'code': lambda x: x.code.iloc[0]})
-    ind_data = ind_data.reset_index(drop=True).set_index(['time', 'code'])
-    ind_data = ind_data.loc[:, 'ind'].unstack()
+    ind_data = datatoolkits.map_data_bulk(ind_data, tds, valueCol='ind')
     ind_data = ind_data.loc[:, sorted(universe)].dropna(axis=0, how='all').fillna(NaS)
     assert checkdata_completeness(ind_data, start_time, end_time), "Error, data missed!"
     return ind_data
@@ -78,16 +78,9 @@ def get_liststatus(universe, start_time, end_time):
     ls_map = {1: 1, 2: 2, 3: 1, 4: 4, 6: 3}   # 原数据库中1表示上市，2表示暂停上市，3表示恢复上市，4表示退市,6表示退市整理
     ls_data['list_status'] = ls_data.list_status.map(ls_map)
     ls_data['code'] = ls_data.code.apply(datatoolkits.add_suffix)
-    by_code = ls_data.groupby('code')
     tds = dateshandle.get_tds(start_time, end_time)
-    ls_data = by_code.apply(datatoolkits.map_data, days=tds,
-                            fillna={'code': lambda x: x.code.iloc[0]},
-                            fromNowOn=True)
-    # ls_data = ls_data.reset_index(drop=True).set_index(['time', 'code'])
-    # ls_data = ls_data.loc[:, 'list_status'].unstack()
-    ls_data = ls_data.reset_index(drop=True)
-    ls_data = ls_data.pivot_table('list_status', index='time',
-                                  columns='code').dropna(axis=0, how='all')
+    ls_data = datatoolkits.map_data_bulk(ls_data, tds, valueCol='list_status', fromNowOn=True)
+    ls_data = ls_data.dropna(axis=0, how='all')
     ls_data = ls_data.loc[:, sorted(universe)]
     assert checkdata_completeness(ls_data, start_time, end_time), "Error, data missed!"
     return ls_data
@@ -130,14 +123,8 @@ def get_st(universe, start_time, end_time):
     st_data = st_data.reset_index(drop=True)
     tds = dateshandle.get_tds(start_time, end_time)
     # pdb.set_trace()
-    by_code = st_data.groupby('code')
-    st_data = by_code.apply(datatoolkits.map_data, days=tds,
-                            fillna={'code': lambda x: x.code.iloc[0]},
-                            fromNowOn=True)
-    st_data = st_data.reset_index(drop=True)
-    # st_data = st_data.reset_index(drop=True).set_index(['time', 'code'])
-    # st_data = st_data.loc[:, 'tag'].unstack()
-    st_data = st_data.pivot_table('tag', index='time', columns='code').dropna(axis=0, how='all')
+    st_data = datatoolkits.map_data_bulk(st_data, tds, valueCol='tag', fromNowOn=True)
+    st_data = st_data.dropna(axis=0, how='all')
     st_data = st_data.loc[:, sorted(universe)].fillna(0)
     assert checkdata_completeness(st_data, start_time, end_time), "Error, data missed!"
     return st_data
@@ -11,6 +11,13 @@ __version__: 1.0.0
 修改日期：2017-07-20
 修改内容：
     初始化，添加基本因子
+
+修改日期：2026-10-17
+修改内容：
+    1. 所有日行情因子共用一次查询（load_daily_quotes）的结果，不再对每个字段分别查询数据库
+    2. 滚动窗口类因子声明回溯期（lookback），并按照回溯期精确计算数据的开始时间
+    3. 复权因子和股本数据使用datatoolkits.map_data_bulk一次性映射到交易日
+    4. 添加clear_quote_cache，每批更新结束后清除日行情数据的缓存
 '''
 __version__ = '1.0.0'
 
@@ -23,11 +30,16 @@ from statsmodels.api import OLS, add_constant
 import pdb
 from fmanager.const import START_TIME
 from fmanager.factors.utils import (check_indexorder, Factor, check_duplicate_factorname,
-                                    checkdata_completeness, drop_delist_data)
+                                    checkdata_completeness, drop_delist_data, get_lookback_start)
 from fmanager.factors.query import query
 # --------------------------------------------------------------------------------------------------
 # 常量和功能函数
 NAME = 'quote'
+# 日行情表中需要获取的字段
+QUOTE_FIELDS = ('PrevClosePrice', 'OpenPrice', 'HighPrice', 'LowPrice', 'ClosePrice',
+                'TurnoverVolume', 'TurnoverValue')
+# 日行情数据的缓存，格式为{(start_time, end_time): {field: data}}
+_QUOTE_CACHE = {}
 
 # --------------------------------------------------------------------------------------------------
 # 功能函数
@@ -45,38 +57,73 @@ factor_list = []
 # 获取行情相关数据
 
 
-def get_quote(data_type):
+def load_daily_quotes(start_time, end_time):
     '''
-    母函数，用于生成获取给定行情数据的函数
+    一次性从数据库中获取给定时间区间内所有股票的日行情数据（包含QUOTE_FIELDS中的所有字段），并
+    转换为面板数据；结果会被缓存，同一更新区间内的各个行情因子共用一次查询的结果
+
+    Parameter
+    ---------
+    start_time: type that can be converted by pd.to_datetime
+        开始时间
+    end_time: type that can be converted by pd.to_datetime
+        结束时间
+
+    Return
+    ------
+    out: dict
+        格式为{字段: pd.DataFrame}，DataFrame的index为时间，columns为股票代码，其中开盘价、最高价、
+        最低价为0（停牌）的数据已经被替换为前收盘价
+
+    Notes
+    -----
+    查询只精确到日期，因此缓存也按照日期匹配；缓存中只保留最近一次查询的时间区间，避免占用过多内存；
+    缓存不会检查数据库中的数据是否被修改，一批更新（或者重新计算）结束后需要调用clear_quote_cache
     '''
+    key = (pd.to_datetime(start_time).normalize(), pd.to_datetime(end_time).normalize())
+    if key in _QUOTE_CACHE:
+        return _QUOTE_CACHE[key]
     sql = '''
-        SELECT S.TradingDay, data_type, M.Secucode
+        SELECT S.TradingDay, {fields}, M.Secucode
         FROM QT_DailyQuote S, SecuMain M
         WHERE
             S.InnerCode = M.InnerCode AND
             M.SecuMarket in (83, 90) AND
-            S.TradingDay <= CAST(\'{end_time}\' as datetime) AND
-            S.TradingDay >= CAST(\'{start_time}\' as datetime) AND
+            S.TradingDay <= CAST(\'{{end_time}}\' as datetime) AND
+            S.TradingDay >= CAST(\'{{start_time}}\' as datetime) AND
             M.SecuCategory = 1
         ORDER BY S.TradingDay ASC, M.Secucode ASC
-        '''
-    price_filter = ['openprice', 'highprice', 'lowprice']
-    if data_type.lower() not in price_filter:
-        transed_sql = sql.replace('data_type', 'S.' + data_type)
-        cols = ('time', 'data', 'code')
-    else:
-        transed_sql = sql.replace('data_type', 'S.PrevClosePrice, S.' + data_type)
-        cols = ('time', 'prevclose', 'data', 'code')
+        '''.format(fields=', '.join('S.' + f for f in QUOTE_FIELDS))
+    data = fdgetter.get_db_data(sql, cols=('time', ) + QUOTE_FIELDS + ('code', ),
+                                start_time=start_time, end_time=end_time, add_stockcode=False)
+    data['code'] = data.code.apply(datatoolkits.add_suffix)
+    data = data.pivot_table(list(QUOTE_FIELDS), index='time', columns='code', dropna=False)
+    out = {field: data[field] for field in QUOTE_FIELDS}
+    prev_close = out['PrevClosePrice']
+    for field in ('OpenPrice', 'HighPrice', 'LowPrice'):     # 停牌时价格为0，使用前收盘价替换
+        out[field] = out[field].where(out[field] != 0, prev_close)
+    _QUOTE_CACHE.clear()
+    _QUOTE_CACHE[key] = out
+    return out
+
+
+def clear_quote_cache():
+    '''
+    清除load_daily_quotes的缓存，释放内存，并使得之后的查询重新从数据库中获取数据
+    '''
+    _QUOTE_CACHE.clear()
+
+
+def get_quote(data_type):
+    '''
+    母函数，用于生成获取给定行情数据的函数，数据来自load_daily_quotes的共享结果
+    '''
+    assert data_type in QUOTE_FIELDS, \
+        'Error, invalid data type({dt}), valid types are {vt}'.format(dt=data_type, vt=QUOTE_FIELDS)
 
     @drop_delist_data
     def _inner(universe, start_time, end_time):
-        data = fdgetter.get_db_data(transed_sql, cols=cols, start_time=start_time,
-                                    end_time=end_time, add_stockcode=False)
-        data['code'] = data.code.apply(datatoolkits.add_suffix)
-        if len(data.columns) == 4:
-            data.loc[data.data == 0, 'data'] = data['prevclose']
-            data.drop('prevclose', inplace=True, axis=1)
-        data = data.pivot_table('data', index='time', columns='code')
+        data = load_daily_quotes(start_time, end_time)[data_type]
         data = data.loc[:, sorted(universe)]
         assert check_indexorder(data), 'Error, data order is mixed!'
         assert checkdata_completeness(data, start_time, end_time), "Error, data missed!"
@@ -126,12 +173,8 @@ def get_adjfactor(universe, start_time, end_time):
         '''
     data = fdgetter.get_db_data(sql, cols=('time', 'data', 'code'), add_stockcode=False)
     data['code'] = data.code.apply(datatoolkits.add_suffix)
-    by_code = data.groupby('code')
     tds = dateshandle.get_tds(start_time, end_time)
-    data = by_code.apply(datatoolkits.map_data, days=tds, fromNowOn=True,
-                         fillna={'code': lambda x: x.code.iloc[0], 'data': lambda x: 1})
-    data = data.reset_index(drop=True)
-    data = data.pivot_table('data', index='time', columns='code')
+    data = datatoolkits.map_data_bulk(data, tds, fromNowOn=True)
     data = data.loc[:, sorted(universe)].fillna(1)    # 因为新股大多数情况下没有分红记录
     assert check_indexorder(data), 'Error, data order is mixed!'
     assert checkdata_completeness(data, start_time, end_time), "Error, data missed!"
@@ -163,12 +206,8 @@ def get_shares(share_type):
                                     add_stockcode=False)
         data['code'] = data.code.apply(datatoolkits.add_suffix)
         data = data.drop_duplicates().sort_values(['code', 'time'])  # 此处假设若时间相同则股本数量相同
-        by_code = data.groupby('code')
         tds = dateshandle.get_tds(start_time, end_time)
-        data = by_code.apply(datatoolkits.map_data, days=tds, fromNowOn=True,
-                             fillna={'code': lambda x: x.code.iloc[0]})
-        data = data.reset_index(drop=True)
-        data = data.pivot_table('data', index='time', columns='code')
+        data = datatoolkits.map_data_bulk(data, tds, fromNowOn=True)
         data = data.loc[:, sorted(universe)]
         assert check_indexorder(data), 'Error, data order is mixed!'
         assert checkdata_completeness(data, start_time, end_time), "Error, data missed!"
@@ -293,7 +332,7 @@ def get_avgtorate(universe, start_time, end_time):
     指过去20个交易日平均换手率
     '''
     start_time = pd.to_datetime(start_time)
-    new_start = start_time - pd.Timedelta('60 day')
+    new_start = get_lookback_start(start_time, 19)
     daily_torate = query('TO_RATE', (new_start, end_time))
     data = daily_torate.rolling(20, min_periods=20).mean().dropna(how='all')
     mask = (data.index >= start_time) & (data.index <= end_time)
@@ -304,7 +343,8 @@ def get_avgtorate(universe, start_time, end_time):
 
 
 factor_list.append(Factor('TOAVG_1M', get_avgtorate, pd.to_datetime('2017-08-02'),
-                          dependency=['TO_RATE', 'LIST_STATUS'], desc='过去一个月（20交易日）日均换手率'))
+                          dependency=['TO_RATE', 'LIST_STATUS'], desc='过去一个月（20交易日）日均换手率',
+                          lookback=19))
 
 
 def get_sto(category):
@@ -329,7 +369,7 @@ def get_sto(category):
     def inner(universe, start_time, end_time):
         start_time = pd.to_datetime(start_time)
         threshold = 10e-6
-        new_start = dateshandle.tds_shift(start_time, offset)
+        new_start = get_lookback_start(start_time, offset - 1)
         daily_torate = query('TO_RATE', (new_start, end_time))
         data = daily_torate.rolling(offset, min_periods=offset).sum().dropna(how='all')
         data[data <= threshold] = np.NaN
@@ -344,11 +384,14 @@ def get_sto(category):
 
 
 factor_list.append(Factor('STOM', get_sto('STOM'), pd.to_datetime('2017-10-27'),
-                          dependency=['TO_RATE', 'LIST_STATUS'], desc='BARRA STOM月换手率因子'))
+                          dependency=['TO_RATE', 'LIST_STATUS'], desc='BARRA STOM月换手率因子',
+                          lookback=20))
 factor_list.append(Factor('STOQ', get_sto('STOQ'), pd.to_datetime('2017-10-27'),
-                          dependency=['TO_RATE', 'LIST_STATUS'], desc='BARRA STOQ季度换手率因子'))
+                          dependency=['TO_RATE', 'LIST_STATUS'], desc='BARRA STOQ季度换手率因子',
+                          lookback=62))
 factor_list.append(Factor('STOA', get_sto('STOA'), pd.to_datetime('2017-10-27'),
-                          dependency=['TO_RATE', 'LIST_STATUS'], desc='BARRA STOA年度换手率因子'))
+                          dependency=['TO_RATE', 'LIST_STATUS'], desc='BARRA STOA年度换手率因子',
+                          lookback=251))
 
 # --------------------------------------------------------------------------------------------------
 # 对数市值
@@ -12,24 +12,36 @@ __version__ = 1.0.0
 修改日期：2017-07-27
 修改内容：
     初始化
+
+修改日期：2026-10-17
+修改内容：
+    1. 滚动窗口类因子（偏度峰度、RSTR、DSTD、均线、CAPM相关因子、FF特异波动率、CMRA、SMAX）声明回溯期
+       （lookback），并按照回溯期精确计算数据的开始时间
+    2. 机构持股比例数据使用datatoolkits.map_data_bulk一次性映射到交易日
+    3. CAPM相关因子和FF特异波动率使用datatoolkits.rolling_ols对所有股票批量进行滚动回归
+    4. 偏度、峰度和波动率因子使用datatoolkits.rolling_moments计算
+    5. RSTR和DSTD使用datatoolkits.rolling_weighted_sum计算
+    6. CMRA通过按月度分块的累计收益一次性计算所有股票和日期
+    7. SMAX因子使用datatoolkits.rolling_topk计算最大收益率的平均值
+    8. 声明了回溯期的因子（CAPM相关因子、FF特异波动率、CMRA、SMAX）计算股票收益率时不再向前填充NA
+       价格（暂停上市等没有行情数据的期间收益率为NA），结果只依赖于回溯期内的数据
 '''
 
 # import datatoolkits
 import dateshandle
 import numpy as np
-from numpy.linalg import linalg, LinAlgError
 import pandas as pd
 import pdb
 import warnings
 # from functools import wraps
 
-from scipy.stats import skew, kurtosis
 from statsmodels.tools import add_constant
 from statsmodels.regression.linear_model import OLS
 from tqdm import tqdm
 from fmanager.const import START_TIME
 from fmanager.factors.utils import (Factor, check_indexorder, check_duplicate_factorname,
-                                    convert_data, checkdata_completeness, drop_delist_data)
+                                    convert_data, checkdata_completeness, drop_delist_data,
+                                    get_lookback_start)
 from fmanager.factors.query import query
 import fdgetter
 import datatoolkits
@@ -520,17 +532,16 @@ def gen_skfunc(days, func_name):
     func_name: str
         计算的数据结果类型，只支持skew、kurt和std
     '''
-    func_category = {'skew': skew, 'kurt': kurtosis, 'std': np.std}
-    func = func_category[func_name]
+    # 与scipy.stats.skew、scipy.stats.kurtosis和np.std的默认参数相同
+    func_category = {'skew': 'skew', 'kurt': 'kurt', 'std': 'std'}
+    moment = func_category[func_name]
 
     @drop_delist_data
     def _inner(universe, start_time, end_time):
         start_time = pd.to_datetime(start_time)
-        shift_days = int(days / 20 * 31)
-        new_start = start_time - pd.Timedelta('30 day') - pd.Timedelta('%d day' % shift_days)
+        new_start = get_lookback_start(start_time, days - 1)
         data = query('DAILY_RET', (new_start, end_time))
-        rolling = data.rolling(days, min_periods=days)
-        data = rolling.apply(func)
+        data = getattr(datatoolkits.rolling_moments(data, days, stable=True), moment)
         # data = data.dropna(how='all')
         mask = (data.index >= start_time) & (data.index <= end_time)
         data = data.loc[mask, sorted(universe)]
@@ -541,11 +552,12 @@ def gen_skfunc(days, func_name):
 
 
 factor_list.append(Factor('SKEW_1M', gen_skfunc(20, 'skew'), pd.to_datetime('2017-08-02'),
-                          dependency=['DAILY_RET'], desc='过去20个交易日收益率的skew'))
+                          dependency=['DAILY_RET'], desc='过去20个交易日收益率的skew', lookback=19))
 factor_list.append(Factor('KURTOSIS_1M', gen_skfunc(20, 'kurt'), pd.to_datetime('2017-08-02'),
-                          dependency=['DAILY_RET'], desc='过去20个交易日收益率的kurtosis'))
+                          dependency=['DAILY_RET'], desc='过去20个交易日收益率的kurtosis',
+                          lookback=19))
 factor_list.append(Factor('VOL_1M', gen_skfunc(20, 'std'), pd.to_datetime('2017-11-30'),
-                          dependency=['DAILY_RET'], desc='过去20个交易日收益率的标准差'))
+                          dependency=['DAILY_RET'], desc='过去20个交易日收益率的标准差', lookback=19))
 # --------------------------------------------------------------------------------------------------
 # 一致预期价格距离因子
 
@@ -753,75 +765,21 @@ def gen_capm_factor(handler):
     Parameter
     ---------
     handler: function
-        用于在每次滚动回归的时候，计算所需要的数据。函数的格式为handler(y, x, beta)-> float
-        其中y为应变量是n*1的向量（n为滚动窗口的长度），x为自变量为n*2的矩阵，beta为2*1的向量
-        （0的位置为截距项）
+        用于根据滚动回归的结果计算所需要的数据。函数的格式为handler(result)-> pd.DataFrame
+        其中result为datatoolkits.rolling_ols的结果，截距项的名称为const，基准收益的名称为market
     '''
     @drop_delist_data
     def inner(universe, start_time, end_time):
-        def moving_ols(y, x, window):
-            '''
-            滚动快速计算OLS
-            '''
-            # 添加截距项
-            x = pd.DataFrame({'constant': [1] * len(x), 'x': x}, columns=['constant', 'x'])
-            # pdb.set_trace()
-            # 计算累计的xx和xy
-            K = len(x.columns)
-            N = len(x)
-            last_xx = np.zeros((K, K))
-            last_xy = np.zeros(K)
-            cum_xx = []
-            cum_xy = []
-            for i in range(N):
-                data_x = x.values[i: i + 1]
-                data_y = y.values[i: i + 1]
-                xy = np.dot(data_x.T, data_y)
-                xx = np.dot(data_x.T, data_x)
-                # 如果只有部分数据是NA，则也会导致后面无法算出beat从而产生BUG
-                # 但是考虑到x一般是基准指数，不太会在中途出现NA值，而y是当前股票收益，也不太会中途出现NA值
-                # 而且如果y为NA值，则xy全部都为NA值，因而不需要担心上述可能的BUG
-                if np.all(np.isnan(last_xx)) and not np.all(np.isnan(xx)):  # 识别第一个有效X'X，并用其重置last_xx
-                    last_xx = xx
-                else:
-                    last_xx = last_xx + np.dot(data_x.T, data_x)
-                if np.all(np.isnan(last_xy)) and not np.all(np.isnan(xx)):
-                    last_xy = xy
-                else:
-                    last_xy = last_xy + np.dot(data_x.T, data_y)
-                cum_xy.append(last_xy)
-                cum_xx.append(last_xx)
-            # pdb.set_trace()
-            # 计算滚动beta
-            out = np.empty(N, dtype=float)
-            out[:] = np.NaN
-            for i in range(N):
-                if i < window or np.any(pd.isnull(x.iloc[i])):
-                    continue
-                xx = cum_xx[i] - cum_xx[i - window]
-                xy = cum_xy[i] - cum_xy[i - window]
-                try:
-                    beta = linalg.solve(xx, xy)
-                    tmp_x = x.values[i + 1 - window: i + 1]
-                    tmp_y = y.values[i + 1 - window: i + 1]
-                    out[i] = handler(tmp_y, tmp_x, beta)
-
-                except LinAlgError as e:    # 因为停牌等因素，股价一直都不变，此时的beta没有意义
-                    continue
-            # pdb.set_trace()
-            return pd.Series(out, index=x.index)
-
         days = 252
         start_time = pd.to_datetime(start_time)
         end_time = pd.to_datetime(end_time)
-        new_start = dateshandle.tds_shift(start_time, days)
+        new_start = get_lookback_start(start_time, days)   # 计算days个收益率需要days+1个价格
         stock_data = query('ADJ_CLOSE', (new_start, end_time))
         benchmark_data = query('SSEC_CLOSE', (new_start, end_time))
-        stock_data = stock_data.pct_change().dropna(how='all').dropna(how='all', axis=1)
-        benchmark_data = benchmark_data.iloc[:, 0].pct_change().dropna()
-        # pdb.set_trace()
-        # tqdm.pandas()
-        data = stock_data.apply(lambda x: moving_ols(x, benchmark_data, days))
+        stock_data = stock_data.pct_change(fill_method=None).dropna(how='all').\
+            dropna(how='all', axis=1)
+        benchmark_data = benchmark_data.iloc[:, 0].pct_change().dropna().rename('market')
+        data = handler(datatoolkits.rolling_ols(stock_data, benchmark_data, days))
         mask = (data.index >= start_time) & (data.index <= end_time)
         data = data.loc[mask, sorted(universe)]
         if start_time > pd.to_datetime(START_TIME):     # 第一次更新从START_TIME开始，必然会有缺失数据
@@ -831,41 +789,37 @@ def gen_capm_factor(handler):
 # beta因子
 
 
-def beta_handler(y, x, beta):
-    return beta[1]
+def beta_handler(result):
+    return result.params['market']
 
 
 factor_list.append(Factor('BETA', gen_capm_factor(beta_handler), pd.to_datetime('2017-09-04'),
-                          dependency=['ADJ_CLOSE', 'SSEC_CLOSE'], desc='252交易日滚动beta系数'))
+                          dependency=['ADJ_CLOSE', 'SSEC_CLOSE'], desc='252交易日滚动beta系数',
+                          lookback=252))
 
 
 # 特质波动率因子
-def idiosyncratic_handler(y, x, beta):
-    resid = y - np.dot(x, beta)
-    return np.std(resid)
+def idiosyncratic_handler(result):
+    return np.sqrt(result.resid_var)
 
 
 factor_list.append(Factor('SPECIAL_VOL', gen_capm_factor(idiosyncratic_handler),
                           pd.to_datetime('2017-09-05'), dependency=['ADJ_CLOSE', 'SSEC_CLOSE'],
-                          desc='特质波动率'))
+                          desc='特质波动率', lookback=252))
 
 
 # 系统风险占比因子（systemic risk ratio）
 np.seterr('raise')
 
 
-def srr_handler(y, x, beta):
-    resid = y - np.dot(x, beta)
-    try:
-        out = 1 - np.var(resid) / np.var(y)  # 停牌的股票长期的波动为0，视为无效数据
-    except FloatingPointError:
-        out = np.nan
-    return out
+def srr_handler(result):
+    # 1 - var(resid) / var(y)，即拟合优度，停牌的股票长期的波动为0，视为无效数据
+    return result.rsquared
 
 
 factor_list.append(Factor('SYSRISK_RATIO', gen_capm_factor(srr_handler),
                           pd.to_datetime('2017-12-21'), dependency=['ADJ_CLOSE', 'SSEC_CLOSE'],
-                          desc='系统风险占比因子'))
+                          desc='系统风险占比因子', lookback=252))
 
 # --------------------------------------------------------------------------------------------------
 # 修正后的与CAPM相关的因子
@@ -876,75 +830,21 @@ def gen_capm_factor_ffi(handler, cycle=252):
     Parameter
     ---------
     handler: function
-        用于在每次滚动回归的时候，计算所需要的数据。函数的格式为handler(y, x, beta)-> float
-        其中y为应变量是n*1的向量（n为滚动窗口的长度），x为自变量为n*2的矩阵，beta为2*1的向量
-        （0的位置为截距项）
+        用于根据滚动回归的结果计算所需要的数据。函数的格式为handler(result)-> pd.DataFrame
+        其中result为datatoolkits.rolling_ols的结果，截距项的名称为const，基准收益的名称为market
     '''
     @drop_delist_data
     def inner(universe, start_time, end_time):
-        def moving_ols(y, x, window):
-            '''
-            滚动快速计算OLS
-            '''
-            # 添加截距项
-            x = pd.DataFrame({'constant': [1] * len(x), 'x': x}, columns=['constant', 'x'])
-            # pdb.set_trace()
-            # 计算累计的xx和xy
-            K = len(x.columns)
-            N = len(x)
-            last_xx = np.zeros((K, K))
-            last_xy = np.zeros(K)
-            cum_xx = []
-            cum_xy = []
-            for i in range(N):
-                data_x = x.values[i: i + 1]
-                data_y = y.values[i: i + 1]
-                xy = np.dot(data_x.T, data_y)
-                xx = np.dot(data_x.T, data_x)
-                # 如果只有部分数据是NA，则也会导致后面无法算出beat从而产生BUG
-                # 但是考虑到x一般是基准指数，不太会在中途出现NA值，而y是当前股票收益，也不太会中途出现NA值
-                # 而且如果y为NA值，则xy全部都为NA值，因而不需要担心上述可能的BUG
-                if np.all(np.isnan(last_xx)) and not np.all(np.isnan(xx)):  # 识别第一个有效X'X，并用其重置last_xx
-                    last_xx = xx
-                else:
-                    last_xx = last_xx + np.dot(data_x.T, data_x)
-                if np.all(np.isnan(last_xy)) and not np.all(np.isnan(xx)):
-                    last_xy = xy
-                else:
-                    last_xy = last_xy + np.dot(data_x.T, data_y)
-                cum_xy.append(last_xy)
-                cum_xx.append(last_xx)
-            # pdb.set_trace()
-            # 计算滚动beta
-            out = np.empty(N, dtype=float)
-            out[:] = np.NaN
-            for i in range(N):
-                if i < window or np.any(pd.isnull(x.iloc[i])):
-                    continue
-                xx = cum_xx[i] - cum_xx[i - window]
-                xy = cum_xy[i] - cum_xy[i - window]
-                try:
-                    beta = linalg.solve(xx, xy)
-                    tmp_x = x.values[i + 1 - window: i + 1]
-                    tmp_y = y.values[i + 1 - window: i + 1]
-                    out[i] = handler(tmp_y, tmp_x, beta)
-
-                except LinAlgError as e:    # 因为停牌等因素，股价一直都不变，此时的beta没有意义
-                    continue
-            # pdb.set_trace()
-            return pd.Series(out, index=x.index)
-
         days = cycle
         start_time = pd.to_datetime(start_time)
         end_time = pd.to_datetime(end_time)
-        new_start = dateshandle.tds_shift(start_time, days)
+        new_start = get_lookback_start(start_time, days)   # 计算days个收益率需要days+1个价格
         stock_data = query('ADJ_CLOSE', (new_start, end_time))
         benchmark_data = query('CSIFFI_CLOSE', (new_start, end_time))
-        stock_data = stock_data.pct_change().dropna(how='all').dropna(how='all', axis=1)
-        benchmark_data = benchmark_data.iloc[:, 0].pct_change().dropna()
-        # pdb.set_trace()
-        # tqdm.pandas()
-        data = stock_data.apply(lambda x: moving_ols(x, benchmark_data, days))
+        stock_data = stock_data.pct_change(fill_method=None).dropna(how='all').\
+            dropna(how='all', axis=1)
+        benchmark_data = benchmark_data.iloc[:, 0].pct_change().dropna().rename('market')
+        data = handler(datatoolkits.rolling_ols(stock_data, benchmark_data, days))
         mask = (data.index >= start_time) & (data.index <= end_time)
         data = data.loc[mask, sorted(universe)]
         if start_time > pd.to_datetime(START_TIME):     # 第一次更新从START_TIME开始，必然会有缺失数据
@@ -954,21 +854,25 @@ def gen_capm_factor_ffi(handler, cycle=252):
 
 
 factor_list.append(Factor('BETA_FFI', gen_capm_factor_ffi(beta_handler), pd.to_datetime('2018-06-07'),
-                          dependency=['ADJ_CLOSE', 'CSIFFI_CLOSE'], desc='252交易日滚动beta系数，使用中证流通指数计算'))
+                          dependency=['ADJ_CLOSE', 'CSIFFI_CLOSE'], desc='252交易日滚动beta系数，使用中证流通指数计算',
+                          lookback=252))
 
 
 factor_list.append(Factor('SPECIAL_VOL_FFI', gen_capm_factor_ffi(idiosyncratic_handler),
                           pd.to_datetime('2018-06-07'), dependency=['ADJ_CLOSE', 'CSIFFI_CLOSE'],
-                          desc='特质波动率，使用中证流通指数计算'))
+                          desc='特质波动率，使用中证流通指数计算', lookback=252))
 factor_list.append(Factor('SPECIAL_VOL_FFI_120', gen_capm_factor_ffi(idiosyncratic_handler, 120),
                           pd.to_datetime('2018-06-25'), dependency=['ADJ_CLOSE', 'CSIFFI_CLOSE'],
-                          desc='特质波动率，使用中证流通指数计算，计算时间周期为120个交易日'))
+                          desc='特质波动率，使用中证流通指数计算，计算时间周期为120个交易日',
+                          lookback=120))
 factor_list.append(Factor('SPECIAL_VOL_FFI_60', gen_capm_factor_ffi(idiosyncratic_handler, 60),
                           pd.to_datetime('2018-06-25'), dependency=['ADJ_CLOSE', 'CSIFFI_CLOSE'],
-                          desc='特质波动率，使用中证流通指数计算，计算时间周期为60个交易日'))
+                          desc='特质波动率，使用中证流通指数计算，计算时间周期为60个交易日',
+                          lookback=60))
 factor_list.append(Factor('SPECIAL_VOL_FFI_30', gen_capm_factor_ffi(idiosyncratic_handler, 30),
                           pd.to_datetime('2018-06-25'), dependency=['ADJ_CLOSE', 'CSIFFI_CLOSE'],
-                          desc='特质波动率，使用中证流通指数计算，计算时间周期为30个交易日'))
+                          desc='特质波动率，使用中证流通指数计算，计算时间周期为30个交易日',
+                          lookback=30))
 
 
 
@@ -1012,10 +916,7 @@ def get_institutions_holding(data_category):
         data['code'] = data.code.apply(datatoolkits.add_suffix)
         data['data'] = data.data.fillna(0)
         tds = dateshandle.get_tds(start_time, end_time)
-        data = data.groupby('code').apply(datatoolkits.map_data, days=tds, fromNowOn=True,
-                                          fillna={'code': lambda x: x.code.iloc[0]})
-        data = data.reset_index(drop=True)
-        data = data.pivot_table('data', index='time', columns='code')
+        data = datatoolkits.map_data_bulk(data, tds, fromNowOn=True)
         data = data.loc[:, sorted(universe)]
         assert check_indexorder(data), 'Error, data order is mixed!'
         assert checkdata_completeness(data, start_time, end_time), "Error, data missed!"
@@ -1063,15 +964,9 @@ def get_rstr(universe, start_time, end_time):
     weight = np.array([decay_rate**i if i >= lag else 0
                        for i in range(period + lag, 0, -1)])
     weight = weight / np.sum(weight)
-    new_start = dateshandle.tds_shift(start_time, period + lag)
+    new_start = get_lookback_start(start_time, period + lag - 1)
     ret_data = query('DAILY_RET', (new_start, end_time))
-
-    def calc_rollingrstr(ts):
-        # 滚动计算单股票的rstr
-        ts = np.log(1 + ts)
-        out = ts.rolling(lag + period).apply(lambda x: x.dot(weight))
-        return out
-    data = ret_data.apply(calc_rollingrstr)
+    data = datatoolkits.rolling_weighted_sum(np.log(1 + ret_data), weight)
     mask = (data.index >= start_time) & (data.index <= end_time)
     data = data.loc[mask, sorted(universe)]
     if start_time > pd.to_datetime(START_TIME):     # 第一次更新从START_TIME开始，必然会有缺失数据
@@ -1080,7 +975,7 @@ def get_rstr(universe, start_time, end_time):
 
 
 factor_list.append(Factor('RSTR', get_rstr, pd.to_datetime('2017-10-17'), dependency=['DAILY_RET'],
-                          desc='BARRA RSTR因子'))
+                          desc='BARRA RSTR因子', lookback=524))
 # --------------------------------------------------------------------------------------------------
 # 日波动率
 
@@ -1096,13 +991,13 @@ def get_dstd(universe, start_time, end_time):
     decay_rate = 0.5**(1 / half_life)
     weight = np.array([decay_rate**i for i in range(period, 0, -1)])
     weight = weight / np.sum(weight)
-
-    def calc_dstd(ts):
-        return ts.rolling(period).apply(lambda x: np.sqrt(np.dot(np.power(x - np.mean(x), 2),
-                                                                 weight)))
-    new_start = dateshandle.tds_shift(start_time, period)
+    new_start = get_lookback_start(start_time, period - 1)
     ret_data = query('DAILY_RET', (new_start, end_time))
-    data = ret_data.apply(calc_dstd)
+    # sum(w * (x - mean)^2) = sum(w * x^2) - 2 * mean * sum(w * x) + mean^2，其中sum(w) = 1
+    wsum = datatoolkits.rolling_weighted_sum(ret_data, weight)
+    wsum2 = datatoolkits.rolling_weighted_sum(ret_data ** 2, weight)
+    mean = ret_data.rolling(period, min_periods=period).mean()
+    data = np.sqrt((wsum2 - 2 * mean * wsum + mean ** 2).clip(lower=0))
     mask = (data.index >= start_time) & (data.index <= end_time)
     data = data.loc[mask, sorted(universe)]
     if start_time > pd.to_datetime(START_TIME):     # 第一次更新从START_TIME开始，必然会有缺失数据
@@ -1111,11 +1006,56 @@ def get_dstd(universe, start_time, end_time):
 
 
 factor_list.append(Factor('DSTD', get_dstd, pd.to_datetime('2017-10-17'), dependency=['DAILY_RET'],
-                          desc='BARRA DSTD因子'))
+                          desc='BARRA DSTD因子', lookback=251))
 # --------------------------------------------------------------------------------------------------
 # BARRA CMRA
 
 
+def calc_cmra(quote_data, monthly_td=21, month_cnt=12):
+    '''
+    根据复权价格计算所有股票的滚动CMRA
+
+    Parameter
+    ---------
+    quote_data: pd.DataFrame
+        复权价格，index为时间，columns为股票代码
+    monthly_td: int, default 21
+        每个月的交易日数量
+    month_cnt: int, default 12
+        计算所使用的月份数量
+
+    Return
+    ------
+    out: pd.DataFrame
+        index和columns与quote_data相同，窗口（monthly_td * month_cnt个交易日）中有NA收益的位置为NA
+
+    Notes
+    -----
+    收益率计算时不填充NA价格（fill_method=None），价格为NA的交易日对应的收益为NA，使得结果只依赖于
+    窗口内（往前(month_cnt + 1) * monthly_td - 1个交易日）的价格，增量更新与全部重新计算的结果相同
+    '''
+    ret_data = quote_data.pct_change(monthly_td, fill_method=None)
+    window = monthly_td * month_cnt
+    # 使用修改后的算法，原报告中的算法会导致股票大跌后出现NA值：从t往前依次累计最近k+1个月的（对数）收益，
+    # k=0...month_cnt-1，CMRA为这些累计收益的极差
+    log_ret = np.log(1 + ret_data).fillna(0).values
+    T, S = log_ret.shape
+    # 按月度分块后沿块累加，即cum[t] = log_ret[t] + log_ret[t - monthly_td] + ...，前面补充window行0
+    block_cnt = month_cnt + -(-T // monthly_td)
+    padded = np.zeros((block_cnt * monthly_td, S))
+    padded[window: window + T] = log_ret
+    cum = np.cumsum(padded.reshape(block_cnt, monthly_td, S), axis=0).reshape(-1, S)
+    # 最近k+1个月的累计收益为cum[t] - cum[t - (k + 1) * monthly_td]，因此累计收益的极差等于
+    # cum[t - m * monthly_td]（m=1...month_cnt）的极差
+    lagged = [cum[window - m * monthly_td: window - m * monthly_td + T]
+              for m in range(1, month_cnt + 1)]
+    data = pd.DataFrame(np.maximum.reduce(lagged) - np.minimum.reduce(lagged),
+                        index=ret_data.index, columns=ret_data.columns)
+    # 窗口中所有的收益均有效时才计算
+    valid = ret_data.notnull().astype(np.float64).rolling(window, min_periods=window).sum() >= window
+    return data.where(valid)
+
+
 @drop_delist_data
 def get_cmra(universe, start_time, end_time):
     '''
@@ -1125,28 +1065,10 @@ def get_cmra(universe, start_time, end_time):
     month_cnt = 12
 
     start_time = pd.to_datetime(start_time)
-    new_start = dateshandle.tds_shift(start_time, month_cnt * monthly_td)
+    # 窗口中的month_cnt * monthly_td个月度收益率需要往前多monthly_td个价格
+    new_start = get_lookback_start(start_time, (month_cnt + 1) * monthly_td - 1)
     quote_data = query('ADJ_CLOSE', (new_start, end_time))
-    ret_data = quote_data.pct_change(monthly_td)
-    idx_slice = slice(-1, -month_cnt * monthly_td, -monthly_td)
-
-    def get_single_cmra(df):
-        # 计算单股票的滚动CMRA，使用修改后的算法，原报告中的算法会导致股票大跌后出现NA值
-        def single_period_cmra(ts):
-            # pdb.set_trace()
-            valid_data = ts[idx_slice]
-            cum_ret = np.cumprod(1 + valid_data) - 1
-            rng = np.log(1 + np.max(cum_ret)) - np.log(1 + np.min(cum_ret))
-            # if pd.isnull(rng):
-            #     pdb.set_trace()
-            return rng
-        # pdb.set_trace()
-        res = df.rolling(monthly_td * month_cnt, min_periods=monthly_td * month_cnt).\
-            apply(single_period_cmra)
-        # pdb.set_trace()
-        return res
-
-    data = ret_data.apply(get_single_cmra)
+    data = calc_cmra(quote_data, monthly_td, month_cnt)
     mask = (data.index >= start_time) & (data.index <= end_time)
     data = data.loc[mask, sorted(universe)]
     if start_time > pd.to_datetime(START_TIME):     # 第一次更新从START_TIME开始，必然会有缺失数据
@@ -1155,7 +1077,7 @@ def get_cmra(universe, start_time, end_time):
 
 
 factor_list.append(Factor('CMRA', get_cmra, pd.to_datetime('2017-10-19'),
-                          dependency=['ADJ_CLOSE'], desc='BARRA CMRA因子'))
+                          dependency=['ADJ_CLOSE'], desc='BARRA CMRA因子', lookback=272))
 # --------------------------------------------------------------------------------------------------
 # BARRA LEVERAGE
 
@@ -1286,7 +1208,7 @@ def gen_ma(offset):
     '''
     @drop_delist_data
     def inner(universe, start_time, end_time):
-        new_start = dateshandle.tds_shift(start_time, offset)
+        new_start = get_lookback_start(start_time, offset - 1)
         close_data = query('ADJ_CLOSE', (new_start, end_time))
         ma = close_data.rolling(offset, min_periods=offset).mean()
         data = ma / close_data
@@ -1301,7 +1223,7 @@ def gen_ma(offset):
 for offset in [3, 5, 10, 20, 50, 100, 200]:
     factor_list.append(Factor('MA%d' % offset, gen_ma(offset), pd.to_datetime('2017-12-06'),
                               dependency=['ADJ_CLOSE'],
-                              desc='经过收盘价正则化后的%d日均线' % offset))
+                              desc='经过收盘价正则化后的%d日均线' % offset, lookback=offset - 1))
 
 
 # --------------------------------------------------------------------------------------------------
@@ -1444,76 +1366,23 @@ def get_ff_idio(cycle=252):
     '''
     @drop_delist_data
     def inner(universe, start_time, end_time):
-        def moving_ols(y, x, hml, smb, window):
-            '''
-            滚动快速计算OLS
-            '''
-            # 添加截距项
-            x = pd.DataFrame({'constant': [1] * len(x), 'x': x, 'hml': hml, 'smb': smb}, columns=['constant', 'x', 'hml', 'smb'])
-            # pdb.set_trace()
-            # 计算累计的xx和xy
-            K = len(x.columns)
-            N = len(x)
-            last_xx = np.empty((K, K))
-            last_xy = np.empty(K)
-            last_xx[:] = np.nan
-            last_xy[:] = np.nan
-            cum_xx = []
-            cum_xy = []
-            for i in range(N):
-                data_x = x.values[i: i + 1]
-                data_y = y.values[i: i + 1]
-                xy = np.dot(data_x.T, data_y)
-                xx = np.dot(data_x.T, data_x)
-                # pdb.set_trace()
-                # 如果只有部分数据是NA，则也会导致后面无法算出beat从而产生BUG
-                # 但是考虑到x一般是基准指数，不太会在中途出现NA值，而y是当前股票收益，也不太会中途出现NA值
-                # 而且如果y为NA值，则xy全部都为NA值，因而不需要担心上述可能的BUG
-                if (np.any(np.isnan(last_xx)) and not np.any(np.isnan(xx))) or\
-                   (np.any(np.isnan(last_xy)) and not np.any(np.isnan(xx))):    # 识别第一个没有任何NA值的xx和xy对
-                    last_xx = xx
-                    last_xy = xy
-                else:
-                    last_xx = last_xx + np.dot(data_x.T, data_x)
-                    last_xy = last_xy + np.dot(data_x.T, data_y)
-                cum_xy.append(last_xy)
-                cum_xx.append(last_xx)
-            # pdb.set_trace()
-            # 计算滚动beta
-            out = np.empty(N, dtype=float)
-            out[:] = np.NaN
-            for i in range(N):
-                if i < window or np.any(pd.isnull(x.iloc[i])):
-                    continue
-                xx = cum_xx[i] - cum_xx[i - window]
-                xy = cum_xy[i] - cum_xy[i - window]
-                try:
-                    beta = linalg.solve(xx, xy)
-                    # pdb.set_trace()
-                    tmp_x = x.values[i + 1 - window: i + 1]
-                    tmp_y = y.values[i + 1 - window: i + 1]
-                    if np.all(np.isclose(beta, 0)):    # 因为周期过短会导致计算出的系数为0，因而特异波动率也会为0
-                        continue
-                    out[i] = np.std(tmp_y - np.dot(tmp_x, beta))
-                except LinAlgError as e:    # 因为停牌等因素，股价一直都不变，此时的beta没有意义
-                    continue
-            # pdb.set_trace()
-            return pd.Series(out, index=x.index)
-
         days = cycle
         start_time = pd.to_datetime(start_time)
         end_time = pd.to_datetime(end_time)
-        new_start = dateshandle.tds_shift(start_time, days)
+        new_start = get_lookback_start(start_time, days)   # 计算days个收益率需要days+1个价格
         stock_data = query('ADJ_CLOSE', (new_start, end_time))
         benchmark_data = query('CSIFFI_CLOSE', (new_start, end_time))
-        stock_data = stock_data.pct_change().dropna(how='all').dropna(how='all', axis=1)
+        stock_data = stock_data.pct_change(fill_method=None).dropna(how='all').\
+            dropna(how='all', axis=1)
         benchmark_data = benchmark_data.iloc[:, 0].pct_change().dropna()
         hml_data = query('FF_HML', (new_start, end_time)).loc[stock_data.index[0]:, '000001.SZ']
         smb_data = query('FF_SMB', (new_start, end_time)).loc[stock_data.index[0]:, '000001.SZ']
-        # pdb.set_trace()
-#         tqdm.pandas()
-        data = stock_data.apply(lambda x: moving_ols(x, benchmark_data, hml_data, smb_data, days))
-#         data = stock_data.progress_apply(lambda x: moving_ols(x, benchmark_data, hml_data, smb_data, days))
+        factor_data = pd.DataFrame({'x': benchmark_data, 'hml': hml_data, 'smb': smb_data},
+                                   columns=['x', 'hml', 'smb'])
+        result = datatoolkits.rolling_ols(stock_data, factor_data, days)
+        # 因为周期过短会导致计算出的系数为0，因而特异波动率也会为0
+        zero_beta = np.logical_and.reduce([np.isclose(p, 0) for p in result.params.values()])
+        data = np.sqrt(result.resid_var).where(~zero_beta)
         mask = (data.index >= start_time) & (data.index <= end_time)
         data = data.loc[mask, sorted(universe)]
         if start_time > pd.to_datetime(START_TIME):     # 第一次更新从START_TIME开始，必然会有缺失数据
@@ -1522,7 +1391,7 @@ def get_ff_idio(cycle=252):
     return inner
 factor_list.append(Factor('FF_SPECIAL_VOL_30', get_ff_idio(30), pd.to_datetime('2018-06-26'),
                           ['ADJ_CLOSE', 'CSIFFI_CLOSE', 'FF_HML', 'FF_SMB', 'LIST_STATUS'],
-                          '使用FF三因子模型计算的特异波动率'))
+                          '使用FF三因子模型计算的特异波动率', lookback=30))
 
 # --------------------------------------------------------------------------------------------------
 # BAC论文，改进的SMAX因子
@@ -1551,22 +1420,24 @@ def gen_smax(lookback_period, ret_freq, max_cnt):
     这种计算方式会导致波动相对于单日计算出的波动存在膨胀效应
     '''
     def inner(universe, start_time, end_time):
-        new_start_time = get_calendar('stock.sse').shift_tradingdays(start_time, -(lookback_period+2*ret_freq))
+        # lookback_period个收益率需要往前多ret_freq个价格
+        new_start_time = get_lookback_start(start_time, lookback_period + ret_freq - 1)
         adj_close = query('ADJ_CLOSE', (new_start_time, end_time))
-        rets = adj_close.pct_change(ret_freq)
+        rets = adj_close.pct_change(ret_freq, fill_method=None)
         vol = rets.rolling(lookback_period, min_periods=lookback_period).std()
         mask = ~np.isclose(vol, 0, atol=1.e-6)
         vol = vol.where(mask, np.nan)
-        avg_nlargest_rets = rets.rolling(lookback_period, min_periods=lookback_period).\
-                            apply(lambda x: np.mean(np.sort(x)[-max_cnt:]))
+        avg_nlargest_rets = datatoolkits.rolling_topk(rets, lookback_period, max_cnt)
         data = avg_nlargest_rets / vol
         data = data.loc[(data.index >= pd.to_datetime(start_time)) & (data.index <= pd.to_datetime(end_time)), sorted(universe)]
         checkdata_completeness(data, start_time, end_time)
         return data
     return inner
 
-factor_list.append(Factor('SMAX_M', gen_smax(30, 3, 5), pd.to_datetime('2018-06-27'), ['ADJ_CLOSE'], '按月度数据计算的SMAX因子'))
-factor_list.append(Factor('SMAX_MD', gen_smax(30, 1, 5), pd.to_datetime('2018-06-27'), ['ADJ_CLOSE'], '按月度数据计算的SMAX因子，使用日收益率数据'))
+factor_list.append(Factor('SMAX_M', gen_smax(30, 3, 5), pd.to_datetime('2018-06-27'), ['ADJ_CLOSE'], '按月度数据计算的SMAX因子',
+                          lookback=32))
+factor_list.append(Factor('SMAX_MD', gen_smax(30, 1, 5), pd.to_datetime('2018-06-27'), ['ADJ_CLOSE'], '按月度数据计算的SMAX因子，使用日收益率数据',
+                          lookback=30))
 
 # --------------------------------------------------------------------------------------------------
 
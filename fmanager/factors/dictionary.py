@@ -19,6 +19,7 @@ from datatoolkits import dump_pickle, load_pickle
 from fmanager.factors import basicfactors
 from fmanager.factors import derivativefactors
 from fmanager.factors import barra
+from fmanager.factors.utils import clear_pickle_cache
 from fmanager.const import FACTOR_FILE_PATH, SUFFIX, FACTOR_DICT_FILE_PATH
 
 
@@ -129,6 +130,7 @@ def update_factordict(path=FACTOR_DICT_FILE_PATH):
     all_factor = get_factor_dict()
     factor_dict = gen_path_dict(all_factor)
     dump_pickle(factor_dict, path)
+    clear_pickle_cache(path)
 
 
 def check_dict(path=FACTOR_DICT_FILE_PATH):
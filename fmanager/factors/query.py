@@ -15,24 +15,141 @@ __version__ = 1.0.0
 修改日期：2017-07-27
 修改内容：
     给query函数添加fillna参数选项
+
+修改日期：2026-10-17
+修改内容：
+    1. 缓存因子字典、universe和DBConnector，文件未修改时不再重复读取
+    2. 添加query_many，一次查询多个因子并对齐
+    3. 添加可选的查询结果磁盘缓存（enable_query_cache）
+    4. 添加prefetch，预先读取因子更新时依赖因子的数据，回溯期内的查询直接从内存中获取
 '''
 __version__ = '1.0.0'
 import pdb
+from collections import OrderedDict, namedtuple
+from os.path import getmtime
 # 第三方库
 import numpy as np
+import pandas as pd
 # 本地库
-from datatoolkits import load_pickle
-from fmanager.const import FACTOR_DICT_FILE_PATH
+from fmanager.const import (FACTOR_DICT_FILE_PATH, UNIVERSE_FILE_PATH, QUERY_CACHE_PATH,
+                            QUERY_CACHE_SIZE)
 from fmanager import database
-from fmanager.factors.utils import get_universe
+from fmanager.factors.utils import get_universe, load_pickle_cached
+from fmanager.factors.querycache import QueryCache
 
 # --------------------------------------------------------------------------------------------------
 # 常量
+# 进程内的DBConnector缓存，格式为{path: (mtime, connector)}
+_CONNECTOR_CACHE = {}
+# query_many以数组形式返回的结果，data的形状为(因子, 时间, 股票代码)
+FactorPanel = namedtuple('FactorPanel', 'data factors dates codes')
+# query的磁盘缓存，None表示不使用缓存
+_QUERY_CACHE = None
+# 预先读取的因子数据，格式为{factor_name: (start_time, end_time, data)}
+_PREFETCH = {}
 
 # --------------------------------------------------------------------------------------------------
 # 函数
 
 
+def get_connector(path):
+    '''
+    获取数据文件对应的DBConnector，文件修改时间不变时复用之前的对象（及其缓存的数据时间、股票代码
+    映射等信息）
+
+    Parameter
+    ---------
+    path: str
+        数据文件的路径
+
+    Return
+    ------
+    out: database.DBConnector
+    '''
+    mtime = getmtime(path)
+    cached = _CONNECTOR_CACHE.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    connector = database.DBConnector(path)
+    _CONNECTOR_CACHE[path] = (mtime, connector)
+    return connector
+
+
+def enable_query_cache(path=QUERY_CACHE_PATH, max_size=QUERY_CACHE_SIZE):
+    '''
+    启用query的磁盘缓存，启用后相同参数的查询直接从缓存中读取结果
+
+    Parameter
+    ---------
+    path: str, default QUERY_CACHE_PATH
+        缓存目录
+    max_size: int, default QUERY_CACHE_SIZE
+        缓存目录的最大容量（字节），超过后按照最近最少使用的原则删除
+
+    Notes
+    -----
+    缓存的键中包含数据文件的数据时间和修改时间以及universe文件的修改时间，数据更新后旧的缓存
+    不会再被读取，最终被LRU删除
+    '''
+    global _QUERY_CACHE
+    _QUERY_CACHE = QueryCache(path, max_size)
+
+
+def disable_query_cache():
+    '''
+    停用query的磁盘缓存（不删除已有的缓存文件）
+    '''
+    global _QUERY_CACHE
+    _QUERY_CACHE = None
+
+
+def prefetch(factor_names, time):
+    '''
+    预先读取给定因子在给定时间区间内的数据并保存在内存中，之后查询所有股票（codes和fillna均为None）
+    且查询的时间区间在该区间内时，query直接从内存数据中截取结果
+
+    Parameter
+    ---------
+    factor_names: list
+        需要预先读取的因子名称
+    time: tuple
+        (start_time, end_time)，预先读取的时间区间
+
+    Notes
+    -----
+    使用完毕后需要调用clear_prefetch，否则数据文件更新后仍然会返回旧的数据
+    '''
+    start_time, end_time = [pd.to_datetime(t) for t in time]
+    for factor_name in factor_names:
+        data = query(factor_name, (start_time, end_time))
+        if data is not None:
+            _PREFETCH[factor_name] = (start_time, end_time, data)
+
+
+def clear_prefetch():
+    '''
+    清除prefetch预先读取的数据
+    '''
+    _PREFETCH.clear()
+
+
+def _query_prefetched(factor_name, time):
+    '''
+    从预先读取的数据中查询，若没有预先读取该因子或者查询区间超出了预先读取的区间，返回None
+    '''
+    if factor_name not in _PREFETCH:
+        return None
+    if isinstance(time, tuple):
+        start_time, end_time = [pd.to_datetime(t) for t in time]
+    else:
+        start_time = end_time = pd.to_datetime(time)
+    pstart, pend, data = _PREFETCH[factor_name]
+    if start_time < pstart or end_time > pend:
+        return None
+    data = data.loc[(data.index >= start_time) & (data.index <= end_time)]
+    return data.copy()
+
+
 def query(factor_name, time, codes=None, fillna=None):
     '''
     接受外部的请求，从数据库中获取对应因子的数据
@@ -52,15 +169,19 @@ def query(factor_name, time, codes=None, fillna=None):
     out: pd.DataFrame
         查询结果数据，index为时间，columns为股票代码，如果未查询到符合要求的数据，则返回None
     '''
-    # 若更换了机器，需要先更新因子字典
-    factor_dict = load_pickle(FACTOR_DICT_FILE_PATH)
-    if factor_dict is None:
-        raise ValueError('Dictionary file needs initialization...')
-    assert factor_name in factor_dict, \
-        'Error, factor name "{pname}" is'.format(pname=factor_name) +\
-        ' not valid, valid names are {vnames}'.format(vnames=sorted(factor_dict.keys()))
-    abs_path = factor_dict[factor_name]
-    db = database.DBConnector(abs_path)
+    if codes is None and fillna is None and _PREFETCH:
+        data = _query_prefetched(factor_name, time)
+        if data is not None:
+            return data if len(data) > 0 else None
+    abs_path = _get_factor_path(factor_name)
+    db = get_connector(abs_path)
+    cache = _QUERY_CACHE
+    if cache is not None:
+        version = (db.data_time, getmtime(abs_path), getmtime(UNIVERSE_FILE_PATH))
+        cache_key = cache.make_key(factor_name, time, codes, version, fillna=fillna)
+        data = cache.get(cache_key)
+        if data is not None:
+            return data
     data = db.query(time, codes)
     if data is None:
         return None
@@ -68,13 +189,102 @@ def query(factor_name, time, codes=None, fillna=None):
     if codes is None:   # 为了避免数据的universe不一致导致不同数据的横截面长度不同
         data = data.reindex(columns=universe)
     if fillna is None:
-        fillna = db.default_data
-        if isinstance(fillna, np.bytes_):
-            fillna = fillna.decode('utf8')
+        fillna = _get_default_data(db)
     data = data.fillna(fillna)
+    if cache is not None:
+        cache.put(cache_key, data)
     return data
 
 
+def query_many(factor_names, time, codes=None, as_array=False):
+    '''
+    一次查询多个因子的数据，所有因子的数据对齐到相同的时间和股票代码
+
+    Parameter
+    ---------
+    factor_names: list
+        需要查询的因子名称
+    time: type that can be converted by pd.to_datetime or tuple of that
+        单一的参数表示查询横截面的数据，元组（start_time, end_time）表示查询时间序列数据
+    codes: list, default None
+        需要查询数据的股票代码，默认为None，表示查询universe中所有股票的数据
+    as_array: boolean, default False
+        是否以数组的形式返回结果，默认为False
+
+    Return
+    ------
+    out: OrderedDict or FactorPanel
+        as_array为False时，返回{factor_name: pd.DataFrame}，顺序与factor_names相同，每个DataFrame的
+        index均为所有因子数据时间的并集，columns均为股票代码；as_array为True时，返回FactorPanel，
+        其中data为形状为(因子, 时间, 股票代码)的np.array（包含字符串因子时dtype为object），factors、
+        dates、codes为对应的标签。如果所有因子都没有查询到数据，返回None
+
+    Notes
+    -----
+    因子字典和universe只读取一次，某个因子在对齐后的时间上没有数据时，使用该因子的默认数据填充
+    '''
+    cols = get_universe() if codes is None else codes
+    raw_datas = OrderedDict()
+    dates = None
+    for factor_name in factor_names:
+        db = get_connector(_get_factor_path(factor_name))
+        data = db.query(time, codes)
+        raw_datas[factor_name] = (db, data)
+        if data is None:
+            continue
+        dates = data.index if dates is None else dates.union(data.index)
+    if dates is None:
+        return None
+    out = OrderedDict()
+    for factor_name, (db, data) in raw_datas.items():
+        fill_value = _get_default_data(db)
+        if data is None:
+            data = pd.DataFrame(fill_value, index=dates, columns=cols)
+        else:
+            if not (data.index.equals(dates) and data.columns.equals(pd.Index(cols))):
+                data = data.reindex(index=dates, columns=cols)
+            data = data.fillna(fill_value)
+        out[factor_name] = data
+    if as_array:
+        panel = np.stack([data.values for data in out.values()])
+        out = FactorPanel(data=panel, factors=list(out.keys()), dates=dates, codes=list(cols))
+    return out
+
+
+def _get_factor_path(factor_name):
+    '''
+    从因子字典中获取因子数据文件的路径，并检查因子名称是否合法
+
+    Parameter
+    ---------
+    factor_name: str
+        因子名称
+
+    Return
+    ------
+    out: str
+        因子数据文件的绝对路径
+    '''
+    # 若更换了机器，需要先更新因子字典
+    factor_dict = load_pickle_cached(FACTOR_DICT_FILE_PATH)
+    if factor_dict is None:
+        raise ValueError('Dictionary file needs initialization...')
+    assert factor_name in factor_dict, \
+        'Error, factor name "{pname}" is'.format(pname=factor_name) +\
+        ' not valid, valid names are {vnames}'.format(vnames=sorted(factor_dict.keys()))
+    return factor_dict[factor_name]
+
+
+def _get_default_data(db):
+    '''
+    获取数据文件的默认填充数据，字符串类型的数据会被解码
+    '''
+    fill_value = db.default_data
+    if isinstance(fill_value, np.bytes_):
+        fill_value = fill_value.decode('utf8')
+    return fill_value
+
+
 def generate_getter(factor_name):
     '''
     母函数，用于生成获取因子数据的函数，供DataView初始化
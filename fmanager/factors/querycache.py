@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date    : 2026-10-17 14:20:31
+# @Author  : Li Hao (howardlee_h@outlook.com)
+# @Link    : https://github.com/SAmmer0
+# @Version : $Id$
+'''
+因子查询结果的本地磁盘缓存，缓存的大小有上限，超过上限时按照最近最少使用（LRU）的原则删除
+
+__version__ = 1.0.0
+修改日期：2026-10-17
+修改内容：
+    初始化，添加QueryCache
+
+修改日期：2026-10-17
+修改内容：
+    记录缓存目录的当前大小，写入缓存时只有在大小超过上限时才遍历缓存目录
+'''
+__version__ = '1.0.0'
+
+from hashlib import sha1
+from os import makedirs, remove, replace, scandir, utime, getpid
+from os.path import exists, getsize, join
+import pickle
+
+import pandas as pd
+
+from datatoolkits import dump_pickle, load_pickle
+from fmanager.const import QUERY_CACHE_PATH, QUERY_CACHE_SIZE
+
+# --------------------------------------------------------------------------------------------------
+# 常量
+CACHE_SUFFIX = '.pickle'    # 缓存文件的后缀
+# --------------------------------------------------------------------------------------------------
+# 类
+
+
+class QueryCache(object):
+    '''
+    查询结果缓存，每个查询结果存储为缓存目录中的一个pickle文件，文件名由查询参数生成；
+    读取缓存时会更新文件的修改时间，删除缓存时优先删除修改时间最早的文件
+    '''
+
+    def __init__(self, path=QUERY_CACHE_PATH, max_size=QUERY_CACHE_SIZE):
+        '''
+        Parameter
+        ---------
+        path: str, default QUERY_CACHE_PATH
+            缓存目录，不存在时会自动创建
+        max_size: int, default QUERY_CACHE_SIZE
+            缓存目录的最大容量（字节）
+        '''
+        self.path = path
+        self.max_size = max_size
+        self._size = None   # 缓存目录的当前大小，首次写入时通过遍历目录初始化
+        if not exists(path):
+            makedirs(path)
+
+    @staticmethod
+    def make_key(factor_name, time, codes, version, **kwargs):
+        '''
+        根据查询参数生成缓存的键
+
+        Parameter
+        ---------
+        factor_name: str
+            因子名称
+        time: type that can be converted by pd.to_datetime or tuple of that
+            查询的时间
+        codes: list or None
+            查询的股票代码
+        version: tuple
+            数据文件的版本标识，数据文件更新后版本标识需要发生变化，使得之前的缓存失效
+        kwargs: dict
+            其他影响查询结果的参数
+
+        Return
+        ------
+        out: str
+        '''
+        if isinstance(time, tuple):
+            start_time, end_time = [pd.to_datetime(t) for t in time]
+        else:
+            start_time = end_time = pd.to_datetime(time)
+        codes_hash = 'ALL' if codes is None else sha1('\n'.join(codes).encode('utf8')).hexdigest()
+        key = [factor_name, str(start_time), str(end_time), codes_hash, repr(version)]
+        key.extend('{k}={v!r}'.format(k=k, v=kwargs[k]) for k in sorted(kwargs))
+        return sha1('|'.join(key).encode('utf8')).hexdigest()
+
+    def _get_path(self, key):
+        return join(self.path, key + CACHE_SUFFIX)
+
+    def get(self, key):
+        '''
+        获取缓存数据，若没有对应的缓存返回None
+        '''
+        path = self._get_path(key)
+        try:
+            data = load_pickle(path)
+            utime(path)     # 更新访问时间，用于LRU
+        except (OSError, EOFError, pickle.UnpicklingError):   # 没有缓存或者缓存文件正在被删除、写入
+            return None
+        return data
+
+    def put(self, key, data):
+        '''
+        写入缓存数据，并更新记录的缓存目录大小，只有在大小超过上限时才遍历目录删除缓存
+
+        Notes
+        -----
+        记录的大小不包含其他进程写入或者删除的文件，因此只是近似值，在遍历目录时会被重新校正
+        '''
+        path = self._get_path(key)
+        tmp_path = path + '.{pid}.tmp'.format(pid=getpid())
+        dump_pickle(data, tmp_path)
+        if self._size is None:
+            self._scan()
+        try:
+            old_size = getsize(path)
+        except OSError:
+            old_size = 0
+        new_size = getsize(tmp_path)
+        replace(tmp_path, path)
+        self._size += new_size - old_size
+        if self._size > self.max_size:
+            self.evict()
+
+    def _scan(self):
+        '''
+        遍历缓存目录，返回[(修改时间, 大小, 路径)]，并重置记录的缓存目录大小
+        '''
+        entries = []
+        for entry in scandir(self.path):
+            if not entry.name.endswith(CACHE_SUFFIX):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:     # 已经被其他进程删除
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        self._size = sum(e[1] for e in entries)
+        return entries
+
+    def evict(self):
+        '''
+        若缓存目录的大小超过上限，按照最近最少使用的顺序删除缓存文件，直到大小不超过上限
+        '''
+        entries = self._scan()
+        total_size = self._size
+        if total_size <= self.max_size:
+            return
+        for _, size, path in sorted(entries):
+            try:
+                remove(path)
+            except OSError:     # 已经被其他进程删除
+                pass
+            total_size -= size
+            if total_size <= self.max_size:
+                break
+        self._size = total_size
+
+    def clear(self):
+        '''
+        删除所有缓存文件
+        '''
+        for entry in scandir(self.path):
+            if entry.name.endswith(CACHE_SUFFIX):
+                remove(entry.path)
+        self._size = 0
@@ -8,6 +8,7 @@
 from collections import defaultdict
 import pdb
 from functools import wraps
+from os.path import getmtime
 
 import pandas as pd
 import numpy as np
@@ -33,6 +34,11 @@ ZXIND_TRANS_DICT = {'银行': 'bank', '房地产': 'realestate', '计算机': 'c
                     '基础化工': 'chemical industry', '传媒': 'media', '煤炭': 'coal',
                     '非银行金融': 'non-bank finance', '钢铁': 'steel', '国防军工': 'war industry'}
 
+# 进程内的pickle文件缓存，格式为{path: (mtime, data)}
+_PICKLE_CACHE = {}
+# 进程内的上市状态掩码缓存，格式为{(start_time, end_time, LIST_STATUS文件修改时间, universe文件修改时间): mask}
+_VALID_MASK_CACHE = {}
+VALID_MASK_CACHE_SIZE = 16  # 掩码缓存的最大数量
 # --------------------------------------------------------------------------------------------------
 # 类定义
 
@@ -43,7 +49,8 @@ class Factor(object):
     因子的相关描述说明、因子数据类型
     '''
 
-    def __init__(self, name, calc_method, addtime, dependency=None, desc=None, data_type='f8'):
+    def __init__(self, name, calc_method, addtime, dependency=None, desc=None, data_type='f8',
+                 lookback=0):
         '''
         Parameter
         ---------
@@ -63,6 +70,10 @@ class Factor(object):
         data_type: str, default f8
             表示因子的数据格式，目前只支持f和s开头的格式描述，数字型数据默认即可，表示64位浮点数，
             字符串型数据以S开头，后面跟上最大的字符串长度（也可分配更多空间，供后续扩展）
+        lookback: int, default 0
+            计算因子时需要的依赖因子在start_time之前的历史数据长度（交易日数量，不包含start_time当天），
+            例如20日滚动均值为19，更新时会预先读取依赖因子从get_lookback_start(start_time, lookback)
+            开始的数据
         '''
         self.name = name
         self.calc_method = calc_method
@@ -70,6 +81,7 @@ class Factor(object):
         self.dependency = dependency
         self.desc = desc
         self.data_type = data_type
+        self.lookback = lookback
 
     def __str__(self):
         data = {'name': self.name, 'dep': self.dependency, 'desc': self.desc,
@@ -178,6 +190,69 @@ def checkdata_completeness(data, start_time, end_time):
     return len(data) == len(tds)
 
 
+def get_lookback_start(start_time, lookback):
+    '''
+    计算满足回溯期要求的数据开始时间，即该时间到start_time之间（包含首尾）恰好有lookback+1个交易日
+
+    Parameter
+    ---------
+    start_time: type that can be converted by pd.to_datetime
+        因子计算的开始时间
+    lookback: int
+        start_time之前需要的交易日数量
+
+    Return
+    ------
+    out: pd.Timestamp
+
+    Notes
+    -----
+    若start_time不是交易日，则结果到start_time之前最近的交易日之间有lookback+1个交易日
+    '''
+    start_time = pd.to_datetime(start_time)
+    if lookback <= 0:
+        return start_time
+    return dateshandle.tds_pshift(start_time, lookback + 1)
+
+
+def load_pickle_cached(path):
+    '''
+    读取pickle文件，并将结果缓存在进程内，文件修改时间不变时直接返回缓存的结果
+
+    Parameter
+    ---------
+    path: str
+        pickle文件的路径
+
+    Return
+    ------
+    out: object
+        pickle文件中的数据，注意返回的是缓存对象本身，不能对其进行修改
+    '''
+    mtime = getmtime(path)
+    cached = _PICKLE_CACHE.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    data = datatoolkits.load_pickle(path)
+    _PICKLE_CACHE[path] = (mtime, data)
+    return data
+
+
+def clear_pickle_cache(path=None):
+    '''
+    清除load_pickle_cached的缓存，在更新pickle文件（因子字典、universe）后调用
+
+    Parameter
+    ---------
+    path: str, default None
+        需要清除缓存的文件路径，None表示清除所有缓存
+    '''
+    if path is None:
+        _PICKLE_CACHE.clear()
+    else:
+        _PICKLE_CACHE.pop(path, None)
+
+
 def get_universe(path=UNIVERSE_FILE_PATH):
     '''
     用于获取当前数据中对应的universe
@@ -191,7 +266,7 @@ def get_universe(path=UNIVERSE_FILE_PATH):
     out: list
         当前数据对应的universe（排序后）
     '''
-    universe = datatoolkits.load_pickle(path)[0]
+    universe = load_pickle_cached(path)[0]
     return sorted(universe)
 
 
@@ -215,10 +290,22 @@ def get_valid_mask(start_time, end_time):
     -----
     数据是否有效是根据当前股票是否退市或者终止上市来判断的，凡是LIST_STATUS为退市或者终止上市（3和4）
     状态的股票均被视作为无效数据，即False
+    结果会缓存在进程内，LIST_STATUS数据文件或者universe文件更新后缓存自动失效；返回的是缓存对象本身，
+    不能对其进行修改
     '''
-    from fmanager.factors.query import query
+    from fmanager.factors.query import query, _get_factor_path
+    start_time = pd.to_datetime(start_time)
+    end_time = pd.to_datetime(end_time)
+    key = (start_time, end_time, getmtime(_get_factor_path('LIST_STATUS')),
+           getmtime(UNIVERSE_FILE_PATH))
+    valid_mask = _VALID_MASK_CACHE.get(key)
+    if valid_mask is not None:
+        return valid_mask
     ls_status = query('LIST_STATUS', (start_time, end_time))
     valid_mask = np.logical_or(ls_status == 1, ls_status == 2)
+    if len(_VALID_MASK_CACHE) >= VALID_MASK_CACHE_SIZE:     # 删除最早加入的缓存
+        del _VALID_MASK_CACHE[next(iter(_VALID_MASK_CACHE))]
+    _VALID_MASK_CACHE[key] = valid_mask
     return valid_mask
 
 
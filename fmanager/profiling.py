@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date    : 2026-10-17 16:05:12
+# @Author  : Li Hao (howardlee_h@outlook.com)
+# @Link    : https://github.com/SAmmer0
+# @Version : $Id$
+'''
+因子更新过程的性能记录，每个因子每次更新记录一条数据，以JSON lines的格式追加写入到记录文件中，
+并提供按照耗时对因子排序、展示各次更新耗时变化的报告
+
+__version__ = 1.0.0
+修改日期：2026-10-17
+修改内容：
+    初始化，添加UpdateProfiler、load_profile和profile_report
+
+修改日期：2026-10-17
+修改内容：
+    UpdateProfiler默认不再使用tracemalloc，改为记录进程的最大常驻内存
+'''
+__version__ = '1.0.0'
+
+import datetime as dt
+import json
+from os import getpid
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:     # Windows系统下没有resource
+    resource = None
+
+import pandas as pd
+
+import fdgetter
+from fmanager.const import UPDATE_PROFILE_FILE_PATH
+from fmanager.database.filelock import FileLock
+
+# --------------------------------------------------------------------------------------------------
+# 类
+
+
+class UpdateProfiler(object):
+    '''
+    记录更新过程中每个因子的性能数据，记录包含以下内容：
+    run_id: 更新批次的标识
+    factor: 因子名称
+    status: 更新结果，success表示成功写入，error表示计算过程中出现AssertionError，fail表示出现其他异常
+    start: 开始计算的时间
+    wall_time: 计算和写入的总耗时（秒）
+    wait_time: 从更新开始到该因子的依赖项全部更新完成的时间（秒）
+    queue_time: 依赖项全部更新完成后到开始计算的排队时间（秒），串行更新时为0
+    sql_queries, sql_rows, sql_time: 计算过程中fdgetter.get_db_data的查询次数、获取的行数和耗时
+    peak_memory: 内存峰值（字节），trace_memory为True时为计算过程中Python（包括numpy）分配内存的峰值；
+        否则为进程到目前为止的最大常驻内存（resource.getrusage的ru_maxrss），无法获取时为None
+    以及update_factor提供的其他数据，例如rows_written、insert_time
+
+    Notes
+    -----
+    该对象可以被序列化后传入进程池的工作进程中，多个进程通过文件锁追加写入同一个记录文件
+    '''
+
+    def __init__(self, path=UPDATE_PROFILE_FILE_PATH, run_id=None, trace_memory=False):
+        '''
+        Parameter
+        ---------
+        path: str, default UPDATE_PROFILE_FILE_PATH
+            记录文件的路径
+        run_id: str, default None
+            更新批次的标识，默认为None表示使用当前时间和进程号生成
+        trace_memory: boolean, default False
+            是否使用tracemalloc记录每个因子的内存峰值，tracemalloc会明显降低计算速度并使记录的耗时
+            失真，仅在排查内存问题时使用；默认为False表示记录进程的最大常驻内存
+        '''
+        self.path = path
+        self.run_start = time.time()
+        if run_id is None:
+            run_id = '{time:%Y%m%d-%H%M%S}-{pid}'.format(time=dt.datetime.now(), pid=getpid())
+        self.run_id = run_id
+        self.trace_memory = trace_memory
+
+    def start(self, factor_name, ready_time=None):
+        '''
+        开始记录某个因子的更新
+
+        Parameter
+        ---------
+        factor_name: str
+            因子名称
+        ready_time: float, default None
+            因子依赖项全部更新完成的时间戳（time.time()），默认为None表示当前时间
+
+        Return
+        ------
+        out: dict
+            因子的记录数据，需要传入finish完成记录
+        '''
+        now = time.time()
+        if ready_time is None:
+            ready_time = now
+        record = {'run_id': self.run_id, 'factor': factor_name,
+                  'start': dt.datetime.now().isoformat(sep=' ', timespec='seconds'),
+                  'wait_time': max(ready_time - self.run_start, 0.),
+                  'queue_time': max(now - ready_time, 0.),
+                  '_start': now, '_fetch': dict(fdgetter.FETCH_STATS), '_trace': False}
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            record['_trace'] = True
+        return record
+
+    def finish(self, record, status, **kwargs):
+        '''
+        完成因子的记录，并写入记录文件
+
+        Parameter
+        ---------
+        record: dict
+            start返回的记录数据
+        status: str
+            更新结果
+        kwargs: dict
+            其他需要记录的数据
+        '''
+        fetch_start = record.pop('_fetch')
+        record['wall_time'] = time.time() - record.pop('_start')
+        record['status'] = status
+        for key in ('queries', 'rows', 'time'):
+            record['sql_' + key] = fdgetter.FETCH_STATS[key] - fetch_start[key]
+        if record.pop('_trace'):
+            record['peak_memory'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        else:
+            record['peak_memory'] = _get_max_rss()
+        record.update(kwargs)
+        self.write(record)
+
+    def write(self, record):
+        '''
+        将记录追加写入到记录文件中
+        '''
+        line = json.dumps(record, ensure_ascii=False, sort_keys=True)
+        with FileLock(self.path + '.lock', exclusive=True):
+            with open(self.path, 'a', encoding='utf8') as f:
+                f.write(line + '\n')
+
+# --------------------------------------------------------------------------------------------------
+# 函数
+
+
+def _get_max_rss():
+    '''
+    获取当前进程的最大常驻内存（字节），无法获取时返回None
+    '''
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != 'darwin':    # Linux下的单位为KB，macOS下为字节
+        max_rss *= 1024
+    return max_rss
+
+
+def load_profile(path=UPDATE_PROFILE_FILE_PATH):
+    '''
+    读取所有的更新记录
+
+    Parameter
+    ---------
+    path: str, default UPDATE_PROFILE_FILE_PATH
+        记录文件的路径
+
+    Return
+    ------
+    out: pd.DataFrame
+        每行为一条记录，列为记录的各项数据
+    '''
+    with open(path, encoding='utf8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return pd.DataFrame(records)
+
+
+def profile_report(path=UPDATE_PROFILE_FILE_PATH, n_runs=5, sort_by='wall_time'):
+    '''
+    生成更新性能报告，按照最近一次更新中各因子的开销排序，并展示最近几次更新的耗时变化
+
+    Parameter
+    ---------
+    path: str, default UPDATE_PROFILE_FILE_PATH
+        记录文件的路径
+    n_runs: int, default 5
+        展示耗时变化的更新次数
+    sort_by: str, default 'wall_time'
+        排序使用的数据列，例如wall_time、peak_memory、sql_time、wait_time等
+
+    Return
+    ------
+    out: pd.DataFrame
+        index为最近一次更新的因子名称，按照sort_by降序排列；列包含最近一次更新的各项数据，
+        wall_time_change（最近一次耗时相对于之前各次耗时中位数的变化比例），以及最近n_runs次
+        更新的耗时（列名为对应的run_id，按照时间升序排列）
+    '''
+    data = load_profile(path)
+    run_order = data.groupby('run_id').start.min().sort_values().index
+    runs = list(run_order[-n_runs:])
+    data = data.loc[data.run_id.isin(runs)].drop_duplicates(['run_id', 'factor'], keep='last')
+    trend = data.pivot(index='factor', columns='run_id', values='wall_time').reindex(columns=runs)
+    latest = data.loc[data.run_id == runs[-1]].set_index('factor').drop('run_id', axis=1)
+    latest['wall_time_change'] = latest.wall_time / trend.iloc[:, :-1].median(axis=1) - 1
+    out = latest.join(trend, how='left')
+    return out.sort_values(sort_by, ascending=False)
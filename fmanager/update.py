@@ -12,24 +12,48 @@ __version__ = 1.0.0
 修改日期：2017-07-19
 修改内容：
     初始化，添加基本功能
+
+修改日期：2026-10-17
+修改内容：
+    1. 添加recalculate_factors，重新计算并覆盖给定因子（及依赖于这些因子的因子）在某一时间区间的数据
+    2. 添加update_all_factors_parallel，按照依赖关系在进程池中并行更新因子
+    3. 更新因子前按照因子的回溯期（Factor.lookback）预先读取依赖因子的数据（仅限声明了回溯期的因子）
+    4. 更新过程中使用UpdateProfiler记录每个因子的耗时、内存峰值、SQL获取行数、写入行数和等待时间
+    5. recalculate_factors按照依赖顺序将重新计算的结束时间往后推各因子的回溯期，覆盖滚动窗口受影响的数据
+    6. 一批更新或者重新计算结束后清除日行情数据的缓存（并行更新时每个任务结束后清除）
+    7. 所有因子隐式依赖于LIST_STATUS（drop_delist_data使用LIST_STATUS剔除退市股票的数据），
+       LIST_STATUS更新完成后才更新其他因子；进程池的工作进程启动时重新建立数据源的连接并设置日志
 '''
 __version__ = '1.0.0'
 
 from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from fmanager.const import UNIVERSE_FILE_PATH, START_TIME, FACTOR_FILE_PATH
 from fmanager import database
-from fmanager.factors.deptree import dependency_order
+from fmanager.factors.deptree import dependency_order, build_dependency_tree, has_dependency_on
 import datatoolkits
 import dateshandle
 import datetime as dt
 from fmanager.factors.dictionary import get_factor_dict, update_factordict
+from fmanager.factors.utils import clear_pickle_cache, get_universe, get_lookback_start
+from fmanager.factors.query import prefetch, clear_prefetch
+from fmanager.factors.basicfactors.quote import clear_quote_cache
+from fmanager.profiling import UpdateProfiler
 import fdgetter
 import logging
+import pandas as pd
+from os import cpu_count
 from os.path import exists
 from os import makedirs, system
 import pdb
 import time
 
+# 进程池中的工作进程使用的因子字典，每个进程只构建一次
+_WORKER_FACTOR_DICT = None
+# 所有因子隐式依赖的因子，大部分因子的计算函数使用drop_delist_data通过LIST_STATUS剔除退市股票的数据，
+# 但是没有在dependency中声明
+IMPLICIT_DEPENDENCY = 'LIST_STATUS'
+
 # 日志设置
 
 
@@ -88,6 +112,7 @@ def update_universe(path=UNIVERSE_FILE_PATH):
         pass
     data = (new_universe, dt.datetime.now())
     datatoolkits.dump_pickle(data, path)
+    clear_pickle_cache(path)
     return new_universe
 
 
@@ -160,10 +185,15 @@ def check_dependency(factor_name, factor_dict):
     ------
     out: boolean
         若因子的依赖因子全部都更新好，则返回True，反之返回False
+
+    Notes
+    -----
+    除了因子声明的依赖项外，还会检查隐式依赖的因子（IMPLICIT_DEPENDENCY）
     '''
-    dependency = factor_dict[factor_name]['factor'].dependency
-    if dependency is None:
-        return True
+    dependency = list(factor_dict[factor_name]['factor'].dependency or [])
+    if factor_name != IMPLICIT_DEPENDENCY and IMPLICIT_DEPENDENCY in factor_dict and \
+            IMPLICIT_DEPENDENCY not in dependency:
+        dependency.append(IMPLICIT_DEPENDENCY)
     res = list()
     for factor in dependency:
         path = factor_dict[factor]['abs_path']
@@ -171,7 +201,7 @@ def check_dependency(factor_name, factor_dict):
     return all(res)
 
 
-def update_factor(factor_name, factor_dict, universe):
+def update_factor(factor_name, factor_dict, universe, profiler=None, ready_time=None):
     '''
     更新数据，如果数据文件不存在，则创建一个数据文件，并写入数据，数据的时间从START_TIME开始，到当前
     时间为止
@@ -183,6 +213,10 @@ def update_factor(factor_name, factor_dict, universe):
         因子字典
     universe: list
         股票universe
+    profiler: UpdateProfiler, default None
+        性能记录对象，默认为None表示不记录；只有实际计算了数据的更新才会被记录
+    ready_time: float, default None
+        因子依赖项全部更新完成的时间戳，用于计算等待时间，默认为None表示当前时间
     Return
     ------
     out: boolean
@@ -213,18 +247,42 @@ def update_factor(factor_name, factor_dict, universe):
             start_time = connector.data_time
         else:
             start_time = START_TIME
-    factor_func = factor_msg['factor'].calc_method
+    factor = factor_msg['factor']
+    factor_func = factor.calc_method
+    record = None if profiler is None else profiler.start(factor_name, ready_time)
     try:
-        factor_data = factor_func(universe, start_time, end_time)
-    except AssertionError as e:  # 如果出现意外的错误，将该错误写入到日志中，并返回True，进行下一个更新
-        logger.exception(e)
-        return True
-    # pdb.set_trace()
-    connector.insert_df(factor_data, data_dtype=factor_msg['factor'].data_type)
+        prefetch_start = time.time()
+        # 预先读取回溯期内的依赖数据，计算过程中的查询直接从内存获取；没有声明回溯期的因子可能自行扩展了
+        # 查询区间，预先读取的数据无法命中，因此不预先读取
+        if factor.dependency is not None and factor.lookback > 0:
+            prefetch(factor.dependency, (get_lookback_start(start_time, factor.lookback), end_time))
+        prefetch_time = time.time() - prefetch_start
+        try:
+            factor_data = factor_func(universe, start_time, end_time)
+        except AssertionError as e:  # 如果出现意外的错误，将该错误写入到日志中，并返回True，进行下一个更新
+            logger.exception(e)
+            if record is not None:
+                profiler.finish(record, 'error', prefetch_time=prefetch_time)
+            return True
+        finally:
+            clear_prefetch()
+        # pdb.set_trace()
+        insert_start = time.time()
+        connector.insert_df(factor_data, data_dtype=factor_msg['factor'].data_type)
+        if exists(connector.mmap_path):     # 已经生成了内存映射文件的因子，同步更新映射文件
+            connector.dump_mmap()
+    except Exception:
+        if record is not None:
+            profiler.finish(record, 'fail')
+        raise
+    if record is not None:
+        profiler.finish(record, 'success', prefetch_time=prefetch_time,
+                        insert_time=time.time() - insert_start, rows_written=len(factor_data))
     return True
 
 
-def update_all_factors(factor_dict, max_iter=300, order=None, show_progress=False):
+def update_all_factors(factor_dict, max_iter=300, order=None, show_progress=False,
+                       profiler=None):
     '''
     更新所有因子的数据
 
@@ -238,6 +296,8 @@ def update_all_factors(factor_dict, max_iter=300, order=None, show_progress=Fals
         因子更新顺序，目前不实现对应功能，供未来扩展用（未来需要根据因子的依赖关系，解析更新顺序）
     show_progress: boolean, default False
         显示进度，默认不显示
+    profiler: UpdateProfiler, default None
+        性能记录对象，默认为None表示不记录
 
     Return
     ------
@@ -250,51 +310,198 @@ def update_all_factors(factor_dict, max_iter=300, order=None, show_progress=Fals
     iter_num = 0
     factor_queue = deque(order[::-1], maxlen=len(factor_dict))
     universe = update_universe()
-    while len(factor_queue):
-        if iter_num > max_iter:
-            break
-        iter_num += 1   # 更新循环次数
-        factor_name = factor_queue.pop()
-        msg = 'Iter Num: {iter_num}, Factor Name: {name},'.format(iter_num=iter_num,
-                                                                  name=factor_name)
+    try:
+        while len(factor_queue):
+            if iter_num > max_iter:
+                break
+            iter_num += 1   # 更新循环次数
+            factor_name = factor_queue.pop()
+            msg = 'Iter Num: {iter_num}, Factor Name: {name},'.format(iter_num=iter_num,
+                                                                      name=factor_name)
+            logger.info(msg)
+            if show_progress:
+                print(msg)
+            update_res = update_factor(factor_name, factor_dict, universe, profiler=profiler)
+            if not update_res:  # 未成功更新
+                factor_queue.appendleft(factor_name)
+                # 日志中添加添加队列的操作提示
+                queue_msg = "Append \"{fct}\" to the left of the queue".format(fct=factor_name)
+                logger.info(queue_msg)
+            update_res_str = 'success' if update_res else 'fail'
+            res_msg = 'Result: {res}'.format(res=update_res_str)
+            logger.info(res_msg)
+            if show_progress:
+                print(res_msg)
+        else:
+            return True
+        return False
+    finally:
+        clear_quote_cache()     # 行情缓存只在同一批更新中共用
+
+
+def _init_worker():
+    '''
+    进程池中工作进程的初始化函数，重新建立数据源的连接（以fork方式启动的进程会继承父进程中已经建立的
+    连接，多个进程不能共用同一个连接），并设置日志
+    '''
+    fdgetter.reconnect_data_sources()
+    set_logger()
+
+
+def _update_worker(factor_name, universe, profiler=None, ready_time=None):
+    '''
+    进程池中执行的因子更新任务，因子字典中包含无法序列化的计算函数，因此在工作进程中重新构建；
+    任务结束后清除日行情数据的缓存，避免每个工作进程都保留一份行情数据
+
+    Parameter
+    ---------
+    factor_name: str
+        需要更新的因子名称
+    universe: list
+        股票universe
+    profiler: UpdateProfiler, default None
+        性能记录对象
+    ready_time: float, default None
+        因子依赖项全部更新完成的时间戳
+
+    Return
+    ------
+    out: boolean
+        update_factor的结果
+    '''
+    global _WORKER_FACTOR_DICT
+    if _WORKER_FACTOR_DICT is None:
+        _WORKER_FACTOR_DICT = get_factor_dict()
+    try:
+        return update_factor(factor_name, _WORKER_FACTOR_DICT, universe, profiler=profiler,
+                             ready_time=ready_time)
+    finally:
+        clear_quote_cache()
+
+
+def update_all_factors_parallel(factor_dict, workers=None, show_progress=False, profiler=None):
+    '''
+    按照因子之间的依赖关系，在进程池中并行更新所有因子的数据，依赖项全部更新成功的因子即可开始更新
+
+    Parameter
+    ---------
+    factor_dict: dict
+        因子字典
+    workers: int, default None
+        进程池中的进程数量，默认为None表示使用CPU的数量
+    show_progress: boolean, default False
+        显示进度，默认不显示
+    profiler: UpdateProfiler, default None
+        性能记录对象，默认为None表示不记录
+
+    Return
+    ------
+    out: boolean
+        如果成功更新所有因子，返回True，反之返回False
+
+    Notes
+    -----
+    某个因子更新失败（抛出异常或者update_factor返回False）时，所有直接或者间接依赖于该因子的因子
+    都不会被更新；每个因子对应一个数据文件，且同一时间只有一个任务更新同一个因子，写入过程由
+    数据文件的排他锁保护；除了声明的依赖项外，所有因子都在隐式依赖的因子（IMPLICIT_DEPENDENCY）
+    更新完成后才开始更新
+    '''
+    logger = logging.getLogger(__name__.split()[0])
+    if workers is None:
+        workers = cpu_count()
+    tree = build_dependency_tree(factor_dict)
+    waiting = {node.name: set(dep.name for dep in node.descendants) for node in tree}
+    if IMPLICIT_DEPENDENCY in waiting:
+        for name, deps in waiting.items():
+            if name != IMPLICIT_DEPENDENCY:
+                deps.add(IMPLICIT_DEPENDENCY)
+    dependents = {name: [] for name in waiting}
+    for name, deps in waiting.items():
+        for dep in deps:
+            dependents[dep].append(name)
+    failed = set()
+
+    def _mark_failed(name):
+        '''
+        将因子及所有依赖于该因子的因子标记为失败
+        '''
+        if name in failed:
+            return
+        failed.add(name)
+        waiting.pop(name, None)
+        for parent in dependents[name]:
+            _mark_failed(parent)
+
+    universe = update_universe()
+    running = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        while waiting or running:
+            ready = sorted(name for name, deps in waiting.items() if not deps)
+            for name in ready:
+                del waiting[name]
+                future = executor.submit(_update_worker, name, universe, profiler, time.time())
+                running[future] = name
+            if not running:     # 剩余的因子存在循环依赖
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    update_res = future.result()
+                except Exception as e:
+                    logger.exception(e)
+                    update_res = False
+                msg = 'Factor Name: {name}, Result: {res}'.\
+                    format(name=name, res='success' if update_res else 'fail')
+                logger.info(msg)
+                if show_progress:
+                    print(msg)
+                if not update_res:
+                    _mark_failed(name)
+                    continue
+                for parent in dependents[name]:
+                    if parent in waiting:
+                        waiting[parent].discard(name)
+    if failed or waiting:
+        msg = 'Factors not updated: {fcts}'.format(fcts=sorted(failed.union(waiting)))
         logger.info(msg)
         if show_progress:
             print(msg)
-        update_res = update_factor(factor_name, factor_dict, universe)
-        if not update_res:  # 未成功更新
-            factor_queue.appendleft(factor_name)
-            # 日志中添加添加队列的操作提示
-            queue_msg = "Append \"{fct}\" to the left of the queue".format(fct=factor_name)
-            logger.info(queue_msg)
-        update_res_str = 'success' if update_res else 'fail'
-        res_msg = 'Result: {res}'.format(res=update_res_str)
-        logger.info(res_msg)
-        if show_progress:
-            print(res_msg)
-    else:
-        return True
-    return False
+        return False
+    return True
 
 
-def auto_update_all(max_iter=200, show_progress=False):
+def auto_update_all(max_iter=200, show_progress=False, workers=1, profile=True):
     '''
     自动化更新所有因子，并更新因子字典
 
     Parameter
     ---------
     max_iter: int, default 200
-        最大循环次数，超过这个次数更新过程被强制中断
+        最大循环次数，超过这个次数更新过程被强制中断（仅对串行更新有效）
     show_progress: boolean, default False
         显示更新进度，默认为不显示
+    workers: int, default 1
+        更新使用的进程数量，默认为1表示串行更新，大于1时使用update_all_factors_parallel并行更新，
+        None表示使用CPU的数量
+    profile: boolean, default True
+        是否记录每个因子的更新性能数据（写入UPDATE_PROFILE_FILE_PATH，使用profiling.profile_report
+        查看报告）
     '''
     set_logger()
     logger = logging.getLogger(__name__.split()[0])
     all_factors = get_factor_dict()
     gen_folders(all_factors)
     update_factordict()  # 每次更新前先更新因子字典
-    order = [node.name for node in dependency_order()]
-    success = update_all_factors(all_factors, max_iter=max_iter, show_progress=show_progress,
-                                 order=order)
+    profiler = UpdateProfiler() if profile else None
+    if workers == 1:
+        order = [node.name for node in dependency_order()]
+        order.sort(key=lambda name: name != IMPLICIT_DEPENDENCY)     # 隐式依赖的因子最先更新
+        success = update_all_factors(all_factors, max_iter=max_iter, show_progress=show_progress,
+                                     order=order, profiler=profiler)
+    else:
+        success = update_all_factors_parallel(all_factors, workers=workers,
+                                              show_progress=show_progress, profiler=profiler)
     if not success:
         print('Updating process FAILED')
         logger.info('Updating process FAILED')
@@ -318,6 +525,144 @@ def gen_folders(fd):
         makedirs(folder)
 
 
+def recalculate_factors(factor_names, start_time, end_time, factor_dict=None,
+                        show_progress=False):
+    '''
+    重新计算给定因子在给定时间区间内的数据，并覆盖数据文件中原有的数据，依赖于这些因子的其他因子
+    也会按照依赖顺序重新计算，用于数据源修正历史数据后的局部修复
+
+    Parameter
+    ---------
+    factor_names: list
+        需要重新计算的因子名称
+    start_time: type that can be converted by pd.to_datetime
+        重新计算的开始时间
+    end_time: type that can be converted by pd.to_datetime
+        重新计算的结束时间，超过数据文件最新时间的部分会被忽略（由日常更新负责添加）
+    factor_dict: dict, default None
+        因子字典，默认为None表示从模块中自动获取因子字典
+    show_progress: boolean, default False
+        显示进度，默认不显示
+
+    Return
+    ------
+    out: list
+        实际被覆盖数据的因子名称，按照计算顺序排列
+
+    Notes
+    -----
+    计算使用当前存储的universe（fmanager.factors.utils.get_universe），数据文件不存在或者没有数据的
+    因子会被跳过；滚动窗口类的因子在end_time之后的回溯期（Factor.lookback）内的数据也会受到依赖因子
+    修正的影响，因此每个依赖因子的重新计算结束时间为其被重新计算的依赖因子中最晚的结束时间往后推
+    lookback个交易日（不超过该因子数据文件的最新时间）
+    '''
+    logger = logging.getLogger(__name__.split()[0])
+    if factor_dict is None:
+        factor_dict = get_factor_dict()
+    affected = set(factor_names)
+    for factor_name in factor_names:
+        assert factor_name in factor_dict, \
+            'Error, invalid factor name({name})!'.format(name=factor_name)
+        affected.update(has_dependency_on(factor_name, factor_dict))
+    order = [node.name for node in dependency_order(build_dependency_tree(factor_dict))
+             if node.name in affected]
+    universe = get_universe()
+    start_time = pd.to_datetime(start_time)
+    end_time = pd.to_datetime(end_time)
+    clear_quote_cache()     # 数据源修正后，之前缓存的行情数据已经失效
+    try:
+        return _recalculate_in_order(order, factor_names, factor_dict, universe, start_time,
+                                     end_time, show_progress)
+    finally:
+        clear_quote_cache()
+
+
+def _recalculate_in_order(order, factor_names, factor_dict, universe, start_time, end_time,
+                          show_progress):
+    '''
+    按照order依次重新计算因子，参数含义见recalculate_factors
+    '''
+    logger = logging.getLogger(__name__.split()[0])
+    out = []
+    recalc_end = {}     # 每个因子实际重新计算的结束时间
+    for factor_name in order:
+        factor_msg = factor_dict[factor_name]
+        abs_path = factor_msg['abs_path']
+        if not exists(abs_path):
+            continue
+        connector = database.DBConnector(abs_path)
+        if connector.data_time is None:
+            continue
+        factor = factor_msg['factor']
+        factor_end = end_time if factor_name in factor_names else None
+        dep_ends = [recalc_end[dep] for dep in (factor.dependency or []) if dep in recalc_end]
+        if dep_ends:
+            # 依赖因子的修正会影响之后lookback个交易日内的数据
+            dep_end = max(dep_ends)
+            if factor.lookback > 0 and dep_end < connector.data_time:
+                tds = [t for t in dateshandle.get_tds(dep_end, connector.data_time) if t > dep_end]
+                dep_end = tds[factor.lookback - 1] if len(tds) >= factor.lookback \
+                    else connector.data_time
+            factor_end = dep_end if factor_end is None else max(factor_end, dep_end)
+        if factor_end is None:
+            continue
+        factor_end = min(pd.to_datetime(factor_end), connector.data_time)
+        if factor_end < start_time:
+            continue
+        if factor.dependency is not None and factor.lookback > 0:
+            prefetch(factor.dependency,
+                     (get_lookback_start(start_time, factor.lookback), factor_end))
+        try:
+            factor_data = factor.calc_method(universe, start_time, factor_end)
+        finally:
+            clear_prefetch()
+        factor_data = factor_data.loc[(factor_data.index >= start_time) &
+                                      (factor_data.index <= factor_end)]
+        if not len(factor_data):
+            continue
+        recalc_end[factor_name] = factor_end
+        connector.overwrite_df(factor_data, data_dtype=factor.data_type)
+        if exists(connector.mmap_path):
+            connector.dump_mmap()
+        out.append(factor_name)
+        msg = 'Recalculate "{name}" from {st:%Y-%m-%d} to {et:%Y-%m-%d}'.\
+            format(name=factor_name, st=factor_data.index[0], et=factor_data.index[-1])
+        logger.info(msg)
+        if show_progress:
+            print(msg)
+    return out
+
+
+def migrate_all_factors(factor_dict=None, show_progress=False, **kwargs):
+    '''
+    将所有旧格式的因子数据文件迁移到当前的文件格式（database.FORMAT_VERSION）
+
+    Parameter
+    ---------
+    factor_dict: dict, default None
+        因子字典，默认为None表示从模块中自动获取因子字典
+    show_progress: boolean, default False
+        显示进度，默认不显示
+    kwargs: dict
+        其他传入database.migrate_dbfile的参数，例如chunks、compression等
+    '''
+    logger = logging.getLogger(__name__.split()[0])
+    if factor_dict is None:
+        factor_dict = get_factor_dict()
+    for factor_name in sorted(factor_dict):
+        abs_path = factor_dict[factor_name]['abs_path']
+        if not exists(abs_path):
+            continue
+        if database.DBConnector(abs_path).format_version >= database.FORMAT_VERSION:
+            continue
+        database.migrate_dbfile(abs_path, **kwargs)
+        msg = 'Migrate "{name}" to format version {ver}'.format(name=factor_name,
+                                                               ver=database.FORMAT_VERSION)
+        logger.info(msg)
+        if show_progress:
+            print(msg)
+
+
 if __name__ == '__main__':
     set_logger()
     logger = logging.getLogger(__name__.split()[0])
@@ -17,7 +17,7 @@ from factortest.grouptest.utils import MkvWeightCalc, EqlWeightCalc
 from factortest.utils import MonRebCalcu, WeekRebCalcu
 from factortest.const import TOTALMKV_WEIGHTED, MONTHLY
 from portmonitor.const import LONG, PORT_DATA_PATH
-from fmanager import query
+from fmanager import query_many
 from fmanager.database.const import NaS
 
 # --------------------------------------------------------------------------------------------------
@@ -104,17 +104,17 @@ def factor_stockfilter_template(factor_name, group_id, group_num=5, stock_pool=N
     行业中性化的方法是在每个行业分组内部将股票按照因子值排序分为几组，然后将不同行业中的各个组分别集
     合在一起
     '''
+    data_msg = {'ST_TAG': 'st_data', 'TRADEABLE': 'trade_data', factor_name: 'factor'}
+    if stock_pool is not None:
+        data_msg[stock_pool] = 'stock_pool'
+    if industry_cls is not None:
+        data_msg[industry_cls] = 'industry'
+
     def stock_filter(date):
-        st_data = query('ST_TAG', date).iloc[0]
-        trade_data = query('TRADEABLE', date).iloc[0]
-        factor_data = query(factor_name, date).iloc[0]
-        data = pd.DataFrame({'st_data': st_data, 'trade_data': trade_data, 'factor': factor_data})
-        if stock_pool is not None:
-            data = data.assign(stock_pool=query(stock_pool, date).iloc[0])
-        else:
+        data = query_data_bydate(date, data_msg)
+        if stock_pool is None:
             data = data.assign(stock_pool=[1] * len(data))
         if industry_cls is not None:
-            data = data.assign(industry=query(industry_cls, date).iloc[0])
             data = data.loc[data.industry != NaS]
         else:
             data = data.assign(industry=[NaS] * len(data))
@@ -147,9 +147,7 @@ def query_data_bydate(date, data_msg):
     out: pd.DataFrame
         查询的数据
     '''
-    datas = {}
-    for factor in data_msg:
-        factor_data = query(factor, date).iloc[0]
-        datas[data_msg[factor]] = factor_data
+    factor_datas = query_many(list(data_msg.keys()), date)
+    datas = {data_msg[factor]: factor_datas[factor].iloc[0] for factor in data_msg}
     out = pd.DataFrame(datas)
     return out
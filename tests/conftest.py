@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date    : 2026-10-17 10:12:45
+# @Author  : Li Hao (howardlee_h@outlook.com)
+# @Link    : https://github.com/SAmmer0
+# @Version : $Id$
+'''
+测试的公共设置
+
+更新因子数据的测试在子进程中运行（update_runner.py），子进程的数据源为SQLite.build_synthetic_db生成的
+本地数据库，因子数据存储在临时目录中：子进程使用临时目录中生成的sysconfiglee模块，该模块只替换因子数据
+目录，其他配置仍从原有的sysconfiglee中获取
+'''
+import importlib.util
+import os
+from os.path import abspath, dirname, join
+import pickle
+import subprocess
+import sys
+
+import pytest
+
+ROOT = dirname(dirname(abspath(__file__)))
+UPDATE_RUNNER = join(dirname(abspath(__file__)), 'update_runner.py')
+SYNTHETIC_START = '2007-01-01'  # 与fmanager.const.START_TIME相同
+SYNTHETIC_END = '2009-06-30'
+# build_synthetic_db中每17只股票有1只在期间退市，退市后的增量更新区间中没有该股票的数据，原有的因子
+# 计算代码在pandas>=1.0下使用.loc选取没有数据的股票代码会报错，因此模拟数据库中不包含退市股票
+SYNTHETIC_STOCK_NUM = 16
+
+SYSCONFIG_TEMPLATE = '''
+import importlib.util
+
+_spec = importlib.util.spec_from_file_location('_sysconfiglee', {origin!r})
+_module = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_module)
+
+
+def get_config(name):
+    if name == 'factor_file_path':
+        return {factor_path!r}
+    return _module.get_config(name)
+
+
+def get_database(name):
+    return None     # 数据源使用环境变量FDGETTER_LOCAL_DB指定的本地数据库
+'''
+
+
+@pytest.fixture(scope='session')
+def synthetic_db(tmp_path_factory):
+    '''
+    覆盖SYNTHETIC_START至SYNTHETIC_END的模拟数据库，交易日与dateshandle的交易日历相同
+    '''
+    dateshandle = pytest.importorskip('dateshandle')
+    from SQLite import build_synthetic_db
+    path = str(tmp_path_factory.mktemp('db') / 'synthetic.db')
+    build_synthetic_db(path, stock_num=SYNTHETIC_STOCK_NUM, start_time=SYNTHETIC_START,
+                       end_time=SYNTHETIC_END, tds=dateshandle.get_tds(SYNTHETIC_START,
+                                                                      SYNTHETIC_END))
+    return path
+
+
+@pytest.fixture
+def update_factors(tmp_path, synthetic_db):
+    '''
+    返回在子进程中更新因子的函数update(name, end_time, workers=1)，同一个name使用同一个因子数据目录，
+    因此可以在之前更新的基础上继续更新；返回值的格式见update_runner.py
+    '''
+    spec = importlib.util.find_spec('sysconfiglee')
+    if spec is None:
+        pytest.skip('sysconfiglee is not available')
+
+    def update(name, end_time, workers=1):
+        base = tmp_path / name
+        factor_path = base / 'factors'
+        if not base.exists():
+            factor_path.mkdir(parents=True)
+            with open(str(base / 'sysconfiglee.py'), 'w') as f:
+                f.write(SYSCONFIG_TEMPLATE.format(origin=spec.origin,
+                                                  factor_path=str(factor_path)))
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join([str(base), ROOT] +
+                                            [p for p in [env.get('PYTHONPATH')] if p])
+        env['FDGETTER_LOCAL_DB'] = synthetic_db
+        output = str(base / 'result.pickle')
+        subprocess.run([sys.executable, UPDATE_RUNNER, str(end_time), str(workers), output],
+                       cwd=ROOT, env=env, check=True)
+        with open(output, 'rb') as f:
+            return pickle.load(f)
+    return update
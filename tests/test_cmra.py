@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date    : 2026-10-17 15:05:21
+# @Author  : Li Hao (howardlee_h@outlook.com)
+# @Link    : https://github.com/SAmmer0
+# @Version : $Id$
+'''
+CMRA因子向量化计算（derivativefactors.calc_cmra）的测试
+'''
+import numpy as np
+import pandas as pd
+import pytest
+
+derivativefactors = pytest.importorskip('fmanager.factors.derivativefactors')
+
+
+def calc_cmra_rolling(quote_data, monthly_td=21, month_cnt=12):
+    '''
+    calc_cmra的参考实现（逐个股票滚动计算）
+    '''
+    ret_data = quote_data.pct_change(monthly_td, fill_method=None)
+    idx_slice = slice(-1, -month_cnt * monthly_td, -monthly_td)
+
+    def single_period_cmra(ts):
+        valid_data = ts[idx_slice]
+        cum_ret = np.cumprod(1 + valid_data) - 1
+        return np.log(1 + np.max(cum_ret)) - np.log(1 + np.min(cum_ret))
+    return ret_data.apply(lambda df: df.rolling(monthly_td * month_cnt,
+                                                min_periods=monthly_td * month_cnt).
+                          apply(single_period_cmra))
+
+
+@pytest.mark.parametrize('length', [250, 252, 273, 274, 700])
+def test_calc_cmra_matches_rolling(length):
+    # 数据中包含上市较晚、停牌、中途缺失和退市的股票
+    rs = np.random.RandomState(0)
+    tds = pd.date_range('2014-01-01', periods=700, freq='B')
+    quote = pd.DataFrame(np.exp(np.cumsum(rs.normal(0, 0.02, (700, 30)), axis=0)) * 10,
+                         index=tds)
+    quote.iloc[:150, 1] = np.nan
+    quote.iloc[300:340, 2] = np.nan
+    quote.iloc[400:500, 3] = quote.iloc[399, 3]
+    quote.iloc[450:, 4] = np.nan
+    expected = calc_cmra_rolling(quote.iloc[:length])
+    result = derivativefactors.calc_cmra(quote.iloc[:length])
+    assert (expected.isnull() == result.isnull()).all().all()
+    assert np.allclose(expected, result, atol=1e-12, equal_nan=True)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date    : 2026-10-17 16:12:37
+# @Author  : Li Hao (howardlee_h@outlook.com)
+# @Link    : https://github.com/SAmmer0
+# @Version : $Id$
+'''
+数据文件（fmanager.database.database）的测试
+'''
+import os
+from os.path import exists
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import ROOT
+
+database = pytest.importorskip('fmanager.database.database')
+dateshandle = pytest.importorskip('dateshandle')
+
+# 在子进程中向数据文件追加数据，开始写入前创建ready文件
+APPEND_SCRIPT = '''
+import sys
+import pandas as pd
+from fmanager.database.database import DBConnector
+
+path, data_path, ready_path = sys.argv[1:]
+data = pd.read_pickle(data_path)
+open(ready_path, 'w').close()
+DBConnector(path).insert_df(data)
+'''
+
+
+def make_data(start_time, end_time, codes):
+    tds = pd.DatetimeIndex(dateshandle.get_tds(start_time, end_time))
+    return pd.DataFrame(np.arange(len(tds) * len(codes), dtype=np.float64).reshape(len(tds), -1),
+                        index=tds, columns=codes)
+
+
+def test_migrate_dbfile_blocks_writers(tmp_path, monkeypatch):
+    # 迁移过程中其他进程追加的数据不能丢失
+    path = str(tmp_path / 'data.h5')
+    codes = ['000001.SZ', '000002.SZ', '600000.SH']
+    old_data = make_data('2009-01-01', '2009-06-30', codes)
+    new_data = make_data('2009-07-01', '2009-07-31', codes)
+    db = database.DBConnector(path)
+    db.init_dbfile('f8')
+    db.insert_df(old_data)
+    data_path = str(tmp_path / 'new_data.pickle')
+    ready_path = str(tmp_path / 'ready')
+    new_data.to_pickle(data_path)
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([ROOT] + [p for p in [env.get('PYTHONPATH')] if p])
+    writers = []
+    insert_data = database.DBConnector.insert_data
+
+    def insert_and_append(self, code, date, data):
+        # 复制第一批数据时启动追加数据的进程，等待该进程开始写入
+        if not writers:
+            writers.append(subprocess.Popen([sys.executable, '-c', APPEND_SCRIPT, path,
+                                             data_path, ready_path], cwd=ROOT, env=env))
+            while not exists(ready_path):
+                assert writers[0].poll() is None, 'Error, writer exits unexpectedly!'
+                time.sleep(0.05)
+            time.sleep(1)
+        return insert_data(self, code, date, data)
+
+    monkeypatch.setattr(database.DBConnector, 'insert_data', insert_and_append)
+    database.migrate_dbfile(path, batch_size=10)
+    assert writers[0].wait(timeout=600) == 0
+    result = database.DBConnector(path).query(('2009-01-01', '2009-07-31'))
+    pd.testing.assert_frame_equal(result, pd.concat([old_data, new_data]), check_names=False,
+                                  check_freq=False)
+    assert not exists(path + '.migrating')
+    assert not exists(path + '.migrating' + database.LOCK_SUFFIX)
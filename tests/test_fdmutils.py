@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date    : 2026-10-17 15:40:08
+# @Author  : Li Hao (howardlee_h@outlook.com)
+# @Link    : https://github.com/SAmmer0
+# @Version : $Id$
+'''
+fdmutils.cal_pit_panel的测试
+'''
+import numpy as np
+import pandas as pd
+import pytest
+
+fdmutils = pytest.importorskip('fdmutils')
+
+CODE = '000001.SZ'
+DAYS = pd.bdate_range('2008-08-01', '2009-06-30')
+
+
+def make_data(rows):
+    '''
+    rows的格式为[(更新时间, 报告期, 数据), ...]，按照更新时间升序排列
+    '''
+    data = pd.DataFrame([(CODE, ) + row for row in rows],
+                        columns=['code', 'update_time', 'rpt_date', 'data'])
+    data['update_time'] = pd.to_datetime(data.update_time)
+    data['rpt_date'] = pd.to_datetime(data.rpt_date)
+    return data
+
+
+def observe(data, method, n):
+    '''
+    返回每次更新后的下一个交易日观测到的数据
+    '''
+    res = fdmutils.cal_pit_panel(data, DAYS, method, n)[CODE]
+    return [res[res.index > t].iloc[0] for t in data.update_time]
+
+
+@pytest.mark.parametrize('method, n, expected', [
+    ('ttm', 2, [np.nan, 3., 5., 7., 9.]),
+    ('season', 1, [1., 2., 3., 4., 4.]),
+    ('season', 2, [np.nan, 1., 2., 3., 5.]),
+    ('year', 1, [np.nan, np.nan, 3., 3., 5.]),
+])
+def test_cal_pit_panel_restated_report(method, n, expected):
+    # 2008年年报在2009年一季报之后更正，最新报告期仍然为2009年一季度，2008年年报使用更正后的数据
+    data = make_data([('2008-08-11', '2008-06-30', 1.),
+                      ('2008-10-10', '2008-09-30', 2.),
+                      ('2009-03-10', '2008-12-31', 3.),
+                      ('2009-04-10', '2009-03-31', 4.),
+                      ('2009-05-11', '2008-12-31', 5.)])
+    np.testing.assert_array_equal(observe(data, method, n), expected)
+
+
+@pytest.mark.parametrize('method, n, expected', [
+    ('ttm', 2, [np.nan, 3., np.nan, 9.]),
+    ('season', 1, [1., 2., 4., 4.]),
+    ('season', 2, [np.nan, 1., np.nan, 5.]),
+])
+def test_cal_pit_panel_late_report(method, n, expected):
+    # 2008年年报在2009年一季报之后才首次发布，以可观测到的最大报告期作为最新报告期
+    data = make_data([('2008-08-11', '2008-06-30', 1.),
+                      ('2008-10-10', '2008-09-30', 2.),
+                      ('2009-04-10', '2009-03-31', 4.),
+                      ('2009-05-11', '2008-12-31', 5.)])
+    np.testing.assert_array_equal(observe(data, method, n), expected)
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date    : 2026-10-17 16:40:52
+# @Author  : Li Hao (howardlee_h@outlook.com)
+# @Link    : https://github.com/SAmmer0
+# @Version : $Id$
+'''
+文件锁（fmanager.database.filelock）的测试
+'''
+import threading
+
+import pytest
+
+filelock = pytest.importorskip('fmanager.database.filelock')
+
+
+def try_acquire(path, exclusive):
+    '''
+    在另一个线程中尝试（不等待）获取锁，返回是否获取成功
+    '''
+    result = []
+
+    def run():
+        try:
+            with filelock.FileLock(path, exclusive=exclusive, timeout=0):
+                result.append(True)
+        except TimeoutError:
+            result.append(False)
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_reentrant_in_same_thread(tmp_path):
+    path = str(tmp_path / 'data.lock')
+    with filelock.FileLock(path, exclusive=True):
+        with filelock.FileLock(path, exclusive=True, timeout=0):
+            with filelock.FileLock(path, timeout=0):
+                pass
+        assert not try_acquire(path, False)
+    assert try_acquire(path, True)
+
+
+def test_exclusive_between_threads(tmp_path):
+    path = str(tmp_path / 'data.lock')
+    with filelock.FileLock(path, exclusive=True):
+        assert not try_acquire(path, True)
+        assert not try_acquire(path, False)
+    with filelock.FileLock(path):
+        assert try_acquire(path, False)
+        assert not try_acquire(path, True)
+    assert try_acquire(path, True)
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date    : 2026-10-17 10:31:52
+# @Author  : Li Hao (howardlee_h@outlook.com)
+# @Link    : https://github.com/SAmmer0
+# @Version : $Id$
+'''
+因子更新过程的测试，数据来自模拟数据库（见conftest）
+'''
+import pandas as pd
+
+from conftest import SYNTHETIC_END
+
+# 增量更新测试中第一次更新的结束时间，第二次更新到SYNTHETIC_END；第一次更新需要包含期间上市的股票上市
+# 后的第一份年报（原有的财务数据因子在pandas>=1.0下使用.loc选取没有数据的股票代码会报错）
+INCREMENTAL_END = '2009-04-30'
+
+
+def assert_factors_equal(left, right, names):
+    '''
+    检查两次更新得到的给定因子的数据相同
+    '''
+    for name in sorted(names):
+        assert left[name] is not None, name
+        assert right[name] is not None, name
+        pd.testing.assert_frame_equal(left[name], right[name], check_freq=False, obj=name)
+
+
+def test_parallel_update_matches_serial(update_factors):
+    serial = update_factors('serial', SYNTHETIC_END)
+    parallel = update_factors('parallel', SYNTHETIC_END, workers=4)
+    assert serial['success']
+    assert parallel['success']
+    assert sorted(serial['data']) == sorted(parallel['data'])
+    assert_factors_equal(serial['data'], parallel['data'], serial['data'])
+
+
+def test_incremental_update_matches_full(update_factors):
+    # 声明了回溯期的因子，增量更新时只读取回溯期内的数据，结果应当与全部重新计算的结果相同
+    full = update_factors('full', SYNTHETIC_END)
+    update_factors('incremental', INCREMENTAL_END)
+    incremental = update_factors('incremental', SYNTHETIC_END)
+    assert full['success']
+    assert incremental['success']
+    names = [name for name, lookback in full['lookback'].items() if lookback > 0]
+    assert names
+    assert_factors_equal(full['data'], incremental['data'], names)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Date    : 2026-10-17 10:20:13
+# @Author  : Li Hao (howardlee_h@outlook.com)
+# @Link    : https://github.com/SAmmer0
+# @Version : $Id$
+'''
+更新所有因子的数据，供测试在子进程中调用（见conftest.update_factors）：
+    python update_runner.py END_TIME WORKERS OUTPUT
+WORKERS为1时使用update_all_factors串行更新，否则使用update_all_factors_parallel并行更新；更新完成后将
+结果写入OUTPUT，格式为{'success': 是否全部更新成功, 'data': {因子名称: 数据},
+'lookback': {因子名称: 声明的回溯期}}
+'''
+import pickle
+import sys
+
+import pandas as pd
+
+from fmanager import update
+from fmanager.const import START_TIME
+from fmanager.database import DBConnector
+
+# 在模拟数据库上无法计算的因子：BARRA因子的异常值检测（statsmodels的medcouple）会报错，ST_TAG和
+# 指数成分因子使用.loc选取没有数据的股票代码（pandas>=1.0会报错），MOM_60M需要5年以上的历史数据
+EXCLUDED_PREFIX = ('BARRA', )
+EXCLUDED_SUFFIX = ('_WEIGHTS', '_CONS')
+EXCLUDED = ('ST_TAG', 'MOM_60M')
+
+
+def is_excluded(name):
+    return name.startswith(EXCLUDED_PREFIX) or name.endswith(EXCLUDED_SUFFIX) or name in EXCLUDED
+
+
+def main(end_time, workers, output):
+    end_time = pd.to_datetime(end_time)
+    update.get_endtime = lambda t, threshold=18: end_time   # 模拟数据库的数据只到end_time
+    factor_dict = update.get_factor_dict()
+    update.gen_folders(factor_dict)
+    update.update_factordict()
+    factor_dict = {name: msg for name, msg in factor_dict.items() if not is_excluded(name)}
+    if workers == 1:
+        order = [node.name for node in update.dependency_order() if node.name in factor_dict]
+        order.sort(key=lambda name: name != update.IMPLICIT_DEPENDENCY)
+        success = update.update_all_factors(factor_dict, max_iter=10 * len(order), order=order)
+    else:
+        success = update.update_all_factors_parallel(factor_dict, workers=workers)
+    data = {name: DBConnector(msg['abs_path']).query((START_TIME, end_time))
+            for name, msg in factor_dict.items()}
+    lookback = {name: msg['factor'].lookback for name, msg in factor_dict.items()}
+    with open(output, 'wb') as f:
+        pickle.dump({'success': success, 'data': data, 'lookback': lookback}, f)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1], int(sys.argv[2]), sys.argv[3])